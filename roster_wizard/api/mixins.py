@@ -0,0 +1,38 @@
+"""Mixins."""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+
+class AsyncDispatchMixin:
+    """Dispatch a view or viewset from the event loop.
+
+    The request is authenticated, checked against the permissions and
+    throttles and negotiated as DRF does, in one worker thread call. Handlers
+    that are coroutines are then awaited on the event loop, and synchronous
+    handlers run in a worker thread.
+    """
+
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        """Mark the view as async so Django awaits its dispatch."""
+        return markcoroutinefunction(super().as_view(*args, **initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        """Dispatch the request as APIView.dispatch does, awaiting the handler."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = self.http_method_not_allowed
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), handler)
+            if not iscoroutinefunction(handler):
+                handler = sync_to_async(handler)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,106 @@
+"""Pagination."""
+
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class DateKeysetPagination(BasePagination):
+    """Paginate by date and id from the last item of the previous page.
+
+    Each page filters on the date and id it starts after, which an index on
+    date and id answers directly, so later pages cost no more than the first.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        """Get the requested page size, capped at the maximum."""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.ROSTER_API_PAGE_SIZE
+        return min(max(page_size, 1), settings.ROSTER_API_MAX_PAGE_SIZE)
+
+    def encode_cursor(self, item):
+        """Encode the position after an item."""
+        position = f"{item.date.isoformat()},{item.id}"
+        return urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Decode a position into its date and id."""
+        try:
+            item_date, item_id = urlsafe_b64decode(cursor.encode()).decode().split(",")
+            return date.fromisoformat(item_date), int(item_id)
+        except (binascii.Error, UnicodeError, ValueError) as error:
+            raise NotFound(self.invalid_cursor_message) from error
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Get the page of the queryset after the cursor."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by("date", "id")
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            after_date, after_id = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(date__gt=after_date) | Q(date=after_date, id__gt=after_id)
+            )
+        page = list(queryset[: page_size + 1])
+        self.next_cursor = (
+            self.encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+        )
+        return page[:page_size]
+
+    def get_next_link(self):
+        """Get the link to the next page, if there is one."""
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor,
+        )
+
+    def get_paginated_response(self, data):
+        """Get the page with the link to the next page."""
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_schema_operation_parameters(self, view):
+        """Get the query parameters of a page."""
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+    def get_paginated_response_schema(self, schema):
+        """Get the schema of a page."""
+        return {
+            "type": "object",
+            "required": ["next", "results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,11 @@
+"""Permissions."""
+
+from rest_framework.permissions import BasePermission
+
+
+class CanChangeRoster(BasePermission):
+    """Allow users with the change roster permission."""
+
+    def has_permission(self, request, view):
+        """Check the user can change rosters."""
+        return request.user.has_perm("rosters.change_roster")
@@ -1,11 +1,56 @@
 """Serializers."""
 
 from datetime import datetime
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from rosters.models import TimeSlot, Leave
+from rosters.grid import get_roster_dates
+from rosters.reference import get_reference_data
+from rosters.models import TimeSlot, Leave, RosterRun, StaffRequest
 
 
-class LeaveSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Serialize only the fields named in the fields context, if any."""
+
+    def __init__(self, *args, **kwargs):
+        """Drop the fields that were not asked for."""
+        super().__init__(*args, **kwargs)
+        fields = self.context.get("fields")
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ListFilterSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Dated List Filter Serializer."""
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    staff = serializers.IntegerField(required=False, min_value=1)
+    fields = serializers.CharField(required=False)
+
+    def validate_fields(self, value):
+        """Split the comma separated field names and check they exist."""
+        names = [name for name in value.split(",") if name]
+        unknown = set(names) - set(self.context["fields"])
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+        return names
+
+    def validate(self, attrs):
+        """Ensure the range does not end before it starts."""
+        if (
+            "date_from" in attrs
+            and "date_to" in attrs
+            and attrs["date_to"] < attrs["date_from"]
+        ):
+            raise serializers.ValidationError("date_to must not be before date_from")
+        return attrs
+
+
+class LeaveSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Leave Serilizer."""
 
     class Meta:
@@ -20,7 +65,7 @@ class LeaveSerializer(serializers.ModelSerializer):
         )
 
 
-class TimeSlotSerializer(serializers.ModelSerializer):
+class TimeSlotSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """TimeSlot Serializer."""
 
     class Meta:
@@ -35,6 +80,58 @@ class TimeSlotSerializer(serializers.ModelSerializer):
         )
 
 
+class StaffRequestSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """StaffRequest Serializer."""
+
+    class Meta:
+        """Meta."""
+
+        model = StaffRequest
+        fields = (
+            "id",
+            "date",
+            "staff_member",
+            "shift",
+            "like",
+            "priority",
+        )
+
+
+class LeaveItemSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Bulk Leave Item Serializer."""
+
+    staff_member = serializers.IntegerField()
+    date = serializers.DateField()
+    description = serializers.CharField(max_length=15, default="Leave")
+
+
+class StaffRequestItemSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Bulk Staff Request Item Serializer."""
+
+    staff_member = serializers.IntegerField()
+    date = serializers.DateField()
+    shift = serializers.IntegerField()
+    like = serializers.BooleanField(default=True)
+    priority = serializers.IntegerField()
+
+
+class AssignmentSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Bulk Assignment Item Serializer."""
+
+    staff = serializers.IntegerField()
+    date = serializers.DateField()
+    shift = serializers.IntegerField()
+
+
+class BulkResultSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Bulk Write Item Result Serializer."""
+
+    index = serializers.IntegerField()
+    status = serializers.CharField()
+    id = serializers.IntegerField(allow_null=True)
+    errors = serializers.DictField(allow_null=True)
+
+
 class DateTimeSerializer(serializers.Serializer):
     """DateTime Serializer."""
 
@@ -48,3 +145,198 @@ class DateTimeSerializer(serializers.Serializer):
         """Update date."""
         instance.date = validated_data.get("date", instance.date)
         return instance
+
+
+class DateRangeSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Inclusive Date Range Serializer."""
+
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, attrs):
+        """Ensure the end date follows the start date within the export limit."""
+        if attrs["end_date"] < attrs["start_date"]:
+            raise serializers.ValidationError("end_date must not be before start_date")
+        if (
+            attrs["end_date"] - attrs["start_date"]
+        ).days + 1 > settings.ROSTER_EXPORT_MAX_DAYS:
+            raise serializers.ValidationError(
+                f"Exports are limited to {settings.ROSTER_EXPORT_MAX_DAYS} days"
+            )
+        return attrs
+
+
+class EstimateSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Roster Estimate Serializer."""
+
+    variables = serializers.IntegerField()
+    constraints = serializers.IntegerField()
+    memory = serializers.IntegerField()
+    solve_time = serializers.FloatField(allow_null=True)
+    over_budget = serializers.BooleanField()
+
+
+class RosterRunSerializer(serializers.ModelSerializer):
+    """Roster Run Serializer."""
+
+    gap = serializers.FloatField(read_only=True)
+
+    class Meta:
+        """Meta."""
+
+        model = RosterRun
+        fields = (
+            "task_id",
+            "start_date",
+            "status",
+            "message",
+            "phase",
+            "progress",
+            "created",
+            "started",
+            "finished",
+            "solve_time",
+            "solver_status",
+            "objective",
+            "best_bound",
+            "gap",
+        )
+
+
+class RosterRunDetailSerializer(RosterRunSerializer):
+    """Roster Run Detail Serializer."""
+
+    class Meta(RosterRunSerializer.Meta):
+        """Meta."""
+
+        fields = RosterRunSerializer.Meta.fields + (
+            "isolated",
+            "estimated_variables",
+            "estimated_constraints",
+            "estimated_memory",
+            "estimated_solve_time",
+            "variables",
+            "constraints",
+            "presolve_time",
+            "conflicts",
+            "branches",
+            "memory_limit",
+            "peak_memory",
+            "resident_memory",
+            "phases",
+            "staff_request_report",
+        )
+
+
+class RunWaitSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Roster Run Long Poll Serializer."""
+
+    wait = serializers.FloatField(required=False, default=0, min_value=0)
+
+    def validate_wait(self, value):
+        """Cap the wait at the longest allowed."""
+        return min(value, settings.ROSTER_RUN_MAX_WAIT)
+
+
+class RunListFilterSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Roster Run List Filter Serializer."""
+
+    status = serializers.ChoiceField(choices=RosterRun.STATUS_CHOICES, required=False)
+    limit = serializers.IntegerField(required=False, min_value=1)
+
+    def validate_limit(self, value):
+        """Cap the number of runs at the maximum page size."""
+        return min(value, settings.ROSTER_API_MAX_PAGE_SIZE)
+
+
+class RosterGridSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Roster Grid Serializer."""
+
+    dates = serializers.ListField(child=serializers.DateField())
+    staff = serializers.SerializerMethodField()
+
+    def get_staff(self, grid):
+        """Staff with their shifts in date order."""
+        return [
+            {
+                "id": worker.id,
+                "name": worker.name,
+                "roles": worker.roles,
+                "shifts_per_roster": worker.shifts_per_roster,
+                "shifts": cells,
+            }
+            for worker, cells in grid.rows()
+        ]
+
+
+class CompactGridSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Compact Roster Grid Serializer."""
+
+    version = serializers.CharField()
+    dates = serializers.ListField(child=serializers.DateField())
+    staff_ids = serializers.ListField(child=serializers.IntegerField())
+    codes = serializers.ListField(child=serializers.CharField(allow_blank=True))
+    cells = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField())
+    )
+    leave = serializers.ListField(child=serializers.CharField())
+
+
+class AssignmentGridSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Assignment Grid Serializer."""
+
+    versions = serializers.ListField(child=serializers.CharField())
+    dates = serializers.ListField(child=serializers.DateField())
+    staff_ids = serializers.ListField(child=serializers.IntegerField())
+    staff_names = serializers.ListField(child=serializers.CharField())
+    shift_ids = serializers.ListField(child=serializers.IntegerField())
+    shift_types = serializers.ListField(child=serializers.CharField())
+    cells = serializers.ListField(child=serializers.ListField())
+    leave = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField())
+    )
+
+
+class CellEditSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Roster Cell Edit Serializer."""
+
+    staff = serializers.IntegerField()
+    date = serializers.DateField()
+    shift = serializers.IntegerField(allow_null=True)
+    version = serializers.CharField()
+
+
+class RosterEditSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Roster Edit Serializer."""
+
+    date = serializers.DateField()
+    cells = serializers.ListField(child=CellEditSerializer(), min_length=1)
+
+    def validate_cells(self, cells):
+        """Ensure the number of cells is within the edit limit."""
+        if len(cells) > settings.ROSTER_EDIT_MAX_CELLS:
+            raise serializers.ValidationError(
+                f"At most {settings.ROSTER_EDIT_MAX_CELLS} cells can be edited at once"
+            )
+        return cells
+
+    def validate(self, attrs):
+        """Ensure every cell is in the period with known staff and shifts."""
+        dates = set(get_roster_dates(attrs["date"]))
+        staff_ids = set(
+            get_user_model()
+            .objects.filter(id__in={cell["staff"] for cell in attrs["cells"]})
+            .values_list("id", flat=True)
+        )
+        shift_ids = {shift.id for shift in get_reference_data().shifts}
+        errors = {}
+        for index, cell in enumerate(attrs["cells"]):
+            if cell["date"] not in dates:
+                errors[index] = "date is outside the roster period"
+            elif cell["staff"] not in staff_ids:
+                errors[index] = "staff member does not exist"
+            elif cell["shift"] is not None and cell["shift"] not in shift_ids:
+                errors[index] = "shift does not exist"
+        if errors:
+            raise serializers.ValidationError({"cells": errors})
+        return attrs
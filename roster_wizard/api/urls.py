@@ -1,10 +1,22 @@
 """URLs."""
 
+from django.urls import path
 from rest_framework.routers import SimpleRouter
-from .views import LeaveViewSet, TimeSlotViewSet, GenerateRosterViewSet
+from .views import (
+    LeaveViewSet,
+    StaffRequestViewSet,
+    TimeSlotViewSet,
+    RosterViewSet,
+    GenerateRosterViewSet,
+    RosterGridView,
+)
 
 router = SimpleRouter()
 router.register("leave", LeaveViewSet, basename="leave")
 router.register("timeslots", TimeSlotViewSet, basename="timeslots")
+router.register("staffrequests", StaffRequestViewSet, basename="staffrequests")
+router.register("roster", RosterViewSet, basename="roster")
 router.register("generate", GenerateRosterViewSet, basename="generate")
-urlpatterns = router.urls
+urlpatterns = [
+    path("roster/grid/", RosterGridView.as_view(), name="roster-grid"),
+] + router.urls
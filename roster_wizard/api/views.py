@@ -1,24 +1,213 @@
 """Views."""
 
+import hashlib
+from collections import Counter
+from urllib.parse import urlencode
+
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.views import APIView
+
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
-from rosters.models import Leave, TimeSlot
-from rosters.tasks import generate_roster
+from rosters.bulk import invalid, write_assignments, write_leave, write_staff_requests
+from rosters.cache import get_stamp
+from rosters.editing import CellEdit, apply_cell_edits, build_assignment_grid
+
+from rosters.estimator import estimate_roster
+from rosters.export import roster_csv_response
+from rosters.grid import (
+    aget_roster_grid,
+    get_compact_grid,
+    get_roster_dates,
+    get_roster_grid,
+)
+from rosters.logic import RosterEditConflict, RosterOverBudget
+from rosters.models import Leave, RosterRun, StaffRequest, TimeSlot
+from rosters.status import wait_for_run
+from rosters.tasks import cancel_generate_roster, queue_generate_roster
+from .mixins import AsyncDispatchMixin
+from .pagination import DateKeysetPagination
+from .parsers import NDJSONParser
 from .serializers import (
+    ListFilterSerializer,
     LeaveSerializer,
+    StaffRequestSerializer,
+    LeaveItemSerializer,
+    StaffRequestItemSerializer,
+    AssignmentSerializer,
+    BulkResultSerializer,
     TimeSlotSerializer,
     DateTimeSerializer,
+    DateRangeSerializer,
+    EstimateSerializer,
+    RosterGridSerializer,
+    CompactGridSerializer,
+    AssignmentGridSerializer,
+    RosterEditSerializer,
+    RosterRunSerializer,
+    RosterRunDetailSerializer,
+    RunWaitSerializer,
+    RunListFilterSerializer,
 )
+from .permissions import CanChangeRoster
+
+
+class RosterGridView(AsyncDispatchMixin, APIView):
+    """Roster Grid View.
+
+    An async equivalent of listing RosterViewSet for frequent polling, which
+    is answered from the cache without leaving the event loop.
+    """
+
+    async def get(self, request):
+        """Get the cached roster grid for the period starting at the date."""
+        if "date" in request.query_params:
+            serializer = DateTimeSerializer(data=request.query_params)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            date = serializer.validated_data["date"]
+        else:
+            date = timezone.localtime()
+        grid = await aget_roster_grid(date)
+        return Response(RosterGridSerializer(grid).data, status=status.HTTP_200_OK)
+
+
+def _date_keys(versions):
+    """Key the versions of dates by ISO date."""
+    return {date.isoformat(): version for date, version in versions.items()}
+
+
+def _bulk_write(request, item_serializer_class, write):
+    """Validate the items of a bulk request and write the valid ones.
+
+    Items are a JSON list or NDJSON stream. The response counts the results
+    by status and has a result for every item, in request order.
+    """
+    items = request.data
+    if not isinstance(items, list):
+        return Response(
+            {"detail": "Expected a list of items."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(items) > settings.ROSTER_BULK_MAX_ITEMS:
+        return Response(
+            {
+                "detail": f"At most {settings.ROSTER_BULK_MAX_ITEMS} items can be "
+                "written at once."
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    valid = []
+    results = []
+    for index, item in enumerate(items):
+        serializer = item_serializer_class(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results.append(invalid(index, serializer.errors))
+    results = sorted(results + write(valid))
+    return Response(
+        {
+            "counts": Counter(result.status for result in results),
+            "results": BulkResultSerializer(results, many=True).data,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+class ConditionalListMixin:
+    """Answer list requests with 304 while the collection is unchanged."""
+
+    collection = None
+
+    def list(self, request, *args, **kwargs):
+        """List the collection unless the client's copy is current.
+
+        The ETag covers the query parameters, so another page, filter or
+        set of fields of the same collection is never answered with 304.
+        """
+        stamp = get_stamp(collections=[self.collection])
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        query_hash = hashlib.md5(query.encode()).hexdigest()
+        etag = quote_etag(
+            f"{stamp.version}-{query_hash}-{request.accepted_renderer.format}"
+        )
+        last_modified = int(stamp.last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        response.headers.setdefault("ETag", etag)
+        response.headers.setdefault("Last-Modified", http_date(last_modified))
+        return response
+
+
+class DatedListMixin:
+    """Filter, paginate and trim the fields of lists of dated objects.
+
+    Lists take optional date_from, date_to and staff filters, a comma
+    separated list of fields to return, and are paginated by date and id.
+    """
+
+    pagination_class = DateKeysetPagination
+    staff_lookup = None
+
+    def get_list_filters(self):
+        """Get the validated list filters, which are empty for other actions."""
+        if self.action != "list":
+            return {}
+        if not hasattr(self, "_list_filters"):
+            serializer = ListFilterSerializer(
+                data=self.request.query_params,
+                context={"fields": self.serializer_class.Meta.fields},
+            )
+            serializer.is_valid(raise_exception=True)
+            self._list_filters = serializer.validated_data
+        return self._list_filters
+
+    def get_fields(self):
+        """Get the names of the fields to serialize."""
+        return (
+            self.get_list_filters().get("fields") or self.serializer_class.Meta.fields
+        )
+
+    def get_queryset(self):
+        """Filter the list by date range and staff member."""
+        queryset = super().get_queryset()
+        filters = self.get_list_filters()
+        if "date_from" in filters:
+            queryset = queryset.filter(date__gte=filters["date_from"])
+        if "date_to" in filters:
+            queryset = queryset.filter(date__lte=filters["date_to"])
+        if "staff" in filters:
+            queryset = queryset.filter(**{self.staff_lookup: filters["staff"]})
+        return queryset
+
+    def get_serializer_context(self):
+        """Pass the fields to serialize to the serializer."""
+        context = super().get_serializer_context()
+        context["fields"] = self.get_fields()
+        return context
 
 
-class LeaveViewSet(viewsets.ModelViewSet):
+class LeaveViewSet(ConditionalListMixin, DatedListMixin, viewsets.ModelViewSet):
     """LeaveViewSet."""
 
-    queryset = Leave.objects.all()
+    collection = "leave"
+    # Staff members are serialized by id so they need not be joined
+    queryset = Leave.objects.select_related(None)
     serializer_class = LeaveSerializer
+    staff_lookup = "staff_member_id"
 
     def get_permissions(self):
         """Instantiate and return permissions that this view requires."""
@@ -28,23 +217,171 @@ class LeaveViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
 
+    @action(detail=False, methods=["post"], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Create leave, or update leave on the same day, for many days at once."""
+        return _bulk_write(request, LeaveItemSerializer, write_leave)
 
-class TimeSlotViewSet(viewsets.ModelViewSet):
+
+class TimeSlotViewSet(ConditionalListMixin, DatedListMixin, viewsets.ModelViewSet):
     """TimeSlotViewSet."""
 
+    collection = "timeslot"
     permission_classes = [IsAdminUser]
-    queryset = TimeSlot.objects.all()
+    # Shifts and staff are serialized by id so they need not be joined
+    queryset = TimeSlot.objects.select_related(None).prefetch_related(None)
     serializer_class = TimeSlotSerializer
+    staff_lookup = "staff"
+
+    def get_queryset(self):
+        """Prefetch the ids of the staff of each timeslot if they are listed."""
+        queryset = super().get_queryset()
+        if "staff" in self.get_fields():
+            queryset = queryset.prefetch_related(
+                Prefetch("staff", queryset=get_user_model().objects.only("id"))
+            )
+        return queryset
+
+
+class StaffRequestViewSet(ConditionalListMixin, DatedListMixin, viewsets.ModelViewSet):
+    """StaffRequestViewSet."""
+
+    collection = "staffrequest"
+    permission_classes = [IsAdminUser]
+    # Staff members and shifts are serialized by id so they need not be joined
+    queryset = StaffRequest.objects.select_related(None)
+    serializer_class = StaffRequestSerializer
+    staff_lookup = "staff_member_id"
+
+    @action(detail=False, methods=["post"], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Create or update many staff requests at once."""
+        return _bulk_write(request, StaffRequestItemSerializer, write_staff_requests)
+
 
+class RosterViewSet(viewsets.ViewSet):
+    """RosterViewSet."""
 
-class GenerateRosterViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        """Get roster by staff for the period starting at the date query parameter."""
+        if "date" in request.query_params:
+            serializer = DateTimeSerializer(data=request.query_params)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            date = serializer.validated_data["date"]
+        else:
+            date = timezone.localtime()
+        grid = get_roster_grid(date)
+        return Response(RosterGridSerializer(grid).data, status=status.HTTP_200_OK)
+
+    @action(detail=False)
+    def compact(self, request):
+        """Get the period's roster as integer codes, or 304 if unchanged."""
+        if "date" in request.query_params:
+            serializer = DateTimeSerializer(data=request.query_params)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            date = serializer.validated_data["date"]
+        else:
+            date = timezone.localtime()
+        stamp = get_stamp(get_roster_dates(date))
+        etag = quote_etag(f"{stamp.version}-{request.accepted_renderer.format}")
+        last_modified = int(stamp.last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            grid = get_compact_grid(date)
+            response = Response(
+                CompactGridSerializer(grid).data, status=status.HTTP_200_OK
+            )
+        response.headers.setdefault("ETag", etag)
+        response.headers.setdefault("Last-Modified", http_date(last_modified))
+        return response
+
+    @action(
+        detail=False,
+        methods=["get", "patch"],
+        permission_classes=[IsAuthenticated, CanChangeRoster],
+    )
+    def cells(self, request):
+        """Get the period's assignments as shift codes, or edit some cells."""
+        if request.method == "PATCH":
+            return self._edit_cells(request)
+        if "date" in request.query_params:
+            serializer = DateTimeSerializer(data=request.query_params)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            date = serializer.validated_data["date"]
+        else:
+            date = timezone.localtime()
+        grid = build_assignment_grid(get_roster_dates(date))
+        return Response(AssignmentGridSerializer(grid).data, status=status.HTTP_200_OK)
+
+    def _edit_cells(self, request):
+        """Apply cell edits if their dates are still at the versions loaded."""
+        serializer = RosterEditSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        edits = [
+            CellEdit(
+                staff_id=cell["staff"],
+                date=cell["date"],
+                shift_id=cell["shift"],
+                version=cell["version"],
+            )
+            for cell in serializer.validated_data["cells"]
+        ]
+        try:
+            versions = apply_cell_edits(edits)
+        except RosterEditConflict as error:
+            data = {"detail": str(error), "versions": _date_keys(error.versions)}
+            return Response(data, status=status.HTTP_409_CONFLICT)
+        return Response({"versions": _date_keys(versions)}, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAuthenticated, CanChangeRoster],
+        parser_classes=[JSONParser, NDJSONParser],
+    )
+    def assignments(self, request):
+        """Assign many staff members to shifts, keeping their other shifts."""
+        return _bulk_write(request, AssignmentSerializer, write_assignments)
+
+    @action(detail=False)
+    def export(self, request):
+        """Stream roster from start_date to end_date inclusive as CSV."""
+        serializer = DateRangeSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return roster_csv_response(
+            request._request,  # pylint: disable=protected-access
+            serializer.validated_data["start_date"],
+            serializer.validated_data["end_date"],
+        )
+
+
+class GenerateRosterViewSet(AsyncDispatchMixin, viewsets.ViewSet):
     """GenerateRosterView."""
 
     permission_classes = [IsAdminUser]
 
     def list(self, request):
-        """Get page."""
-        data = {"date": "required"}
+        """Get page with an estimate for the optional date query parameter."""
+        if "date" in request.query_params:
+            serializer = DateTimeSerializer(data=request.query_params)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            date = serializer.validated_data["date"]
+        else:
+            date = timezone.now()
+        data = {
+            "date": "required",
+            "estimate": EstimateSerializer(estimate_roster(date)).data,
+        }
         return Response(data, status=status.HTTP_200_OK)
 
     def create(self, request):
@@ -52,23 +389,60 @@ class GenerateRosterViewSet(viewsets.ViewSet):
         serializer = DateTimeSerializer(data=request.data)
         if serializer.is_valid():
             date = serializer.validated_data["date"]
-            result = generate_roster.delay(start_date=date)
-            data = {"task": result.task_id}
+            try:
+                result, estimate = queue_generate_roster(date)
+            except RosterOverBudget as error:
+                data = {
+                    "detail": str(error),
+                    "estimate": EstimateSerializer(error.estimate).data,
+                }
+                return Response(data, status=status.HTTP_400_BAD_REQUEST)
+            data = {
+                "task": result.task_id,
+                "estimate": EstimateSerializer(estimate).data,
+            }
             return Response(data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def retrieve(self, request, pk=None):
-        """Not used."""
-        pass  # pylint: disable=unnecessary-pass
-
-    def update(self, request, pk=None):
-        """Not used."""
-        pass  # pylint: disable=unnecessary-pass
-
-    def partial_update(self, request, pk=None):
-        """Not used."""
-        pass  # pylint: disable=unnecessary-pass
+    async def retrieve(self, request, pk=None):
+        """Get the run of a task, waiting up to wait seconds for it to finish."""
+        serializer = RunWaitSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        run = await wait_for_run(pk, serializer.validated_data["wait"])
+        if run is None:
+            return Response(
+                {"detail": "No roster run for this task."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(RosterRunDetailSerializer(run).data, status=status.HTTP_200_OK)
 
     def destroy(self, request, pk=None):
-        """Not used."""
-        pass  # pylint: disable=unnecessary-pass
+        """Cancel the run of a task, which stops before its next phase."""
+        run = RosterRun.objects.filter(task_id=pk).first()
+        if run is None:
+            return Response(
+                {"detail": "No roster run for this task."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if cancel_generate_roster(run):
+            response_status = status.HTTP_202_ACCEPTED
+        else:
+            response_status = status.HTTP_409_CONFLICT
+        return Response(RosterRunDetailSerializer(run).data, status=response_status)
+
+    @action(detail=False)
+    def runs(self, request):
+        """List the most recent runs, optionally with a given status."""
+        serializer = RunListFilterSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Phases and reports are not listed and can be large
+        runs = RosterRun.objects.defer("phases", "staff_request_report")
+        if "status" in serializer.validated_data:
+            runs = runs.filter(status=serializer.validated_data["status"])
+        limit = serializer.validated_data.get("limit", settings.ROSTER_API_PAGE_SIZE)
+        return Response(
+            {"results": RosterRunSerializer(runs[:limit], many=True).data},
+            status=status.HTTP_200_OK,
+        )
@@ -72,6 +72,7 @@ if DEBUG:
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "rosters.queryprofile.QueryProfileMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -120,6 +121,15 @@ DATABASES = {
 
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
 
+# Cache
+# Cached rosters are invalidated by bumping versions in the cache, so every web
+# and Celery process must share it, e.g. redis://host:port/db. locmem:// is
+# private to one process and only suits tests, manage.py check --deploy
+# rejects it
+CACHES = {"default": env.dj_cache_url("CACHE_URL", default="locmem://")}
+ROSTER_CACHE_TIMEOUT = env.int("ROSTER_CACHE_TIMEOUT", default=60 * 60)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -239,6 +249,36 @@ else:
         },
     }
 
+# Query profiling of a sample of requests, see rosters/queryprofile.py, logged
+# to its own rotating file and ranked at /dbmanage/query_profile/. A rate of 0
+# removes the middleware
+ROSTER_QUERY_PROFILE_RATE = env.float("ROSTER_QUERY_PROFILE_RATE", default=0.0)
+# Repeats of one query within a request that flag the request as N+1
+ROSTER_QUERY_PROFILE_REPEATS = env.int("ROSTER_QUERY_PROFILE_REPEATS", default=10)
+ROSTER_QUERY_PROFILE_LOG = env.str(
+    "ROSTER_QUERY_PROFILE_LOG", default=os.path.join(BASE_DIR, "logs/queries.log")
+)
+ROSTER_QUERY_PROFILE_LOG_SIZE = 1024 * 1024 * 15  # 15MB
+ROSTER_QUERY_PROFILE_LOG_COUNT = 4
+# Views listed on the admin's top offending views page
+ROSTER_QUERY_PROFILE_TOP = env.int("ROSTER_QUERY_PROFILE_TOP", default=25)
+LOGGING["formatters"]["message"] = {"format": "%(message)s"}
+LOGGING["handlers"]["query_profile"] = {
+    "level": "INFO",
+    "class": "logging.handlers.RotatingFileHandler",
+    "filename": ROSTER_QUERY_PROFILE_LOG,
+    "maxBytes": ROSTER_QUERY_PROFILE_LOG_SIZE,
+    "backupCount": ROSTER_QUERY_PROFILE_LOG_COUNT,
+    "formatter": "message",
+    # Only open the file once a request is profiled
+    "delay": True,
+}
+LOGGING["loggers"]["rosters.queryprofile"] = {
+    "handlers": ["query_profile"],
+    "level": "INFO",
+    "propagate": False,
+}
+
 # IPs that can access Debug Toolbar
 INTERNAL_IPS = [
     "127.0.0.1",
@@ -268,14 +308,79 @@ CELERY_BROKER_TRANSPORT_OPTIONS = {"confirm_publish": True}
 CELERY_WORKER_DETECT_QUORUM_QUEUES = True
 CELERY_TASK_CREATE_MISSING_QUEUE_TYPE = "quorum"
 
+# Roster solver
+ROSTER_SOLVER_MAX_TIME = env.int("ROSTER_SOLVER_MAX_TIME", default=120)
+# Run each solve in a short-lived child process with an address space cap of
+# base + per variable bytes
+ROSTER_SOLVER_ISOLATED = env.bool("ROSTER_SOLVER_ISOLATED", default=False)
+ROSTER_SOLVER_MEMORY_BASE = env.int(
+    "ROSTER_SOLVER_MEMORY_BASE",
+    default=1024 * 1024 * 1024,  # 1GB
+)
+ROSTER_SOLVER_MEMORY_PER_VARIABLE = env.int(
+    "ROSTER_SOLVER_MEMORY_PER_VARIABLE",
+    default=1024 * 8,  # 8KB
+)
+ROSTER_SOLVER_MEMORY_PER_CONSTRAINT = env.int(
+    "ROSTER_SOLVER_MEMORY_PER_CONSTRAINT",
+    default=1024 * 4,  # 4KB
+)
+# Admission control, generations estimated over budget are either rejected
+# or downgraded to an isolated solve capped at the memory budget
+ROSTER_MEMORY_BUDGET = env.int(
+    "ROSTER_MEMORY_BUDGET",
+    default=1024 * 1024 * 1024 * 8,  # 8GB
+)
+ROSTER_MAX_VARIABLES = env.int("ROSTER_MAX_VARIABLES", default=5000000)
+ROSTER_OVER_BUDGET = env.str(
+    "ROSTER_OVER_BUDGET",
+    default="reject",
+    validate=lambda x: x in ("reject", "downgrade"),
+)
+# Number of recent runs used to calibrate solve time predictions
+ROSTER_ESTIMATE_HISTORY = env.int("ROSTER_ESTIMATE_HISTORY", default=20)
+# Trace Python allocations of each generation phase, slows generation down
+ROSTER_PROFILE_MEMORY = env.bool("ROSTER_PROFILE_MEMORY", default=False)
+# Lines read per worker thread call when streaming roster exports under ASGI,
+# and the longest range
+ROSTER_EXPORT_BATCH_LINES = env.int("ROSTER_EXPORT_BATCH_LINES", default=1000)
+ROSTER_EXPORT_MAX_DAYS = env.int("ROSTER_EXPORT_MAX_DAYS", default=366)
+# Most roster cells a single edit request may change
+ROSTER_EDIT_MAX_CELLS = env.int("ROSTER_EDIT_MAX_CELLS", default=500)
+# Days before and after today covered by staff calendar feeds
+ROSTER_CALENDAR_PAST_DAYS = env.int("ROSTER_CALENDAR_PAST_DAYS", default=28)
+ROSTER_CALENDAR_FUTURE_DAYS = env.int("ROSTER_CALENDAR_FUTURE_DAYS", default=182)
+# Roster status streams check the run version every poll interval, render the
+# status at least every recheck, end after the timeout and browsers reconnect
+# after the retry in milliseconds
+ROSTER_STATUS_POLL_INTERVAL = env.float("ROSTER_STATUS_POLL_INTERVAL", default=1.0)
+ROSTER_STATUS_RECHECK = env.int("ROSTER_STATUS_RECHECK", default=15)
+ROSTER_STATUS_STREAM_TIMEOUT = env.int("ROSTER_STATUS_STREAM_TIMEOUT", default=300)
+ROSTER_STATUS_RETRY = env.int("ROSTER_STATUS_RETRY", default=2000)
+# Longest a roster run long poll may wait, which holds a worker thread meanwhile
+ROSTER_RUN_MAX_WAIT = env.int("ROSTER_RUN_MAX_WAIT", default=30)
+# Items per page of API lists, and the most a client may ask for
+ROSTER_API_PAGE_SIZE = env.int("ROSTER_API_PAGE_SIZE", default=100)
+ROSTER_API_MAX_PAGE_SIZE = env.int("ROSTER_API_MAX_PAGE_SIZE", default=1000)
+# Most items a bulk write request may hold, and items written per transaction
+ROSTER_BULK_MAX_ITEMS = env.int("ROSTER_BULK_MAX_ITEMS", default=10000)
+ROSTER_BULK_CHUNK_SIZE = env.int("ROSTER_BULK_CHUNK_SIZE", default=500)
+# Seconds after which a pending run no longer counts as queued, as its task
+# was most likely lost
+ROSTER_QUEUE_MAX_AGE = env.int("ROSTER_QUEUE_MAX_AGE", default=60 * 60 * 6)
+# Bearer token required to scrape /metrics, when empty /metrics is only open
+# with DEBUG on
+METRICS_TOKEN = env.str("METRICS_TOKEN", default="")
+
 # DRF
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.SessionAuthentication",
+        # Listed first so unauthenticated requests get 401 and WWW-Authenticate
         "rest_framework.authentication.TokenAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
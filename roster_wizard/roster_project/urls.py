@@ -8,6 +8,8 @@ from django.contrib.auth.views import (
     PasswordChangeView,
 )
 
+from rosters.views import metrics, query_profile
+
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularRedocView,
@@ -15,6 +17,11 @@ from drf_spectacular.views import (
 )
 
 urlpatterns = [
+    path(
+        "dbmanage/query_profile/",
+        admin.site.admin_view(query_profile),
+        name="query_profile",
+    ),
     path("dbmanage/", admin.site.urls),
     path("accounts/", include("allauth.urls")),
     path(
@@ -45,6 +52,7 @@ urlpatterns = [
         name="swagger-ui",
     ),
     path("users/", include("users.urls")),
+    path("metrics", metrics, name="metrics"),
     path("", include("pages.urls")),
 ]
 
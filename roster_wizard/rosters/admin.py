@@ -16,6 +16,7 @@ from .models import (
     Day,
     DayGroupDay,
     StaffRequest,
+    RosterRun,
 )
 
 admin.site.site_header = "Roster Wizard Database Administration"
@@ -69,6 +70,22 @@ class StaffRequestAdmin(admin.ModelAdmin):
     )
 
 
+class RosterRunAdmin(admin.ModelAdmin):
+    """Customise admin for RosterRun."""
+
+    model = RosterRun
+    list_display = (
+        "created",
+        "start_date",
+        "status",
+        "solver_status",
+        "solve_time",
+        "peak_memory",
+        "resident_memory",
+    )
+    list_filter = ("status", "solver_status")
+
+
 admin.site.register(Leave, LeaveAdmin)
 admin.site.register(Role)
 admin.site.register(Shift)
@@ -81,3 +98,4 @@ admin.site.register(DayGroup)
 admin.site.register(Day)
 admin.site.register(DayGroupDay)
 admin.site.register(StaffRequest, StaffRequestAdmin)
+admin.site.register(RosterRun, RosterRunAdmin)
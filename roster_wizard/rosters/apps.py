@@ -7,3 +7,8 @@ class RostersConfig(AppConfig):
     """Configure app name."""
 
     name = "rosters"
+
+    def ready(self):
+        """Connect signals and register checks."""
+        # pylint: disable=import-outside-toplevel,unused-import
+        from . import checks, signals
@@ -0,0 +1,291 @@
+"""Bulk writes.
+
+Applies many leave days, staff requests or assignments at once for systems
+that sync with the roster. References to staff members and shifts are
+checked in one query each, then items are written in chunks of
+ROSTER_BULK_CHUNK_SIZE with bulk queries, each chunk in a transaction of its
+own so that a failure only rolls back its chunk. Every item gets a result
+with its index in the request, a status and the id written or its errors.
+"""
+
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+
+from .cache import invalidate_dates
+from .models import Leave, Shift, StaffRequest, TimeSlot
+
+BulkResult = namedtuple("BulkResult", "index status id errors")
+
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+INVALID = "invalid"
+FAILED = "failed"
+
+
+def invalid(index, errors):
+    """Get the result of an item that failed validation."""
+    return BulkResult(index=index, status=INVALID, id=None, errors=errors)
+
+
+def _chunks(items):
+    """Split items into chunks of the bulk chunk size."""
+    size = settings.ROSTER_BULK_CHUNK_SIZE
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+def _check(items, key, references):
+    """Split items into valid items and results of invalid ones.
+
+    items are (index, data) pairs and key gets the fields that identify the
+    object an item writes. references map a field to the model it refers
+    to, whose existence is checked in one query per model.
+    """
+    existing = {
+        field: set(
+            model.objects.filter(id__in={data[field] for _, data in items}).values_list(
+                "id", flat=True
+            )
+        )
+        for field, model in references.items()
+    }
+    valid = []
+    results = []
+    first = {}
+    for index, data in items:
+        errors = {
+            field: [f"{model.__name__} {data[field]} does not exist."]
+            for field, model in references.items()
+            if data[field] not in existing[field]
+        }
+        if not errors and key(data) in first:
+            errors = {"non_field_errors": [f"Repeats item {first[key(data)]}."]}
+        if errors:
+            results.append(invalid(index, errors))
+        else:
+            first[key(data)] = index
+            valid.append((index, data))
+    return valid, results
+
+
+def _write_chunks(items, write, collection):
+    """Write items a chunk at a time, invalidating the dates changed."""
+    results = []
+    for chunk in _chunks(items):
+        try:
+            with transaction.atomic():
+                chunk_results = write(chunk)
+        except IntegrityError as error:
+            results.extend(
+                BulkResult(
+                    index=index,
+                    status=FAILED,
+                    id=None,
+                    errors={"non_field_errors": [str(error)]},
+                )
+                for index, _ in chunk
+            )
+            continue
+        results.extend(chunk_results)
+        changed = {
+            data["date"]
+            for (_, data), result in zip(chunk, chunk_results)
+            if result.status != UNCHANGED
+        }
+        if changed:
+            # Bulk changes send no signals
+            invalidate_dates(changed, [collection])
+    return results
+
+
+def _write_leave_chunk(chunk):
+    """Create or update the leave of a chunk."""
+    stored = {
+        (staff_id, date): (leave_id, description)
+        for leave_id, staff_id, date, description in Leave.objects.filter(
+            staff_member_id__in={data["staff_member"] for _, data in chunk},
+            date__in={data["date"] for _, data in chunk},
+        )
+        .order_by()
+        .values_list("id", "staff_member_id", "date", "description")
+    }
+    statuses = []
+    created = []
+    updated = []
+    for _, data in chunk:
+        key = (data["staff_member"], data["date"])
+        if key not in stored:
+            statuses.append(CREATED)
+            created.append(
+                Leave(
+                    staff_member_id=data["staff_member"],
+                    date=data["date"],
+                    description=data["description"],
+                )
+            )
+        elif stored[key][1] != data["description"]:
+            statuses.append(UPDATED)
+            updated.append(Leave(id=stored[key][0], description=data["description"]))
+        else:
+            statuses.append(UNCHANGED)
+    Leave.objects.bulk_create(created)
+    Leave.objects.bulk_update(updated, ["description"])
+    ids = iter(leave.id for leave in created)
+    return [
+        BulkResult(
+            index,
+            status,
+            next(ids)
+            if status == CREATED
+            else stored[(data["staff_member"], data["date"])][0],
+            None,
+        )
+        for (index, data), status in zip(chunk, statuses)
+    ]
+
+
+def write_leave(items):
+    """Create leave, or update the description of leave on the same day.
+
+    items are (index, data) pairs with staff_member, date and description.
+    """
+    valid, results = _check(
+        items,
+        key=lambda data: (data["staff_member"], data["date"]),
+        references={"staff_member": get_user_model()},
+    )
+    results.extend(_write_chunks(valid, _write_leave_chunk, "leave"))
+    return sorted(results)
+
+
+def _write_staff_request_chunk(chunk):
+    """Create or update the staff requests of a chunk."""
+    stored = {
+        (staff_id, date, shift_id): (request_id, like, priority)
+        for request_id, staff_id, date, shift_id, like, priority in (
+            StaffRequest.objects.filter(
+                staff_member_id__in={data["staff_member"] for _, data in chunk},
+                date__in={data["date"] for _, data in chunk},
+            )
+            .order_by()
+            .values_list(
+                "id", "staff_member_id", "date", "shift_id", "like", "priority"
+            )
+        )
+    }
+    statuses = []
+    saved = []
+    for _, data in chunk:
+        key = (data["staff_member"], data["date"], data["shift"])
+        if key not in stored:
+            statuses.append(CREATED)
+        elif stored[key][1:] != (data["like"], data["priority"]):
+            statuses.append(UPDATED)
+        else:
+            statuses.append(UNCHANGED)
+            continue
+        saved.append(
+            StaffRequest(
+                staff_member_id=data["staff_member"],
+                date=data["date"],
+                shift_id=data["shift"],
+                like=data["like"],
+                priority=data["priority"],
+            )
+        )
+    # Upsert so that a request created concurrently is updated, not rejected
+    StaffRequest.objects.bulk_create(
+        saved,
+        update_conflicts=True,
+        unique_fields=["staff_member", "date", "shift"],
+        update_fields=["like", "priority"],
+    )
+    ids = iter(staff_request.id for staff_request in saved)
+    results = []
+    for (index, data), status in zip(chunk, statuses):
+        key = (data["staff_member"], data["date"], data["shift"])
+        request_id = stored[key][0] if key in stored else None
+        if status != UNCHANGED:
+            request_id = next(ids) or request_id
+        results.append(BulkResult(index, status, request_id, None))
+    return results
+
+
+def write_staff_requests(items):
+    """Create or update staff requests for a staff member, date and shift.
+
+    items are (index, data) pairs with staff_member, date, shift, like and
+    priority.
+    """
+    valid, results = _check(
+        items,
+        key=lambda data: (data["staff_member"], data["date"], data["shift"]),
+        references={"staff_member": get_user_model(), "shift": Shift},
+    )
+    results.extend(_write_chunks(valid, _write_staff_request_chunk, "staffrequest"))
+    return sorted(results)
+
+
+def _get_timeslots(cells):
+    """Get the ids of the timeslots of the dates of (date, shift id) cells."""
+    return {
+        (date, shift_id): timeslot_id
+        for timeslot_id, date, shift_id in TimeSlot.objects.filter(
+            date__in={date for date, _ in cells}
+        )
+        .order_by()
+        .values_list("id", "date", "shift_id")
+    }
+
+
+def _write_assignment_chunk(chunk):
+    """Assign the staff of a chunk to the timeslots of their shifts."""
+    TimeSlotStaffRelationship = TimeSlot.staff.through  # pylint: disable=invalid-name
+    cells = {(data["date"], data["shift"]) for _, data in chunk}
+    timeslots = _get_timeslots(cells)
+    missing = cells - timeslots.keys()
+    if missing:
+        # Ignore timeslots created by a concurrent request
+        TimeSlot.objects.bulk_create(
+            [TimeSlot(date=date, shift_id=shift_id) for date, shift_id in missing],
+            ignore_conflicts=True,
+        )
+        timeslots = _get_timeslots(cells)
+    stored = set(
+        TimeSlotStaffRelationship.objects.filter(
+            timeslot_id__in={timeslots[cell] for cell in cells}
+        ).values_list("timeslot_id", "customuser_id")
+    )
+    results = []
+    created = []
+    for index, data in chunk:
+        timeslot_id = timeslots[(data["date"], data["shift"])]
+        if (timeslot_id, data["staff"]) in stored:
+            results.append(BulkResult(index, UNCHANGED, timeslot_id, None))
+        else:
+            results.append(BulkResult(index, CREATED, timeslot_id, None))
+            created.append(
+                TimeSlotStaffRelationship(
+                    timeslot_id=timeslot_id, customuser_id=data["staff"]
+                )
+            )
+    TimeSlotStaffRelationship.objects.bulk_create(created, ignore_conflicts=True)
+    return results
+
+
+def write_assignments(items):
+    """Assign staff members to the shifts of dates, creating missing timeslots.
+
+    items are (index, data) pairs with staff, date and shift. Results carry
+    the id of the timeslot assigned.
+    """
+    valid, results = _check(
+        items,
+        key=lambda data: (data["staff"], data["date"], data["shift"]),
+        references={"staff": get_user_model(), "shift": Shift},
+    )
+    results.extend(_write_chunks(valid, _write_assignment_chunk, "timeslot"))
+    return sorted(results)
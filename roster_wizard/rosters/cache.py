@@ -0,0 +1,164 @@
+"""Roster cache.
+
+Roster reads are cached under keys that include a version for every date in
+the period and a global version. Writes replace the version of the dates
+they touch, or the global version for changes that affect every period, so
+stale entries are never read again and simply expire.
+
+Versions are random tokens rather than counters so that an evicted version
+can never resurrect an older entry. Each token is stored with the time it was
+created, so that a period also has a last modified time for conditional GETs.
+Collections, such as all leave, have versions of their own for list views
+that are not limited to a period.
+
+Async views use the a-prefixed variants, which only leave the event loop to
+build a missing entry.
+"""
+
+import datetime
+import hashlib
+import time
+import uuid
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+
+GLOBAL_VERSION_KEY = "roster:version"
+
+Stamp = namedtuple("Stamp", "version last_modified")
+
+
+def _date_version_key(date):
+    """Cache key of the version of a date, datetime or ISO date string."""
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    elif isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    return f"roster:version:{date.isoformat()}"
+
+
+def _collection_version_key(collection):
+    """Cache key of the version of a collection."""
+    return f"roster:version:collection:{collection}"
+
+
+def _new_version():
+    """Create a new version token with its creation time."""
+    return (uuid.uuid4().hex, time.time())
+
+
+def _stamp_keys(dates, collections):
+    """Cache keys of the versions making up a stamp."""
+    return (
+        [GLOBAL_VERSION_KEY]
+        + [_date_version_key(date) for date in dates]
+        + [_collection_version_key(collection) for collection in collections]
+    )
+
+
+def _combine(keys, versions):
+    """Combine the versions of keys into a stamp."""
+    version = hashlib.md5(
+        "".join(versions[key][0] for key in keys).encode(), usedforsecurity=False
+    ).hexdigest()
+    last_modified = datetime.datetime.fromtimestamp(
+        max(versions[key][1] for key in keys), tz=datetime.timezone.utc
+    )
+    return Stamp(version=version, last_modified=last_modified)
+
+
+def get_stamp(dates=(), collections=()):
+    """Get the combined version and last modified time of dates and collections."""
+    keys = _stamp_keys(dates, collections)
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), timeout=None)
+        versions.update(cache.get_many(missing))
+    return _combine(keys, versions)
+
+
+async def aget_stamp(dates=(), collections=()):
+    """Get the combined version and last modified time asynchronously."""
+    keys = _stamp_keys(dates, collections)
+    versions = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            await cache.aadd(key, _new_version(), timeout=None)
+        versions.update(await cache.aget_many(missing))
+    return _combine(keys, versions)
+
+
+def get_version(dates):
+    """Get the combined version of the dates of a roster period."""
+    return get_stamp(dates).version
+
+
+async def aget_version(dates):
+    """Get the combined version of the dates of a roster period asynchronously."""
+    return (await aget_stamp(dates)).version
+
+
+def get_collection_version(collection):
+    """Get the version of one collection, unaffected by the global version."""
+    key = _collection_version_key(collection)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version[0]
+
+
+async def aget_collection_version(collection):
+    """Get the version of one collection asynchronously."""
+    key = _collection_version_key(collection)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, _new_version(), timeout=None)
+        version = await cache.aget(key)
+    return version[0]
+
+
+def invalidate_dates(dates, collections=()):
+    """Invalidate cached roster data for dates and the collections changed."""
+    versions = {_date_version_key(date): _new_version() for date in dates}
+    versions.update(
+        (_collection_version_key(collection), _new_version())
+        for collection in collections
+    )
+    cache.set_many(versions, timeout=None)
+
+
+def invalidate_all():
+    """Invalidate all cached roster data."""
+    cache.set(GLOBAL_VERSION_KEY, _new_version(), timeout=None)
+
+
+def _data_key(kind, dates, version):
+    """Cache key of roster data for the period of dates at version."""
+    return f"roster:{kind}:{dates[0] if dates else ''}:{len(dates)}:{version}"
+
+
+def get_or_build(kind, dates, build):
+    """Get cached roster data for the period of dates, building it on a miss."""
+    key = _data_key(kind, dates, get_version(dates))
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout=settings.ROSTER_CACHE_TIMEOUT)
+    return value
+
+
+async def aget_or_build(kind, dates, build):
+    """Get cached roster data asynchronously, building it in a thread on a miss."""
+    key = _data_key(kind, dates, await aget_version(dates))
+    value = await cache.aget(key)
+    if value is None:
+        value = await sync_to_async(build)()
+        await cache.aset(key, value, timeout=settings.ROSTER_CACHE_TIMEOUT)
+    return value
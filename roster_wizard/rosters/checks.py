@@ -0,0 +1,25 @@
+"""System checks."""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Caches that are private to one process
+LOCAL_CACHES = (
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):  # pylint: disable=unused-argument
+    """Check that the cache is shared by the web and Celery processes."""
+    if settings.CACHES["default"]["BACKEND"] not in LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            "The default cache is private to each process, so roster changes "
+            "only invalidate the cache of the process that made them.",
+            hint="Set CACHE_URL to a shared cache, e.g. redis://redis:6379/1.",
+            id="rosters.E001",
+        )
+    ]
@@ -1,12 +1,13 @@
 """Context Processors."""
 
 # from django.conf import settings
-from .models import RosterSettings
+from .reference import get_reference_data
 
 
 def get_roster_name(request):
     """Get roster name from settings."""
-    if RosterSettings.objects.exists():
-        return {"roster_name": RosterSettings.objects.first().roster_name}
+    roster_settings = get_reference_data().roster_settings
+    if roster_settings is not None:
+        return {"roster_name": roster_settings.roster_name}
     else:
         return {"roster_name": "No Location Set"}
@@ -0,0 +1,214 @@
+"""Roster editing.
+
+Loads the assignments of a roster period as a compact staff by date grid of
+shift codes and applies edits to individual (staff, date) cells. Each date
+has a version, a digest of its assignments and leave read from the database,
+so the check holds whichever process changed it. Edits carry the version of
+their date the editor loaded and are rejected with RosterEditConflict if
+that date has changed since, leaving editors of other dates undisturbed.
+"""
+
+import hashlib
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from .cache import invalidate_dates
+from .logic import RosterEditConflict
+from .models import Leave, TimeSlot
+from .period import get_period_calendar
+from .reference import get_reference_data
+
+AssignmentGrid = namedtuple(
+    "AssignmentGrid",
+    "versions dates staff_ids staff_names shift_ids shift_types cells leave",
+)
+
+CellEdit = namedtuple("CellEdit", "staff_id date shift_id version")
+
+
+def create_missing_timeslots(dates):
+    """Create the timeslots of the shifts on dates that do not exist yet."""
+    if not dates:
+        return
+    calendar = get_period_calendar(dates)
+    missing = [
+        TimeSlot(date=dates[number - 1], shift_id=shift.id)
+        for number, shifts in calendar.day_shifts.items()
+        if number <= len(dates)
+        for shift in shifts
+        if shift.id not in calendar.timeslots[dates[number - 1]]
+    ]
+    if missing:
+        # Ignore timeslots created by a concurrent request
+        TimeSlot.objects.bulk_create(missing, ignore_conflicts=True)
+        # Bulk creation sends no signals
+        invalidate_dates(dates, ["timeslot"])
+
+
+def _get_date_rows(dates):
+    """Get the (staff id, date, shift id) assignments and (staff id, date) leave."""
+    assignments = list(
+        TimeSlot.staff.through.objects.filter(timeslot__date__in=dates)
+        .order_by("timeslot__date", "timeslot__shift__shift_type")
+        .values_list("customuser_id", "timeslot__date", "timeslot__shift_id")
+    )
+    leave = list(
+        Leave.objects.filter(date__in=dates)
+        .order_by("staff_member_id", "date")
+        .values_list("staff_member_id", "date")
+    )
+    return assignments, leave
+
+
+def _get_date_versions(dates, assignments, leave):
+    """Digest the assignments and leave of each date."""
+    assigned = {date: [] for date in dates}
+    on_leave = {date: [] for date in dates}
+    for staff_id, date, shift_id in assignments:
+        assigned[date].append((staff_id, shift_id))
+    for staff_id, date in leave:
+        on_leave[date].append(staff_id)
+    return {
+        date: hashlib.sha256(
+            repr((sorted(assigned[date]), sorted(on_leave[date]))).encode()
+        ).hexdigest()[:16]
+        for date in dates
+    }
+
+
+def build_assignment_grid(dates):
+    """Build the assignment grid of dates.
+
+    Each cell is the index of the shift worked in shift_ids, None if not
+    rostered or a list of indexes if several shifts are worked that day.
+    Leave is a list of (staff index, date index) pairs and versions has the
+    version of each date.
+    """
+    assignments, period_leave = _get_date_rows(dates)
+    staff = list(
+        get_user_model()
+        .objects.order_by("last_name", "first_name")
+        .values_list("id", "last_name", "first_name")
+    )
+    shifts = [(shift.id, shift.shift_type) for shift in get_reference_data().shifts]
+    rows = {staff_id: index for index, (staff_id, _, _) in enumerate(staff)}
+    columns = {date: index for index, date in enumerate(dates)}
+    codes = {shift_id: index for index, (shift_id, _) in enumerate(shifts)}
+    cells = [[None] * len(dates) for _ in staff]
+    for staff_id, date, shift_id in assignments:
+        row = cells[rows[staff_id]]
+        column = columns[date]
+        if row[column] is None:
+            row[column] = codes[shift_id]
+        elif isinstance(row[column], list):
+            row[column].append(codes[shift_id])
+        else:
+            row[column] = [row[column], codes[shift_id]]
+    leave = [[rows[staff_id], columns[date]] for staff_id, date in period_leave]
+    return AssignmentGrid(
+        versions=list(_get_date_versions(dates, assignments, period_leave).values()),
+        dates=dates,
+        staff_ids=[staff_id for staff_id, _, _ in staff],
+        staff_names=[
+            f"{last_name}, {first_name}" for _, last_name, first_name in staff
+        ],
+        shift_ids=[shift_id for shift_id, _ in shifts],
+        shift_types=[shift_type for _, shift_type in shifts],
+        cells=cells,
+        leave=leave,
+    )
+
+
+def _create_edited_timeslots(edits):
+    """Create the timeslots the edits assign staff to that do not exist yet."""
+    wanted = {(edit.date, edit.shift_id) for edit in edits if edit.shift_id is not None}
+    if not wanted:
+        return
+    existing = set(
+        TimeSlot.objects.filter(date__in={date for date, _ in wanted}).values_list(
+            "date", "shift_id"
+        )
+    )
+    missing = wanted - existing
+    if missing:
+        # Ignore timeslots created by a concurrent request
+        TimeSlot.objects.bulk_create(
+            [TimeSlot(date=date, shift_id=shift_id) for date, shift_id in missing],
+            ignore_conflicts=True,
+        )
+        # Bulk creation sends no signals
+        invalidate_dates({date for date, _ in missing}, ["timeslot"])
+
+
+def apply_cell_edits(edits):
+    """Apply cell edits whose dates are still at the versions they carry.
+
+    Each edit replaces the shifts of a staff member on a date with the shift
+    given, or clears them if shift_id is None. Only the timeslots of the
+    edited dates are locked and read, so edits of other dates never wait or
+    conflict. Returns the new version of each edited date.
+    """
+    if not edits:
+        return {}
+    edited_dates = sorted({edit.date for edit in edits})
+    TimeSlotStaffRelationship = TimeSlot.staff.through  # pylint: disable=invalid-name
+    # The timeslots assigned must exist for the lock to cover them
+    _create_edited_timeslots(edits)
+    with transaction.atomic():
+        # Lock the edited dates so that concurrent edits of them are checked
+        # in turn, in id order so that they cannot deadlock
+        timeslots = {
+            (date, shift_id): timeslot_id
+            for timeslot_id, date, shift_id in TimeSlot.objects.filter(
+                date__in=edited_dates
+            )
+            .order_by("id")
+            .select_for_update()
+            .values_list("id", "date", "shift_id")
+        }
+        current = _get_date_versions(edited_dates, *_get_date_rows(edited_dates))
+        if any(current[edit.date] != edit.version for edit in edits):
+            raise RosterEditConflict(current)
+
+        wanted = {
+            (timeslots[(edit.date, edit.shift_id)], edit.staff_id)
+            for edit in edits
+            if edit.shift_id is not None
+        }
+        cells = Q()
+        for edit in edits:
+            cells |= Q(customuser_id=edit.staff_id, timeslot__date=edit.date)
+        stored = {
+            (timeslot_id, staff_id): relationship_id
+            for relationship_id, timeslot_id, staff_id in (
+                TimeSlotStaffRelationship.objects.filter(cells).values_list(
+                    "id", "timeslot_id", "customuser_id"
+                )
+            )
+        }
+        TimeSlotStaffRelationship.objects.filter(
+            id__in=[
+                relationship_id
+                for assignment, relationship_id in stored.items()
+                if assignment not in wanted
+            ]
+        ).delete()
+        TimeSlotStaffRelationship.objects.bulk_create(
+            [
+                TimeSlotStaffRelationship(
+                    timeslot_id=timeslot_id, customuser_id=staff_id
+                )
+                for timeslot_id, staff_id in wanted
+                if (timeslot_id, staff_id) not in stored
+            ]
+        )
+        # Bulk changes send no signals, invalidate now so that a concurrent
+        # edit waiting on the lock sees the change
+        invalidate_dates(edited_dates, ["timeslot"])
+        versions = _get_date_versions(edited_dates, *_get_date_rows(edited_dates))
+    # And again once committed so that nothing read before the commit is cached
+    invalidate_dates(edited_dates, ["timeslot"])
+    return versions
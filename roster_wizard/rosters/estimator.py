@@ -0,0 +1,241 @@
+"""Model size estimator.
+
+Predicts the number of variables and constraints RosterSolver will create,
+and from those the memory and time a solve will need, so that oversized
+generations can be rejected before they are queued.
+"""
+
+import datetime
+import statistics
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+
+from .models import (
+    Leave,
+    Role,
+    RosterRun,
+    ShiftSequence,
+    ShiftSequenceShift,
+    SkillMixRule,
+    TimeSlot,
+)
+from .reference import get_reference_data
+
+
+ProblemSize = namedtuple(
+    "ProblemSize",
+    "num_days num_roles timeslots previous_timeslots worker_roles "
+    "workers_with_roles workers_one_shift_per_day workers_shifts_per_roster "
+    "leave_roles skill_mix_timeslots skill_mix_rule_timeslots sequence_positions "
+    "sequence_rules",
+)
+Estimate = namedtuple("Estimate", "variables constraints memory solve_time over_budget")
+
+REJECT = "reject"
+DOWNGRADE = "downgrade"
+
+
+def get_problem_size_from_snapshot(snapshot):
+    """Count the problem dimensions of a RosterSnapshot."""
+    num_days = snapshot.num_days
+    current = [timeslot for timeslot in snapshot.timeslots if timeslot.day >= 0]
+    timeslots_per_shift = Counter(timeslot.shift_id for timeslot in current)
+    rules_per_shift = {
+        shift_id: len(rules) for shift_id, rules in snapshot.skill_mix_rules.items()
+    }
+    roles_per_worker = {worker.id: len(worker.role_ids) for worker in snapshot.workers}
+    positions_per_sequence = {
+        shiftsequence.id: len(shiftsequence.positions)
+        for shiftsequence in snapshot.shift_sequences
+    }
+    sequences = [
+        sequence_id
+        for worker in snapshot.workers
+        for sequence_id in worker.sequence_ids
+    ]
+    return ProblemSize(
+        num_days=num_days,
+        num_roles=len(snapshot.role_ids),
+        timeslots=len(current),
+        previous_timeslots=len(snapshot.timeslots) - len(current),
+        worker_roles=sum(roles_per_worker.values()),
+        workers_with_roles=sum(1 for roles in roles_per_worker.values() if roles),
+        workers_one_shift_per_day=sum(
+            1 for worker in snapshot.workers if worker.enforce_one_shift_per_day
+        ),
+        workers_shifts_per_roster=sum(
+            1 for worker in snapshot.workers if worker.enforce_shifts_per_roster
+        ),
+        leave_roles=sum(roles_per_worker[worker_id] for worker_id, _ in snapshot.leave),
+        skill_mix_timeslots=sum(
+            count * rules_per_shift.get(shift_id, 0)
+            for shift_id, count in timeslots_per_shift.items()
+        ),
+        skill_mix_rule_timeslots=sum(
+            count
+            for shift_id, count in timeslots_per_shift.items()
+            if rules_per_shift.get(shift_id)
+        ),
+        sequence_positions=sum(
+            positions_per_sequence[sequence_id] for sequence_id in sequences
+        ),
+        sequence_rules=len(sequences),
+    )
+
+
+def get_problem_size(start_date):
+    """Count the problem dimensions for a roster period from the database."""
+    start_date = start_date.date()
+    reference = get_reference_data()
+    num_days = reference.day_count
+    previous_date_range = [
+        start_date - datetime.timedelta(days=num_days),
+        start_date - datetime.timedelta(days=1),
+    ]
+    date_range = [start_date, start_date + datetime.timedelta(days=num_days - 1)]
+    days_per_daygroup = Counter(
+        daygroup_id
+        for number, daygroup_ids in reference.daygroups.items()
+        if number <= num_days
+        for daygroup_id in daygroup_ids
+    )
+    timeslots_per_shift = {
+        shift.id: days_per_daygroup[shift.daygroup_id] for shift in reference.shifts
+    }
+    rules_per_shift = Counter(
+        SkillMixRule.objects.prefetch_related(None).values_list("shift_id", flat=True)
+    )
+    workers = list(
+        get_user_model()
+        .objects.filter(available=True)
+        .annotate(num_roles=Count("roles", distinct=True))
+        .values_list(
+            "id",
+            "num_roles",
+            "enforce_one_shift_per_day",
+            "enforce_shifts_per_roster",
+        )
+    )
+    roles_per_worker = {worker[0]: worker[1] for worker in workers}
+    positions_per_sequence = {
+        sequence_id: num_positions
+        for sequence_id, num_positions in ShiftSequenceShift.objects.values(
+            "shiftsequence_id"
+        )
+        .annotate(num_positions=Count("position", distinct=True))
+        .values_list("shiftsequence_id", "num_positions")
+    }
+    sequences = list(
+        ShiftSequence.staff.through.objects.filter(
+            customuser_id__in=roles_per_worker
+        ).values_list("shiftsequence_id", flat=True)
+    )
+    leave_workers = Leave.objects.filter(
+        date__range=date_range, staff_member__in=roles_per_worker
+    ).values_list("staff_member_id", flat=True)
+    timeslots = sum(timeslots_per_shift.values())
+    return ProblemSize(
+        num_days=num_days,
+        num_roles=Role.objects.count(),
+        timeslots=timeslots,
+        previous_timeslots=TimeSlot.objects.filter(
+            date__range=previous_date_range
+        ).count(),
+        worker_roles=sum(roles_per_worker.values()),
+        workers_with_roles=sum(1 for roles in roles_per_worker.values() if roles),
+        workers_one_shift_per_day=sum(1 for worker in workers if worker[2]),
+        workers_shifts_per_roster=sum(1 for worker in workers if worker[3]),
+        leave_roles=sum(roles_per_worker[worker_id] for worker_id in leave_workers),
+        skill_mix_timeslots=sum(
+            count * rules_per_shift[shift_id]
+            for shift_id, count in timeslots_per_shift.items()
+        ),
+        skill_mix_rule_timeslots=sum(
+            count
+            for shift_id, count in timeslots_per_shift.items()
+            if rules_per_shift[shift_id]
+        ),
+        sequence_positions=sum(
+            positions_per_sequence.get(sequence_id, 0) for sequence_id in sequences
+        ),
+        sequence_rules=len(sequences),
+    )
+
+
+def count_variables(size):
+    """Predict the number of model variables."""
+    decision_vars = (
+        size.worker_roles * size.timeslots
+        + size.workers_with_roles * size.previous_timeslots
+    )
+    sequence_vars = 2 * size.num_days * size.sequence_positions
+    return decision_vars + size.skill_mix_timeslots + sequence_vars
+
+
+def count_constraints(size):
+    """Predict the number of model constraints."""
+    timeslots_per_day = size.timeslots / size.num_days if size.num_days else 0
+    # Sequence positions only constrain previous period days that were rostered
+    previous_fraction = (
+        min(size.previous_timeslots / size.timeslots, 1) if size.timeslots else 0
+    )
+    return int(
+        size.workers_with_roles * size.previous_timeslots
+        + size.leave_roles * timeslots_per_day
+        + size.num_days * size.workers_one_shift_per_day
+        + 2 * size.workers_shifts_per_roster
+        + size.skill_mix_rule_timeslots
+        + size.skill_mix_timeslots * size.num_roles
+        + size.num_days * size.sequence_positions * (1 + previous_fraction)
+        + 2 * size.num_days * size.sequence_rules
+        + 2 * size.timeslots
+    )
+
+
+def predict_memory(variables, constraints):
+    """Predict peak solver process memory in bytes."""
+    return (
+        settings.ROSTER_SOLVER_MEMORY_BASE
+        + variables * settings.ROSTER_SOLVER_MEMORY_PER_VARIABLE
+        + constraints * settings.ROSTER_SOLVER_MEMORY_PER_CONSTRAINT
+    )
+
+
+def predict_solve_time(variables):
+    """Predict solve time in seconds from recent runs.
+
+    Uses the median seconds per variable of recent successful runs, returns
+    None when there is no history to calibrate against.
+    """
+    runs = RosterRun.objects.filter(
+        status=RosterRun.SUCCEEDED, variables__gt=0, solve_time__isnull=False
+    ).values_list("solve_time", "variables")[: settings.ROSTER_ESTIMATE_HISTORY]
+    rates = [solve_time / run_variables for solve_time, run_variables in runs]
+    if not rates:
+        return None
+    return min(statistics.median(rates) * variables, settings.ROSTER_SOLVER_MAX_TIME)
+
+
+def estimate(size):
+    """Estimate model size, memory and solve time for a problem size."""
+    variables = count_variables(size)
+    constraints = count_constraints(size)
+    memory = predict_memory(variables, constraints)
+    return Estimate(
+        variables=variables,
+        constraints=constraints,
+        memory=memory,
+        solve_time=predict_solve_time(variables),
+        over_budget=(
+            memory > settings.ROSTER_MEMORY_BUDGET
+            or variables > settings.ROSTER_MAX_VARIABLES
+        ),
+    )
+
+
+def estimate_roster(start_date):
+    """Estimate model size, memory and solve time for a roster period."""
+    return estimate(get_problem_size(start_date))
@@ -0,0 +1,143 @@
+"""Roster export.
+
+Streams the roster of an arbitrary date range as CSV with one row per staff
+member per date. The rows are built one date at a time from queries read as
+they are consumed, so neither queries nor memory grow with the length of the
+range, under WSGI and ASGI alike.
+"""
+
+import csv
+import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from .grid import NOT_ROSTERED, get_grid_workers
+from .models import Leave, TimeSlot
+
+HEADER = ("Date", "Staff Member", "Roles", "Shifts", "Shift")
+
+
+class Echo:
+    """File-like object that returns what is written to it."""
+
+    def write(self, value):
+        """Return value instead of storing it."""
+        return value
+
+
+def export_filename(start_date, end_date):
+    """Get the filename of a roster export."""
+    return f"roster_{start_date.isoformat()}_{end_date.isoformat()}.csv"
+
+
+def _iter_dates(start_date, end_date):
+    """Iterate over the dates from start_date to end_date inclusive."""
+    for day in range((end_date - start_date).days + 1):
+        yield start_date + datetime.timedelta(days=day)
+
+
+def _iter_by_date(rows, dates):
+    """Iterate over the rows of each date of rows ordered by their date.
+
+    The date is the second item of each row.
+    """
+    rows = iter(rows)
+    row = next(rows, None)
+    for date in dates:
+        on_date = []
+        while row is not None and row[1] == date:
+            on_date.append(row)
+            row = next(rows, None)
+        yield on_date
+
+
+def iter_roster_rows(start_date, end_date):
+    """Iterate over roster rows from start_date to end_date inclusive.
+
+    Staff, assignments and leave are each read by one query whose results
+    are consumed one date at a time, so neither queries nor memory grow
+    with the length of the range.
+    """
+    workers = get_grid_workers()
+    positions = {worker.id: index for index, worker in enumerate(workers)}
+    date_range = [start_date, end_date]
+    dates = list(_iter_dates(start_date, end_date))
+    assignments = _iter_by_date(
+        TimeSlot.staff.through.objects.filter(timeslot__date__range=date_range)
+        .order_by("timeslot__date", "timeslot__shift__shift_type")
+        .values_list("customuser_id", "timeslot__date", "timeslot__shift__shift_type")
+        .iterator(),
+        dates,
+    )
+    leave = _iter_by_date(
+        Leave.objects.filter(date__range=date_range)
+        .order_by("date")
+        .values_list("staff_member_id", "date", "description")
+        .iterator(),
+        dates,
+    )
+    for date, assigned, away in zip(dates, assignments, leave):
+        cells = [NOT_ROSTERED] * len(workers)
+        for worker_id, _, shift_type in assigned:
+            position = positions[worker_id]
+            if cells[position] == NOT_ROSTERED:
+                cells[position] = shift_type
+            else:
+                cells[position] += f", {shift_type}"
+        for worker_id, _, description in away:
+            cells[positions[worker_id]] = description
+        date = date.isoformat()
+        for worker, cell in zip(workers, cells):
+            yield (
+                date,
+                worker.name,
+                worker.roles.strip(),
+                worker.shifts_per_roster,
+                cell,
+            )
+
+
+def iter_roster_csv(start_date, end_date):
+    """Iterate over CSV lines of the roster from start_date to end_date."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(HEADER)
+    for row in iter_roster_rows(start_date, end_date):
+        yield writer.writerow(row)
+
+
+def _read_batch(lines):
+    """Read the next ROSTER_EXPORT_BATCH_LINES lines."""
+    return list(islice(lines, settings.ROSTER_EXPORT_BATCH_LINES))
+
+
+async def aiter_roster_csv(start_date, end_date):
+    """Iterate asynchronously over CSV lines of the roster.
+
+    ASGI servers buffer synchronous iterators in full, so they are sent this
+    one, which reads ROSTER_EXPORT_BATCH_LINES lines at a time in the worker
+    thread that holds the export's queries.
+    """
+    lines = iter_roster_csv(start_date, end_date)
+    try:
+        while batch := await sync_to_async(_read_batch)(lines):
+            for line in batch:
+                yield line
+    finally:
+        await sync_to_async(lines.close)()
+
+
+def roster_csv_response(request, start_date, end_date):
+    """Stream the roster from start_date to end_date as a CSV attachment."""
+    if isinstance(request, ASGIRequest):
+        content = aiter_roster_csv(start_date, end_date)
+    else:
+        content = iter_roster_csv(start_date, end_date)
+    response = StreamingHttpResponse(content, content_type="text/csv")
+    response["Content-Disposition"] = (
+        f'attachment; filename="{export_filename(start_date, end_date)}"'
+    )
+    return response
@@ -2,6 +2,7 @@
 
 import datetime
 from django import forms
+from django.conf import settings
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 
@@ -137,6 +138,28 @@ class SelectBulkDeletionPeriodForm(forms.Form):
     end_date = forms.DateTimeField(widget=DateInput())
 
 
+class ExportRosterForm(forms.Form):
+    """Export Roster Form."""
+
+    start_date = forms.DateField(widget=DateInput())
+    end_date = forms.DateField(widget=DateInput())
+
+    def clean(self):
+        """Ensure the end date follows the start date within the export limit."""
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get("start_date")
+        end_date = cleaned_data.get("end_date")
+        if start_date is None or end_date is None:
+            return cleaned_data
+        if end_date < start_date:
+            raise ValidationError("End date must not be before start date...")
+        if (end_date - start_date).days + 1 > settings.ROSTER_EXPORT_MAX_DAYS:
+            raise ValidationError(
+                f"Exports are limited to {settings.ROSTER_EXPORT_MAX_DAYS} days..."
+            )
+        return cleaned_data
+
+
 class ShiftSequenceUpdateForm(ModelForm):
     """Shift Sequence Update Form."""
 
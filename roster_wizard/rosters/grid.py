@@ -0,0 +1,195 @@
+"""Roster grid.
+
+Builds the staff by date roster matrix shared by the roster pages, CSV
+download and API in a constant number of queries, whatever the number of
+staff or days. Grids are cached until a write invalidates their period.
+"""
+
+import datetime
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+
+from .cache import aget_or_build, get_or_build, get_version
+from .models import Leave, TimeSlot
+from .period import aget_day_shifts, get_day_shifts
+
+
+GridWorker = namedtuple("GridWorker", "id name roles shifts_per_roster")
+
+CompactGrid = namedtuple("CompactGrid", "version dates staff_ids codes cells leave")
+
+NOT_ROSTERED = "X"
+
+
+class RosterGrid(namedtuple("RosterGrid", "dates workers cells")):
+    """Roster as a list of dates, a list of workers and a worker by date matrix.
+
+    Each cell is the shift types worked that day joined by ", ", the leave
+    description if on leave, or "X" if not rostered.
+    """
+
+    __slots__ = ()
+
+    def rows(self):
+        """Iterate over (worker, cells) rows."""
+        return zip(self.workers, self.cells)
+
+
+def _period_dates(start_date, num_days):
+    """Get num_days dates starting at start_date."""
+    if isinstance(start_date, datetime.datetime):
+        start_date = start_date.date()
+    return [start_date + datetime.timedelta(days=day) for day in range(num_days)]
+
+
+def get_roster_dates(start_date, num_days=None):
+    """Get dates of the roster period starting at start_date."""
+    if num_days is None:
+        num_days = len(get_day_shifts())
+    return _period_dates(start_date, num_days)
+
+
+async def aget_roster_dates(start_date, num_days=None):
+    """Get dates of the roster period starting at start_date asynchronously."""
+    if num_days is None:
+        num_days = len(await aget_day_shifts())
+    return _period_dates(start_date, num_days)
+
+
+def get_grid_workers():
+    """Get the workers of roster grids, ordered by their first role and name."""
+    user_model = get_user_model()
+    roles = {}
+    for worker_id, role_name in (
+        user_model.roles.through.objects.order_by("role__role_name")
+        .values_list("customuser_id", "role__role_name")
+        .iterator()
+    ):
+        roles.setdefault(worker_id, []).append(role_name)
+    return sorted(
+        (
+            GridWorker(
+                id=worker_id,
+                name=f"{last_name}, {first_name}",
+                roles="".join(
+                    f"{role_name} " for role_name in roles.get(worker_id, ())
+                ),
+                shifts_per_roster=shifts_per_roster,
+            )
+            for worker_id, last_name, first_name, shifts_per_roster in (
+                user_model.objects.order_by("last_name", "first_name")
+                .values_list("id", "last_name", "first_name", "shifts_per_roster")
+                .iterator()
+            )
+        ),
+        key=lambda worker: roles.get(worker.id, [""])[0],
+    )
+
+
+def build_roster_grid(start_date, num_days=None):
+    """Build the roster grid for the period starting at start_date."""
+    dates = get_roster_dates(start_date, num_days)
+    workers = get_grid_workers()
+
+    rows = {worker.id: index for index, worker in enumerate(workers)}
+    columns = {date: index for index, date in enumerate(dates)}
+    cells = [[NOT_ROSTERED] * len(dates) for _ in workers]
+    if not dates:
+        return RosterGrid(dates=dates, workers=workers, cells=cells)
+    date_range = [dates[0], dates[-1]]
+    for worker_id, date, shift_type in (
+        TimeSlot.staff.through.objects.filter(timeslot__date__range=date_range)
+        .order_by("timeslot__date", "timeslot__shift__shift_type")
+        .values_list("customuser_id", "timeslot__date", "timeslot__shift__shift_type")
+        .iterator()
+    ):
+        row = cells[rows[worker_id]]
+        column = columns[date]
+        if row[column] == NOT_ROSTERED:
+            row[column] = shift_type
+        else:
+            row[column] += f", {shift_type}"
+    for worker_id, date, description in (
+        Leave.objects.filter(date__range=date_range)
+        .order_by()
+        .values_list("staff_member_id", "date", "description")
+        .iterator()
+    ):
+        cells[rows[worker_id]][columns[date]] = description
+    return RosterGrid(dates=dates, workers=workers, cells=cells)
+
+
+def get_roster_grid(start_date, num_days=None):
+    """Get the cached roster grid for the period starting at start_date."""
+    dates = get_roster_dates(start_date, num_days)
+    return get_or_build(
+        "grid",
+        dates,
+        lambda: build_roster_grid(dates[0] if dates else start_date, len(dates)),
+    )
+
+
+async def aget_roster_grid(start_date, num_days=None):
+    """Get the cached roster grid asynchronously."""
+    dates = await aget_roster_dates(start_date, num_days)
+    return await aget_or_build(
+        "grid",
+        dates,
+        lambda: build_roster_grid(dates[0] if dates else start_date, len(dates)),
+    )
+
+
+def build_compact_grid(grid, version):
+    """Encode a roster grid as small integer codes for integrations.
+
+    Codes are the shift types worked in a day, with "" first for not
+    rostered, and each cell is the index of its code. Leave is a string of
+    "0" and "1" per worker, "1" for each day on leave, whose cell is 0.
+    """
+    leave = [["0"] * len(grid.dates) for _ in grid.workers]
+    if grid.dates:
+        rows = {worker.id: index for index, worker in enumerate(grid.workers)}
+        columns = {date: index for index, date in enumerate(grid.dates)}
+        for worker_id, date in (
+            Leave.objects.filter(date__range=[grid.dates[0], grid.dates[-1]])
+            .order_by()
+            .values_list("staff_member_id", "date")
+        ):
+            leave[rows[worker_id]][columns[date]] = "1"
+    codes = [""] + sorted(
+        {
+            cell
+            for cells, on_leave in zip(grid.cells, leave)
+            for cell, day_leave in zip(cells, on_leave)
+            if cell != NOT_ROSTERED and day_leave == "0"
+        }
+    )
+    indexes = {code: index for index, code in enumerate(codes)}
+    return CompactGrid(
+        version=version,
+        dates=grid.dates,
+        staff_ids=[worker.id for worker in grid.workers],
+        codes=codes,
+        cells=[
+            [
+                0 if day_leave == "1" else indexes.get(cell, 0)
+                for cell, day_leave in zip(cells, on_leave)
+            ]
+            for cells, on_leave in zip(grid.cells, leave)
+        ],
+        leave=["".join(on_leave) for on_leave in leave],
+    )
+
+
+def get_compact_grid(start_date, num_days=None):
+    """Get the cached compact roster grid for the period starting at start_date."""
+    dates = get_roster_dates(start_date, num_days)
+    return get_or_build(
+        "compact_grid",
+        dates,
+        lambda: build_compact_grid(
+            get_roster_grid(dates[0] if dates else start_date, len(dates)),
+            get_version(dates),
+        ),
+    )
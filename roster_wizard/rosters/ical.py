@@ -0,0 +1,163 @@
+"""iCalendar feeds.
+
+Each staff member has a feed of their shifts and leave at a URL signed with
+the secret key, so calendar clients can subscribe without logging in. The
+token includes the staff member's calendar key, so a leaked URL is revoked
+by rotating the key. The feed version comes from the roster cache versions
+of its dates, so polling clients are answered with 304 Not Modified after a
+single query checking the key.
+"""
+
+import datetime
+import secrets
+
+from django.conf import settings
+from django.core import signing
+
+from .models import Leave, TimeSlot
+
+SIGNING_SALT = "rosters.ical"
+PRODUCT_ID = "-//Roster Wizard//Roster Wizard//EN"
+UID_DOMAIN = "roster-wizard"
+# Longest content line in octets, excluding the line break
+LINE_LENGTH = 75
+
+
+def rotate_calendar_key(staff_member):
+    """Give a staff member a new calendar key, revoking their feed URL."""
+    staff_member.calendar_key = secrets.token_urlsafe(24)
+    staff_member.save(update_fields=["calendar_key"])
+
+
+def get_calendar_token(staff_member):
+    """Get the signed token of the feed of a staff member."""
+    return signing.Signer(salt=SIGNING_SALT).sign(
+        f"{staff_member.pk}.{staff_member.calendar_key}"
+    )
+
+
+def get_calendar_staff_key(token):
+    """Get (staff member id, calendar key) of a token.
+
+    Raises BadSignature if the token is forged.
+    """
+    staff_id, separator, key = (
+        signing.Signer(salt=SIGNING_SALT).unsign(token).partition(".")
+    )
+    if not separator or not staff_id.isdigit():
+        raise signing.BadSignature("Malformed calendar token")
+    return int(staff_id), key
+
+
+def get_calendar_dates(today=None):
+    """Get the dates covered by calendar feeds."""
+    if today is None:
+        today = datetime.date.today()
+    start_date = today - datetime.timedelta(days=settings.ROSTER_CALENDAR_PAST_DAYS)
+    num_days = (
+        settings.ROSTER_CALENDAR_PAST_DAYS + settings.ROSTER_CALENDAR_FUTURE_DAYS + 1
+    )
+    return [start_date + datetime.timedelta(days=day) for day in range(num_days)]
+
+
+def _escape(text):
+    """Escape a TEXT property value."""
+    return (
+        str(text)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Fold a content line into lines of at most LINE_LENGTH octets."""
+    encoded = line.encode()
+    if len(encoded) <= LINE_LENGTH:
+        return [line]
+    lines = []
+    start = 0
+    # Continuation lines start with a space, which counts towards the length
+    limit = LINE_LENGTH
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Never split a multi-byte character
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        prefix = " " if lines else ""
+        lines.append(prefix + encoded[start:end].decode())
+        start = end
+        limit = LINE_LENGTH - 1
+    return lines
+
+
+def _event(uid, date, summary, stamp, start_time=None, end_time=None):
+    """Lines of an event, all day unless it has start and end times."""
+    if start_time is None or end_time is None:
+        start = f"DTSTART;VALUE=DATE:{date:%Y%m%d}"
+        end = f"DTEND;VALUE=DATE:{date + datetime.timedelta(days=1):%Y%m%d}"
+    else:
+        start_at = datetime.datetime.combine(date, start_time)
+        end_at = datetime.datetime.combine(date, end_time)
+        if end_at <= start_at:
+            end_at += datetime.timedelta(days=1)
+        # Floating times, in the local time of the roster
+        start = f"DTSTART:{start_at:%Y%m%dT%H%M%S}"
+        end = f"DTEND:{end_at:%Y%m%dT%H%M%S}"
+    return [
+        "BEGIN:VEVENT",
+        f"UID:{uid}@{UID_DOMAIN}",
+        f"DTSTAMP:{stamp:%Y%m%dT%H%M%SZ}",
+        start,
+        end,
+        f"SUMMARY:{_escape(summary)}",
+        "TRANSP:OPAQUE",
+        "END:VEVENT",
+    ]
+
+
+def build_calendar(staff_member, dates, last_modified):
+    """Build the iCalendar feed of a staff member's shifts and leave on dates."""
+    date_range = [dates[0], dates[-1]]
+    stamp = last_modified.astimezone(datetime.timezone.utc)
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODUCT_ID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+    ]
+    name = f"Roster {staff_member.first_name} {staff_member.last_name}"
+    lines.append(f"X-WR-CALNAME:{_escape(name)}")
+    for timeslot_id, date, shift_type, start_time, end_time in (
+        TimeSlot.staff.through.objects.filter(
+            customuser_id=staff_member.pk, timeslot__date__range=date_range
+        )
+        .order_by("timeslot__date", "timeslot__shift__shift_type")
+        .values_list(
+            "timeslot_id",
+            "timeslot__date",
+            "timeslot__shift__shift_type",
+            "timeslot__shift__start_time",
+            "timeslot__shift__end_time",
+        )
+    ):
+        lines.extend(
+            _event(
+                f"timeslot-{timeslot_id}-{staff_member.pk}",
+                date,
+                shift_type,
+                stamp,
+                start_time,
+                end_time,
+            )
+        )
+    for leave_id, date, description in (
+        Leave.objects.filter(staff_member_id=staff_member.pk, date__range=date_range)
+        .order_by("date")
+        .values_list("id", "date", "description")
+    ):
+        lines.extend(_event(f"leave-{leave_id}", date, description, stamp))
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(folded for line in lines for folded in _fold(line)) + "\r\n"
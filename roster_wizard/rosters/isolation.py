@@ -0,0 +1,69 @@
+"""Isolated solver process.
+
+Runs the roster solver in a short-lived child process so that the memory held
+by the CP-SAT model is handed back to the operating system after every solve.
+The snapshot is sent to the child on stdin and the result comes back on
+stdout, both pickled.
+
+This module must not import Django.
+"""
+
+import os
+import pickle
+import resource
+import subprocess
+import sys
+from functools import partial
+from pathlib import Path
+
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def _limit_memory(memory_limit):
+    """Cap the address space of the child process."""
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def run_isolated(snapshot, memory_limit, timeout=None):
+    """Solve snapshot in a child process with an address space cap.
+
+    Raises ChildProcessError if the child fails, e.g. on hitting the cap.
+    """
+    # Fewer malloc arenas keeps the solver threads' address space within the cap
+    env = dict(os.environ, MALLOC_ARENA_MAX="2")
+    try:
+        process = subprocess.run(
+            [sys.executable, "-m", "rosters.isolation"],
+            input=pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL),
+            capture_output=True,
+            cwd=PROJECT_DIR,
+            env=env,
+            timeout=timeout,
+            preexec_fn=partial(_limit_memory, memory_limit),
+            check=False,
+        )
+    except subprocess.TimeoutExpired as error:
+        raise ChildProcessError(
+            f"Solver process timed out after {timeout} seconds"
+        ) from error
+    if process.returncode != 0:
+        errors = process.stderr.decode(errors="replace").strip().splitlines()
+        raise ChildProcessError(
+            f"Solver process exited with code {process.returncode} "
+            f"(memory limit {memory_limit} bytes): {errors[-1] if errors else ''}"
+        )
+    return pickle.loads(process.stdout)
+
+
+def main():
+    """Solve the snapshot read from stdin and write the result to stdout."""
+    from .solver import RosterSolver  # pylint: disable=import-outside-toplevel
+
+    snapshot = pickle.load(sys.stdin.buffer)
+    result = RosterSolver(snapshot).solve()
+    pickle.dump(result, sys.stdout.buffer, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+if __name__ == "__main__":
+    main()
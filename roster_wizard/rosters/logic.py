@@ -2,16 +2,41 @@
 
 import datetime
 import logging
-import math
 import threading
 from collections import OrderedDict
 
-from ortools.sat.python import cp_model
+from django.conf import settings
 from django.contrib.auth import get_user_model
-
-# from django.db import connection, reset_queries
-
-from .models import Leave, Role, Shift, SkillMixRule, TimeSlot, Day, StaffRequest
+from django.db import connection
+
+from .cache import invalidate_dates
+from .estimator import (
+    count_constraints,
+    count_variables,
+    get_problem_size_from_snapshot,
+    predict_memory,
+)
+from .isolation import run_isolated
+from .models import (
+    Leave,
+    Role,
+    SkillMixRule,
+    SkillMixRuleRole,
+    ShiftSequenceShift,
+    TimeSlot,
+    StaffRequest,
+)
+from .period import get_day_shifts
+from .reference import get_reference_data
+from .profiling import Profiler, QueryCounter
+from .reports import build_staff_request_report
+from .snapshot import (
+    RosterSnapshot,
+    ShiftSequenceSpec,
+    TimeSlotSpec,
+    WorkerSpec,
+    unpack_assignments,
+)
 
 
 log = logging.getLogger(__name__)
@@ -29,32 +54,92 @@ class MaxConcurrentGenerationsExceeded(Exception):
     pass  # pylint: disable=unnecessary-pass
 
 
+class SolverProcessFailed(Exception):
+    """Exception for when the isolated solver process fails."""
+
+    pass  # pylint: disable=unnecessary-pass
+
+
+class MissingDayGroup(Exception):
+    """Exception for when a shift has no day group assigned."""
+
+    pass  # pylint: disable=unnecessary-pass
+
+
+class RosterGenerationCancelled(Exception):
+    """Exception for when a roster generation is cancelled between phases."""
+
+    pass  # pylint: disable=unnecessary-pass
+
+
+class RosterOverBudget(Exception):
+    """Exception for when a roster is estimated to exceed the memory budget."""
+
+    def __init__(self, estimate):
+        """Keep the estimate that exceeded the budget."""
+        super().__init__(
+            f"Estimated {estimate.memory // (1024 * 1024)}MB and "
+            f"{estimate.variables} variables exceeds the budget of "
+            f"{settings.ROSTER_MEMORY_BUDGET // (1024 * 1024)}MB and "
+            f"{settings.ROSTER_MAX_VARIABLES} variables"
+        )
+        self.estimate = estimate
+
+
+class RosterEditConflict(Exception):
+    """Exception for when a roster changed since the editor loaded it."""
+
+    def __init__(self, versions):
+        """Keep the current versions of the edited dates."""
+        super().__init__("Roster has changed since it was loaded")
+        self.versions = versions
+
+
 class RosterGenerator:
     """Roster generator."""
 
     _generation_lock = threading.Lock()
     _active_generations = 0
 
-    def __init__(self, start_date, max_concurrent=1):
+    def __init__(
+        self,
+        start_date,
+        max_concurrent=1,
+        isolated=None,
+        memory_limit=None,
+        progress=None,
+    ):
         """Create starting conditions.
 
         Args:
             start_date: The start date for roster generation
             max_concurrent: Maximum concurrent roster generations allowed (default: 1)
+            isolated: Solve in a child process with capped memory
+                (default: settings.ROSTER_SOLVER_ISOLATED)
+            memory_limit: Memory cap in bytes for an isolated solve
+                (default: estimated from the snapshot)
+            progress: Called with the name of each phase and the fraction of
+                phases done before the phase starts, and may raise
+                RosterGenerationCancelled to stop the generation
         """
         self.max_concurrent = max_concurrent
+        self.isolated = (
+            settings.ROSTER_SOLVER_ISOLATED if isolated is None else isolated
+        )
+        self.memory_limit = memory_limit
+        self.progress = progress
         self._acquired_lock = False
 
         # Initialize all data structures for roster generation."""
-        self.workers = get_user_model().objects.filter(available=True)
-        self.worker_lookup = {
-            worker.id: worker_num for worker_num, worker in enumerate(self.workers)
-        }
-        self.shifts = Shift.objects.all().order_by("shift_type")
-        self.shift_lookup = {
-            shift.id: shift_num for shift_num, shift in enumerate(self.shifts)
-        }
-        self.num_days = Day.objects.count()
+        self.workers = (
+            get_user_model()
+            .objects.filter(available=True)
+            .prefetch_related("roles", "shiftsequence_set")
+        )
+        reference = get_reference_data()
+        self.shifts = reference.shifts
+        self.num_days = reference.day_count
+        self.start_date = start_date.date()
         self.date_range = [
             start_date.date(),
             start_date.date() + datetime.timedelta(days=self.num_days - 1),
@@ -67,31 +152,20 @@ class RosterGenerator:
             start_date.date() - datetime.timedelta(days=self.num_days),
             start_date.date() + datetime.timedelta(days=self.num_days - 1),
         ]
-        self.leaves = Leave.objects.filter(date__range=self.date_range)
-        self.days = [day.number for day in Day.objects.order_by("number")]
         self.dates = [
             (start_date + datetime.timedelta(days=n)).date()
             for n in range(self.num_days)
         ]
-        self.date_lookup = {date: day_num for day_num, date in enumerate(self.dates)}
-        self.extended_dates = [
-            (
-                start_date
-                - datetime.timedelta(days=self.num_days)
-                + datetime.timedelta(days=n)
-            ).date()
-            for n in range(2 * self.num_days)
-        ]
-        self.model = cp_model.CpModel()
         self.complete = False
         self.timeslots = None
-        self.timeslots_lookup = {}
-        self.staff_requests = None
-        self.shift_decision_vars = None
-        self.invalid_shift_sequences = None
-        self.skill_mix_rules = None
-        self.intermediate_skill_mix_vars = None
-        self.solver = None
+        self.snapshot = None
+        self.result = None
+        self.staff_request_report = None
+        self.peak_memory = None
+        self.resident_memory = None
+        self.profiler = Profiler(
+            trace_memory=settings.ROSTER_PROFILE_MEMORY, queries=QueryCounter()
+        )
 
     def __enter__(self):
         """Context manager entry - acquire concurrency lock."""
@@ -127,17 +201,10 @@ class RosterGenerator:
 
     def _cleanup(self):
         """Clean up large data structures to free memory."""
-        # Clear large dictionaries and lists to help with garbage collection
-        if hasattr(self, "shift_decision_vars"):
-            self.shift_decision_vars = None
-        if hasattr(self, "staff_requests"):
-            self.staff_requests = None
-        if hasattr(self, "intermediate_skill_mix_vars"):
-            self.intermediate_skill_mix_vars = None
-        if hasattr(self, "model"):
-            self.model = None
-        if hasattr(self, "solver"):
-            self.solver = None
+        self.snapshot = None
+        self.timeslots = None
+        if self.result is not None:
+            self.result = self.result._replace(assignments=b"")
 
         log.debug("Roster generator resources cleaned up")
 
@@ -147,610 +214,217 @@ class RosterGenerator:
 
     def _create_timeslots(self):
         # Create timeslots
-        for shift in self.shifts:
-            daygroupdays = shift.daygroup.daygroupday_set.all()
-            for daygroupday in daygroupdays:
-                TimeSlot.objects.create(
-                    date=self.dates[daygroupday.day.number - 1], shift=shift
-                )
-        self.timeslots = TimeSlot.objects.filter(date__range=self.date_range)
-
-    def _create_timeslots_lookup(self):
-        # Create timeslot id lookup
-        for date in self.extended_dates:
-            timeslots_for_date = list(
-                TimeSlot.objects.filter(date=date).order_by("shift__shift_type")
-            )
-            self.timeslots_lookup[date] = timeslots_for_date
-
-    def _collect_staff_requests(self):
-        """Collect staff requests into friendly data structure."""
-        log.info("Staff request collection started...")
-        self.staff_requests = [
-            [[0 for _ in self.shifts] for _ in self.days] for worker in self.workers
-        ]
-        for staff_request in StaffRequest.objects.filter(date__range=self.date_range):
-            worker_num = self.worker_lookup[staff_request.staff_member.id]
-            day_num = self.date_lookup[staff_request.date]
-            shift_num = self.shift_lookup[staff_request.shift.id]
-            self.staff_requests[worker_num][day_num][shift_num] = (
-                staff_request.priority
-                if staff_request.like
-                else -staff_request.priority
-            )
-        log.info("Staff request collection completed...")
-
-    def _create_shift_decision_vars(self):
-        """Create shift decision variables.
-
-        shift_decision_vars[(n, r, d, t)]:
-        worker 'n' with role 'r' works on date 'd' in timeslot 't'
-        """
-        log.info("Shift decision variable creation started...")
-        self.shift_decision_vars = {
-            (worker.id, role.id, date, timeslot.id): self.model.NewBoolVar(
-                f"shift_n{worker.id}r{role.id}d{date}t{timeslot.id}"
-            )
-            for date in self.dates
-            for timeslot in self.timeslots_lookup[date]
-            for worker in self.workers
-            for role in worker.roles.all()
-        }
-        log.info("Shift decision variable creation completed...")
-
-    def _create_previous_shift_decision_vars(self):
-        """Create shift decision variables and fixed constraints
-        for previous roster period.
-        """
-        log.info("Creation of shift decision variables for previous period started...")
-        previous_timeslots = TimeSlot.objects.filter(
-            date__range=self.previous_date_range
-        )
-        for timeslot in previous_timeslots:
-            for worker in self.workers:
-                n = worker.id
-                roles = worker.roles.all()
-                if not roles:
-                    continue
-                r = roles[0].id
-                d = timeslot.date
-                t = timeslot.id
-                self.shift_decision_vars[(n, r, d, t)] = self.model.NewBoolVar(
-                    f"shift_n{n}r{r}d{d}t{t}"
-                )
-                if worker in timeslot.staff.all():
-                    self.model.Add(self.shift_decision_vars[(n, r, d, t)] == 1)
-                else:
-                    self.model.Add(self.shift_decision_vars[(n, r, d, t)] == 0)
-        log.info(
-            "Creation of shift decision variables for previous period completed..."
+        if any(shift.daygroup_id is None for shift in self.shifts):
+            raise MissingDayGroup("Every shift needs a day group.")
+        TimeSlot.objects.bulk_create(
+            [
+                TimeSlot(date=self.dates[number - 1], shift=shift)
+                for number, shifts in get_day_shifts().items()
+                for shift in shifts
+            ]
         )
+        # Bulk creation sends no signals
+        invalidate_dates(self.dates, ["timeslot"])
+        self.timeslots = TimeSlot.objects.filter(date__range=self.date_range)
 
-    def _exclude_leave_dates(self):
-        """Ensure staff members are not assigned to any shifts while on leave."""
-        log.info("Exclusion of leave dates started...")
-        for leave in self.leaves:
-            for role in leave.staff_member.roles.all():
-                for timeslot in self.timeslots_lookup[leave.date]:
-                    self.model.Add(
-                        self.shift_decision_vars[
-                            (
-                                leave.staff_member.id,
-                                role.id,
-                                timeslot.date,
-                                timeslot.id,
-                            )
-                        ]
-                        == 0
-                    )
-        log.info("Exclusion of leave dates completed...")
-
-    def _get_timeslot_ids(self):
-        """Map date and shift to timeslot ID."""
-        timeslots = TimeSlot.objects.filter(date__range=self.extended_date_range)
-        return {(timeslot.date, timeslot.shift): timeslot.id for timeslot in timeslots}
-
-    def _get_shift_sequence(self, shiftsequence):
-        """Create shift sequence for each rule.
-
-        Example: { 1: [ "E", "L", "N"], 2: ["E", "L"] }
-        """
-        shift_sequence = OrderedDict()
-        shiftsequenceshifts = shiftsequence.shiftsequenceshift_set.order_by("position")
-        for shiftsequenceshift in shiftsequenceshifts:
-            shift_sequence.setdefault(shiftsequenceshift.position, []).append(
-                shiftsequenceshift.shift
-            )
-        return shift_sequence
-
-    def _get_num_work_days_in_sequence(self, shift_seq):
-        """Get number of working days in shift sequence."""
-        return sum(shift_seq[position][0] is not None for position in shift_seq)
+    def _get_day(self, date):
+        """Get day offset of date from the start of the roster period."""
+        return (date - self.start_date).days
 
     def _get_all_day_nums_in_sequence(self, shiftsequence):
         """Get all day numbers in shift sequence."""
         daygroupday_set = shiftsequence.daygroup.daygroupday_set.all()
-        return [daygroupday.day.number for daygroupday in daygroupday_set]
-
-    def _get_non_working_shift_variables_in_sequence(
-        self,
-        date,
-        shift_seq,
-        all_day_nums_in_seq,
-        roles,
-        worker,
-    ):
-        """Find non-working shift variables in shift sequence.
-
-        A blank/None position (no shift) in a shift sequence rule means no shift worked
-        that day.
-
-        """
-        non_working_shift_vars_in_seq = {}
-        for day_num in shift_seq:
-            non_working_shift_vars_in_seq[day_num] = []
-            for shift in shift_seq[day_num]:
-                if shift is None:
-                    day_to_test = date + datetime.timedelta(days=day_num - 1)
-
-                    # Skip if day not in day group for sequence
-                    delta = (day_to_test - self.dates[0]).days
-                    daygroupday_num = (
-                        delta + self.num_days + 1 if delta < 0 else delta + 1
-                    )
-                    if daygroupday_num not in all_day_nums_in_seq:
-                        break
-
-                    for role in roles:
-                        try:
-                            for timeslot in self.timeslots_lookup[day_to_test]:
-                                non_working_shift_vars_in_seq[day_num].append(
-                                    self.shift_decision_vars[
-                                        (
-                                            worker.id,
-                                            role.id,
-                                            day_to_test,
-                                            timeslot.id,
-                                        )
-                                    ]
-                                )
-                        except KeyError:
-                            continue
-        return non_working_shift_vars_in_seq
-
-    def _get_working_shift_variables_in_sequence(
-        self,
-        date,
-        shift_seq,
-        all_days_in_seq,
-        roles,
-        worker,
-        timeslot_ids,
-    ):
-        """Find working day shift variables in shift sequence."""
-        working_shift_vars_in_seq = {}
-        for day_num in shift_seq:
-            working_shift_vars_in_seq[day_num] = []
-            for shift in shift_seq[day_num]:
-                if shift is not None:
-                    day_to_test = date + datetime.timedelta(days=day_num - 1)
-
-                    # Skip if day not in day group for sequence
-                    delta = (day_to_test - self.dates[0]).days
-                    daygroupday_num = (
-                        delta + self.num_days + 1 if delta < 0 else delta + 1
-                    )
-                    if daygroupday_num not in all_days_in_seq:
-                        break
-
-                    for role in roles:
-                        try:
-                            working_shift_vars_in_seq[day_num].append(
-                                self.shift_decision_vars[
-                                    (
-                                        worker.id,
-                                        role.id,
-                                        day_to_test,
-                                        timeslot_ids[(day_to_test, shift)],
-                                    )
-                                ]
-                            )
-                        except KeyError:
-                            continue
-        return working_shift_vars_in_seq
-
-    def _create_invalid_shift_sequence_lookup(self):
-        self.invalid_shift_sequences = {}
+        return frozenset(daygroupday.day.number for daygroupday in daygroupday_set)
+
+    def _collect_shift_sequences(self):
+        """Collect shift sequence positions, e.g. ((1, (E, L)), (2, (None,)))."""
+        positions = {}
+        for sequence_id, position, shift_id in ShiftSequenceShift.objects.order_by(
+            "shiftsequence_id", "position"
+        ).values_list("shiftsequence_id", "position", "shift_id"):
+            positions.setdefault(sequence_id, OrderedDict()).setdefault(
+                position, []
+            ).append(shift_id)
+        shift_sequences = {}
         for worker in self.workers:
             for shiftsequence in worker.shiftsequence_set.all():
-                invalid_shift_seq = self._get_shift_sequence(shiftsequence)
-                self.invalid_shift_sequences[(worker.id, shiftsequence.id)] = (
-                    invalid_shift_seq
+                if shiftsequence.id in shift_sequences:
+                    continue
+                shift_sequences[shiftsequence.id] = ShiftSequenceSpec(
+                    id=shiftsequence.id,
+                    positions=tuple(
+                        (position, tuple(shift_ids))
+                        for position, shift_ids in positions.get(
+                            shiftsequence.id, {}
+                        ).items()
+                    ),
+                    day_numbers=self._get_all_day_nums_in_sequence(shiftsequence),
                 )
-
-    def _enforce_invalid_shift_sequences(self):
-        """Enforce invalid shift sequences / staff rules.
-
-        Need to look at previous roster period also
-        """
-        log.info("Enforcement of invalid shift sequence rules started...")
-
-        timeslot_ids = self._get_timeslot_ids()
-
-        for worker in self.workers:
-            roles = worker.roles.all()
-            for shiftsequence in worker.shiftsequence_set.all():
-                invalid_shift_seq = self.invalid_shift_sequences[
-                    (worker.id, shiftsequence.id)
-                ]
-                all_days_in_seq = self._get_all_day_nums_in_sequence(shiftsequence)
-
-                for date in self.extended_dates:
-                    non_working_shift_vars_in_seq = (
-                        self._get_non_working_shift_variables_in_sequence(
-                            date,
-                            invalid_shift_seq,
-                            all_days_in_seq,
-                            roles,
-                            worker,
-                        )
-                    )
-                    working_shift_vars_in_seq = (
-                        self._get_working_shift_variables_in_sequence(
-                            date,
-                            invalid_shift_seq,
-                            all_days_in_seq,
-                            roles,
-                            worker,
-                            timeslot_ids,
-                        )
-                    )
-
-                    # Create intermediate vars
-                    intermediate_shift_sequence_vars = {
-                        (
-                            worker.id,
-                            date,
-                            shiftsequence.id,
-                            position,
-                        ): self.model.NewBoolVar(
-                            f"w{worker.id}d{date}sr{shiftsequence.id}p{position}"
-                        )
-                        for position in working_shift_vars_in_seq
-                    }
-
-                    # Enforce invalidation of non-working day in shift sequence
-                    for day_num, shift_vars in non_working_shift_vars_in_seq.items():
-                        if len(shift_vars) > 0:
-                            self.model.Add(sum(shift_vars) >= 1).OnlyEnforceIf(
-                                intermediate_shift_sequence_vars[
-                                    (worker.id, date, shiftsequence.id, day_num)
-                                ]
-                            )
-
-                    # Enforce invalidation of working day in shift sequence
-                    for day_num, shift_vars in working_shift_vars_in_seq.items():
-                        if len(shift_vars) > 0:
-                            self.model.Add(sum(shift_vars) == 0).OnlyEnforceIf(
-                                intermediate_shift_sequence_vars[
-                                    (worker.id, date, shiftsequence.id, day_num)
-                                ]
-                            )
-
-                    # Enforce one intermediate variable to be true
-                    # Only need to enforce one position per rule
-                    all_intermediate_shift_sequence_vars = [
-                        value for value in intermediate_shift_sequence_vars.values()
-                    ]
-                    self.model.Add(sum(all_intermediate_shift_sequence_vars) >= 1)
-
-        log.info("Enforcement of invalid shift sequence rules completed...")
+        return tuple(shift_sequences.values())
 
     def _collect_skill_mix_rules(self):
         """Collect skill mix rules into friendly structure."""
         log.info("Collection of skill mix rules started...")
-        self.skill_mix_rules = {}
-        for shift in self.shifts:
-            self.skill_mix_rules[shift.id] = []
-            skill_mix_rules = SkillMixRule.objects.filter(shift=shift)
-            for skill_mix_rule in skill_mix_rules:
-                skillmixruleroles = skill_mix_rule.skillmixrulerole_set.all()
-                role_count = {role.id: 0 for role in Role.objects.all()}
-                for skillmixrulerole in skillmixruleroles:
-                    role_count[skillmixrulerole.role.id] = skillmixrulerole.count
-                self.skill_mix_rules[shift.id].append(role_count)
-        log.info("Collection of skill mix rules completed...")
-
-    def _create_intermediate_skill_mix_vars(self):
-        """Collect intermediate shift rule variables."""
-        log.info("Creation of skill mix intermediate variables started...")
-        self.intermediate_skill_mix_vars = {
-            (timeslot.id, rule_num): self.model.NewBoolVar(f"t{timeslot.id}r{rule_num}")
-            for timeslot in self.timeslots
-            for rule_num, rule in enumerate(self.skill_mix_rules[timeslot.shift.id])
-        }
-        log.info("Creation of skill mix intermediate variables completed...")
-
-    def _enforce_one_skill_mix_rule_at_a_time(self):
-        """Only one skill mix rule at a time should be enforced."""
-        log.info("Enforcement of one skill mix rule at a time started...")
-        for timeslot in self.timeslots:
-            if len(self.skill_mix_rules[timeslot.shift.id]) >= 1:
-                self.model.Add(
-                    sum(
-                        self.intermediate_skill_mix_vars[(timeslot.id, rule_num)]
-                        for rule_num, rule in enumerate(
-                            self.skill_mix_rules[timeslot.shift.id]
-                        )
-                    )
-                    == 1
-                )
-        log.info("Enforcement of one skill mix rule at a time completed...")
-
-    def _enforce_skill_mix_rules(self):
-        """Enforce one skill mix rule per shift per timeslot."""
-        log.info("Enforcement of skill mix rules started...")
-        for shift_id in self.skill_mix_rules:
-            shift_timeslots = self.timeslots.filter(shift__id=shift_id)
-            if len(self.skill_mix_rules[shift_id]) >= 1:
-                for rule_num, rule in enumerate(self.skill_mix_rules[shift_id]):
-                    for role_id in rule:
-                        workers = self.workers.filter(roles__id=role_id)
-                        role_count = rule[role_id]
-                        for timeslot in shift_timeslots:
-                            self.model.Add(
-                                sum(
-                                    self.shift_decision_vars[
-                                        (
-                                            worker.id,
-                                            role_id,
-                                            timeslot.date,
-                                            timeslot.id,
-                                        )
-                                    ]
-                                    for worker in workers
-                                )
-                                == role_count
-                            ).OnlyEnforceIf(
-                                self.intermediate_skill_mix_vars[
-                                    (timeslot.id, rule_num)
-                                ]
-                            )
-        log.info("Enforcement of skill mix rules completed...")
-
-    def _enforce_one_shift_per_day(self):
-        """Assign at most one shift per day per worker."""
-        log.info("Restriction of staff to one shift per day started...")
-        for date in self.dates:
-            timeslots = TimeSlot.objects.filter(date=date)
-            for worker in self.workers:
-                roles = worker.roles.all()
-                if worker.enforce_one_shift_per_day:
-                    self.model.Add(
-                        sum(
-                            self.shift_decision_vars[
-                                (worker.id, role.id, date, timeslot.id)
-                            ]
-                            for role in roles
-                            for timeslot in timeslots
-                        )
-                        <= 1
-                    )
-        log.info("Restriction of staff to one shift per day completed...")
-
-    def _get_shifts_per_roster(self, worker):
-        """Get number of shifts to work in roster period."""
-        leave_days = self.leaves.filter(staff_member=worker).count()
-        work_fraction = 1 - (leave_days / self.num_days)
-        shifts_per_roster = work_fraction * worker.shifts_per_roster
-        if worker.max_shifts:
-            shifts_per_roster = math.ceil(shifts_per_roster)
-        else:
-            shifts_per_roster = math.floor(shifts_per_roster)
-        return shifts_per_roster
-
-    def _enforce_shifts_per_roster(self):
-        """Enforce shifts per roster for each worker."""
-        log.info("Enforcement of shifts per roster started...")
-        for worker in self.workers:
-            num_shifts_worked = sum(
-                self.shift_decision_vars[(worker.id, role.id, date, timeslot.id)]
-                for role in worker.roles.all()
-                for date in self.dates
-                for timeslot in self.timeslots_lookup[date]
+        rule_roles = {}
+        for rule_id, role_id, count in SkillMixRuleRole.objects.values_list(
+            "skillmixrule_id", "role_id", "count"
+        ):
+            rule_roles.setdefault(rule_id, []).append((role_id, count))
+        skill_mix_rules = {}
+        for rule_id, shift_id in (
+            SkillMixRule.objects.prefetch_related(None)
+            .order_by("id")
+            .values_list("id", "shift_id")
+        ):
+            skill_mix_rules.setdefault(shift_id, []).append(
+                tuple(rule_roles.get(rule_id, ()))
             )
-            if worker.enforce_shifts_per_roster:
-                shifts_per_roster = self._get_shifts_per_roster(worker)
-                self.model.Add(num_shifts_worked == shifts_per_roster)
-        log.info("Enforcement of shifts per roster completed...")
-
-    def _split_list(self, alist, wanted_parts=1):
-        """Split list into parts.
-
-        If length is odd then first half is smaller.
-
-        """
-        length = len(alist)
-        return [
-            alist[i * length // wanted_parts : (i + 1) * length // wanted_parts]
-            for i in range(wanted_parts)
-        ]
+        log.info("Collection of skill mix rules completed...")
+        return skill_mix_rules
 
-    def _enforce_balanced_shifts(self):
-        """Enforce balanced shifts for each worker."""
-        log.info("Enforcement of balanced shifts started...")
-        for worker in self.workers:
-            leave_dates = [
-                leave.date for leave in self.leaves.filter(staff_member=worker)
-            ]
-            dates = [date for date in self.dates if date not in leave_dates]
-            dates1, _ = self._split_list(dates, wanted_parts=2)
-            num_shifts_worked1 = sum(
-                self.shift_decision_vars[(worker.id, role.id, date, timeslot.id)]
-                for role in worker.roles.all()
-                for date in dates1
-                for timeslot in self.timeslots_lookup[date]
-            )
-            if worker.enforce_shifts_per_roster:
-                shifts_per_roster = self._get_shifts_per_roster(worker)
-                num_shifts = shifts_per_roster // 2
-                self.model.Add(num_shifts_worked1 == num_shifts)
-        log.info("Enforcement of balanced shifts completed...")
-
-    def _enforce_staff_numbers(self):
-        """Enforce staff numbers."""
-        log.info("Enforcement of staff numbers started...")
-        max_shift_size_lookup = {}
-        min_shift_size_lookup = {}
-        for shift_id in self.skill_mix_rules:
-            role_count_sizes = []
-            for role_counts in self.skill_mix_rules[shift_id]:
-                role_count_sizes.append(sum(role_counts.values()))
-            max_shift_size = max(role_count_sizes)
-            min_shift_size = min(role_count_sizes)
-            max_shift_size_lookup[shift_id] = max_shift_size
-            min_shift_size_lookup[shift_id] = min_shift_size
-        for timeslot in self.timeslots:
-            max_timeslot_size = max_shift_size_lookup[timeslot.shift.id]
-            min_timeslot_size = max_shift_size_lookup[timeslot.shift.id]
-            num_staff_allocated = sum(
-                self.shift_decision_vars[
-                    (worker.id, role.id, timeslot.date, timeslot.id)
-                ]
-                for worker in self.workers
-                for role in worker.roles.all()
+    def _collect_staff_requests(self, worker_ids):
+        """Collect staff requests as (worker, day, shift, weight)."""
+        log.info("Staff request collection started...")
+        staff_requests = tuple(
+            (worker_id, self._get_day(date), shift_id, priority if like else -priority)
+            for worker_id, date, shift_id, like, priority in StaffRequest.objects.filter(
+                date__range=self.date_range, staff_member__in=worker_ids
+            ).values_list("staff_member_id", "date", "shift_id", "like", "priority")
+        )
+        log.info("Staff request collection completed...")
+        return staff_requests
+
+    def _create_snapshot(self):
+        """Collect the problem into a compact snapshot for the solver."""
+        log.info("Snapshot creation started...")
+        with self.profiler.phase("collect_shift_sequences"):
+            shift_sequences = self._collect_shift_sequences()
+        workers = tuple(
+            WorkerSpec(
+                id=worker.id,
+                role_ids=tuple(sorted(role.id for role in worker.roles.all())),
+                sequence_ids=tuple(
+                    shiftsequence.id for shiftsequence in worker.shiftsequence_set.all()
+                ),
+                shifts_per_roster=worker.shifts_per_roster,
+                max_shifts=worker.max_shifts,
+                enforce_shifts_per_roster=worker.enforce_shifts_per_roster,
+                enforce_one_shift_per_day=worker.enforce_one_shift_per_day,
             )
-            self.model.Add(num_staff_allocated >= min_timeslot_size)
-            self.model.Add(num_staff_allocated <= max_timeslot_size)
-        log.info("Enforcement of staff numbers completed...")
-
-    def _maximise_staff_requests(self):
-        """Maximise the number of satisfied staff requests."""
-        log.info("Maximising of staff requests started...")
-        self.model.Maximize(
-            sum(
-                self.staff_requests[n][d][s]
-                * self.shift_decision_vars[(worker.id, role.id, date, timeslot.id)]
-                for n, worker in enumerate(self.workers)
-                for role in worker.roles.all()
-                for d, date in enumerate(self.dates)
-                for s, timeslot in enumerate(self.timeslots_lookup[date])
+            for worker in self.workers
+        )
+        worker_ids = [worker.id for worker in workers]
+        timeslots = tuple(
+            TimeSlotSpec(id=timeslot_id, day=self._get_day(date), shift_id=shift_id)
+            for timeslot_id, date, shift_id in TimeSlot.objects.filter(
+                date__range=self.extended_date_range
             )
+            .prefetch_related(None)
+            .order_by("date", "shift__shift_type")
+            .values_list("id", "date", "shift_id")
+        )
+        previous_assignments = frozenset(
+            TimeSlot.staff.through.objects.filter(
+                timeslot__date__range=self.previous_date_range,
+                customuser_id__in=worker_ids,
+            ).values_list("customuser_id", "timeslot_id")
+        )
+        leave = tuple(
+            (worker_id, self._get_day(date))
+            for worker_id, date in Leave.objects.filter(
+                date__range=self.date_range, staff_member__in=worker_ids
+            ).values_list("staff_member_id", "date")
         )
-        log.info("Maximising of staff requests completed...")
+        with self.profiler.phase("collect_staff_requests"):
+            requests = self._collect_staff_requests(worker_ids)
+        with self.profiler.phase("collect_skill_mix_rules"):
+            skill_mix_rules = self._collect_skill_mix_rules()
+        self.snapshot = RosterSnapshot(
+            num_days=self.num_days,
+            workers=workers,
+            role_ids=tuple(Role.objects.order_by("id").values_list("id", flat=True)),
+            shift_ids=tuple(shift.id for shift in self.shifts),
+            timeslots=timeslots,
+            previous_assignments=previous_assignments,
+            leave=leave,
+            requests=requests,
+            skill_mix_rules=skill_mix_rules,
+            shift_sequences=shift_sequences,
+            max_time_in_seconds=settings.ROSTER_SOLVER_MAX_TIME,
+            trace_memory=settings.ROSTER_PROFILE_MEMORY,
+        )
+        log.info("Snapshot creation completed...")
 
     def _solve_roster(self):
-        """Create the solver and solve."""
-        self.solver = cp_model.CpSolver()
-        self.solver.parameters.max_time_in_seconds = 120
-        log.info("Solver started...")
-        solution_status = self.solver.Solve(self.model)
-        log.info("Solver finished...")
-        if solution_status == cp_model.INFEASIBLE:
-            log.info("Solution is INFEASIBLE")
-        if solution_status not in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
+        """Solve the snapshot, in a child process if isolated."""
+        if self.isolated:
+            if self.memory_limit is None:
+                size = get_problem_size_from_snapshot(self.snapshot)
+                self.memory_limit = predict_memory(
+                    count_variables(size), count_constraints(size)
+                )
+            log.info("Isolated solver started, memory limit %s", self.memory_limit)
+            try:
+                self.result = run_isolated(
+                    self.snapshot,
+                    self.memory_limit,
+                    timeout=settings.ROSTER_SOLVER_MAX_TIME * 2,
+                )
+            except ChildProcessError as error:
+                raise SolverProcessFailed(str(error)) from error
+        else:
+            # OR-Tools is only loaded by the processes that solve
+            from .solver import RosterSolver  # pylint: disable=import-outside-toplevel
+
+            self.result = RosterSolver(self.snapshot).solve()
+        self.profiler.phases.extend(self.result.phases)
+        # The peak of a solve in process is the lifetime peak of the worker
+        self.peak_memory = self.result.peak_memory if self.isolated else None
+        self.resident_memory = self.result.resident_memory
+        log.info(
+            "Solver finished with status %s, peak memory %s, resident memory %s",
+            self.result.status,
+            self.peak_memory,
+            self.resident_memory,
+        )
+        if not self.result.feasible:
             log.info("No feasible solution, raising exception...")
             raise SolutionNotFeasible("No feasible solutions.")
 
     def _populate_roster(self):
         """Populate roster."""
         log.info("Population of roster started...")
-        shift_vars_for_current_period = {
-            shift_var_key: self.shift_decision_vars[shift_var_key]
-            for shift_var_key in self.shift_decision_vars
-            if shift_var_key[2] in self.dates
-        }
         TimeSlotStaffRelationship = TimeSlot.staff.through  # pylint: disable=invalid-name
-        staff_to_add = []
-        for shift_var_key in shift_vars_for_current_period:
-            worker_id = shift_var_key[0]
-            timeslot_id = shift_var_key[3]
-            if self.solver.Value(self.shift_decision_vars[shift_var_key]):
-                staff_to_add.append(
-                    TimeSlotStaffRelationship(
-                        timeslot_id=timeslot_id,
-                        customuser_id=worker_id,
-                    )
-                )
+        staff_to_add = [
+            TimeSlotStaffRelationship(timeslot_id=timeslot_id, customuser_id=worker_id)
+            for worker_id, timeslot_id in unpack_assignments(self.result.assignments)
+        ]
         TimeSlotStaffRelationship.objects.bulk_create(
             staff_to_add, ignore_conflicts=True
         )
+        # Bulk creation sends no signals
+        invalidate_dates(self.dates, ["timeslot"])
         log.info("Population of roster completed...")
 
-    def create(self):
-        """Create roster as per constraints."""
-        self._clear_existing_timeslots()
-        self._create_timeslots()
-        self._create_timeslots_lookup()
-        self._collect_staff_requests()
-        self._create_shift_decision_vars()
-        self._create_previous_shift_decision_vars()
-        self._exclude_leave_dates()
-        self._enforce_one_shift_per_day()
-        self._enforce_shifts_per_roster()
-        self._collect_skill_mix_rules()
-        self._create_intermediate_skill_mix_vars()
-        self._enforce_one_skill_mix_rule_at_a_time()
-        self._enforce_skill_mix_rules()
-        self._enforce_balanced_shifts()
-        self._create_invalid_shift_sequence_lookup()
-        self._enforce_invalid_shift_sequences()
-        self._enforce_staff_numbers()
-        self._maximise_staff_requests()
-        self._solve_roster()
-        self._populate_roster()
-        self.complete = True
-
+    def _report_staff_requests(self):
+        """Report how many staff requests the roster satisfies."""
+        self.staff_request_report = build_staff_request_report(self.dates)
 
-def get_roster_by_staff(start_date):
-    """Create data structures for roster grouped by staff."""
-    num_days = Day.objects.count()
-    dates = []
-    for day in range(num_days):
-        date = start_date + datetime.timedelta(days=day)
-        date = date.date()
-        dates.append(date)
-    date_range = [
-        start_date.date(),
-        start_date.date() + datetime.timedelta(days=num_days - 1),
-    ]
-    roster = OrderedDict()
-    workers = (
-        get_user_model()
-        .objects.all()
-        .prefetch_related("roles")
-        .order_by("roles__role_name", "last_name", "first_name")
-    )
-    timeslots = TimeSlot.objects.filter(date__range=date_range)
-    for worker in workers:
-        roster[f"{worker.last_name}, {worker.first_name}"] = OrderedDict()
-        staff_roles = "".join(f"{role.role_name} " for role in worker.roles.all())
-
-        roster[f"{worker.last_name}, {worker.first_name}"]["roles"] = staff_roles
-        roster[f"{worker.last_name}, {worker.first_name}"]["shifts_per_roster"] = (
-            worker.shifts_per_roster
+    def create(self):
+        """Create roster as per constraints, profiling each phase."""
+        steps = (
+            self._clear_existing_timeslots,
+            self._create_timeslots,
+            self._create_snapshot,
+            self._solve_roster,
+            self._populate_roster,
+            self._report_staff_requests,
         )
-
-        for date in dates:
-            roster[f"{worker.last_name}, {worker.first_name}"][date] = "X"
-        worker_timeslots = [
-            timeslot for timeslot in timeslots if worker in timeslot.staff.all()
-        ]
-        for timeslot in worker_timeslots:
-            if roster[f"{worker.last_name}, {worker.first_name}"][timeslot.date] == "X":
-                roster[f"{worker.last_name}, {worker.first_name}"][timeslot.date] = (
-                    timeslot.shift.shift_type
-                )
-
-            else:
-                roster[f"{worker.last_name}, {worker.first_name}"][timeslot.date] += (
-                    f", {timeslot.shift.shift_type}"
-                )
-
-        worker_leave = worker.leave_set.filter(date__range=date_range)
-        for leave in worker_leave:
-            roster[f"{worker.last_name}, {worker.first_name}"][leave.date] = (
-                leave.description
-            )
-
-    return dates, roster
+        with connection.execute_wrapper(self.profiler.queries):
+            for done, step in enumerate(steps):
+                name = step.__name__.lstrip("_")
+                if self.progress is not None:
+                    self.progress(name, done / len(steps))
+                with self.profiler.phase(name):
+                    step()
+        self.complete = True
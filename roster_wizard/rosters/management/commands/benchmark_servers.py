@@ -0,0 +1,184 @@
+"""Benchmark servers command."""
+
+import http.client
+import math
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from rosters.ical import get_calendar_token
+
+
+SERVERS = {
+    "wsgi": ("roster_project.wsgi:application", "sync"),
+    "asgi": ("roster_project.asgi:application", "asgi"),
+}
+
+
+def percentile(latencies, fraction):
+    """Get the latency below which a fraction of sorted latencies fall."""
+    if not latencies:
+        return None
+    return latencies[max(0, math.ceil(fraction * len(latencies)) - 1)]
+
+
+def _wait_for_port(port, process, timeout):
+    """Wait until a server accepts connections on port."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Server exited with code {process.returncode}")
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+        try:
+            connection.request("HEAD", "/")
+            connection.getresponse()
+            return
+        except OSError:
+            time.sleep(0.1)
+        finally:
+            connection.close()
+    raise CommandError(f"Server did not start on port {port}")
+
+
+def _client(port, requests, deadline):
+    """Send requests in turn until deadline, returning latencies and errors."""
+    latencies = []
+    errors = 0
+    for path, headers in cycle(requests):
+        if time.monotonic() >= deadline:
+            break
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+        except OSError:
+            errors += 1
+        finally:
+            connection.close()
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    """Compare WSGI and ASGI servers under concurrent clients."""
+
+    help = (
+        "Start gunicorn with the WSGI and then the ASGI application, load the "
+        "status, generation progress, roster grid and calendar endpoints with "
+        "concurrent clients and report throughput and latency percentiles. "
+        "The servers use the current settings, so ALLOWED_HOSTS must include "
+        "127.0.0.1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=50)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--workers", type=int, default=3)
+        parser.add_argument("--port", type=int, default=8100)
+        parser.add_argument(
+            "--servers", nargs="+", choices=SERVERS, default=list(SERVERS)
+        )
+        parser.add_argument(
+            "--email", help="Staff member to request as, the first superuser if unset"
+        )
+
+    def _requests(self, email):
+        """Build the path and headers of each benchmarked request."""
+        users = get_user_model().objects
+        user = (
+            users.get(email=email)
+            if email
+            else users.filter(is_superuser=True).order_by("id").first()
+        )
+        if user is None:
+            raise CommandError("No staff member to request as, create one first")
+        client = Client()
+        client.force_login(user)
+        session = client.session
+        session["task_id"] = "benchmark"
+        session.save()
+        cookie = {"Cookie": f"{settings.SESSION_COOKIE_NAME}={session.session_key}"}
+        token, _ = Token.objects.get_or_create(user=user)
+        return [
+            (reverse("roster_status_indicator"), cookie),
+            (reverse("roster_generation_status", args=("benchmark",)), cookie),
+            (reverse("roster-grid"), {"Authorization": f"Token {token.key}"}),
+            (reverse("staff_calendar", args=(get_calendar_token(user),)), {}),
+        ]
+
+    def _run(self, server, port, requests, options):
+        """Benchmark one server, returning its report line."""
+        application, worker_class = SERVERS[server]
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                application,
+                "--worker-class",
+                worker_class,
+                "--workers",
+                str(options["workers"]),
+                "--bind",
+                f"127.0.0.1:{port}",
+                "--log-level",
+                "warning",
+            ],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+        )
+        try:
+            _wait_for_port(port, process, timeout=30)
+            # Warm the caches so that every server is measured on hits
+            _client(port, requests, time.monotonic() + 1)
+            start = time.monotonic()
+            deadline = start + options["duration"]
+            with ThreadPoolExecutor(max_workers=options["clients"]) as executor:
+                results = list(
+                    executor.map(
+                        lambda _: _client(port, requests, deadline),
+                        range(options["clients"]),
+                    )
+                )
+            elapsed = time.monotonic() - start
+        finally:
+            process.terminate()
+            process.wait()
+        latencies = sorted(
+            latency for client_latencies, _ in results for latency in client_latencies
+        )
+        errors = sum(client_errors for _, client_errors in results)
+        if not latencies:
+            return f"{server}: no successful requests, {errors} errors"
+        return (
+            f"{server}: {len(latencies) / elapsed:.1f} requests/s, "
+            f"p50 {percentile(latencies, 0.5) * 1000:.1f}ms, "
+            f"p99 {percentile(latencies, 0.99) * 1000:.1f}ms, "
+            f"{len(latencies)} requests, {errors} errors"
+        )
+
+    def handle(self, *args, **options):
+        requests = self._requests(options["email"])
+        self.stdout.write(
+            f"{options['clients']} clients for {options['duration']:g}s against "
+            f"{options['workers']} workers"
+        )
+        for offset, server in enumerate(options["servers"]):
+            self.stdout.write(
+                self._run(server, options["port"] + offset, requests, options)
+            )
@@ -167,13 +167,6 @@ class Command(BaseCommand):
                 shift=late_shift,
                 staff_member=staff_member1,
             )
-            StaffRequest.objects.create(
-                priority=1,
-                like=False,
-                date=datetime.datetime.now() + datetime.timedelta(days=1),
-                shift=late_shift,
-                staff_member=staff_member1,
-            )
             StaffRequest.objects.create(
                 priority=10,
                 like=False,
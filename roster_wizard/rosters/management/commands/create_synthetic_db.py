@@ -0,0 +1,80 @@
+"""Create synthetic database command."""
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rosters.models import Day
+from rosters.synthetic import (
+    SyntheticSpec,
+    clear_roster_data,
+    create_synthetic_roster,
+)
+
+
+class Command(BaseCommand):
+    """Create a synthetic roster problem of a given size."""
+
+    help = "Create a synthetic roster problem for benchmarking."
+
+    def add_arguments(self, parser):
+        defaults = SyntheticSpec()
+        parser.add_argument("--staff", type=int, default=defaults.staff)
+        parser.add_argument("--roles", type=int, default=defaults.roles)
+        parser.add_argument("--days", type=int, default=defaults.days)
+        parser.add_argument("--shifts", type=int, default=defaults.shifts)
+        parser.add_argument(
+            "--skill-mix-rules", type=int, default=defaults.skill_mix_rules
+        )
+        parser.add_argument(
+            "--sequence-rules", type=int, default=defaults.sequence_rules
+        )
+        parser.add_argument(
+            "--leave-density", type=float, default=defaults.leave_density
+        )
+        parser.add_argument(
+            "--request-density", type=float, default=defaults.request_density
+        )
+        parser.add_argument("--seed", type=int, default=defaults.seed)
+        parser.add_argument(
+            "--start-date",
+            type=datetime.date.fromisoformat,
+            default=datetime.date.today(),
+            help="Start date of the roster period (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="Delete existing roster configuration and data first",
+        )
+
+    def handle(self, *args, **options):
+        spec = SyntheticSpec(
+            staff=options["staff"],
+            roles=options["roles"],
+            days=options["days"],
+            shifts=options["shifts"],
+            skill_mix_rules=options["skill_mix_rules"],
+            sequence_rules=options["sequence_rules"],
+            leave_density=options["leave_density"],
+            request_density=options["request_density"],
+            seed=options["seed"],
+        )
+        if Day.objects.exists() and not options["flush"]:
+            raise CommandError(
+                "Roster data already exists, use --flush to replace it..."
+            )
+        try:
+            with transaction.atomic():
+                if options["flush"]:
+                    clear_roster_data()
+                staff = create_synthetic_roster(spec, options["start_date"])
+        except Exception as exception:
+            raise CommandError("Synthetic database creation failed...") from exception
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully created synthetic database with {len(staff)} staff."
+            )
+        )
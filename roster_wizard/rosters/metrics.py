@@ -0,0 +1,156 @@
+"""Prometheus metrics.
+
+Renders roster generation and solver statistics in the Prometheus text
+exposition format. Everything is read from RosterRun so the metrics are
+the same whichever worker or web process serves them.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.db.models import Count, Min, Sum
+from django.utils import timezone
+
+from .models import RosterRun
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SUMMARIES = (
+    ("solve_time", "roster_solver_wall_time_seconds", "Solver wall time."),
+    ("presolve_time", "roster_solver_presolve_time_seconds", "Solver presolve time."),
+    ("conflicts", "roster_solver_conflicts", "Solver conflicts."),
+    ("branches", "roster_solver_branches", "Solver branches."),
+)
+
+LAST_RUN_GAUGES = (
+    ("solve_time", "roster_solver_last_wall_time_seconds", "Last solver wall time."),
+    (
+        "presolve_time",
+        "roster_solver_last_presolve_time_seconds",
+        "Last solver presolve time.",
+    ),
+    ("conflicts", "roster_solver_last_conflicts", "Last solver conflicts."),
+    ("branches", "roster_solver_last_branches", "Last solver branches."),
+    ("objective", "roster_solver_last_objective", "Last solver objective value."),
+    ("best_bound", "roster_solver_last_best_bound", "Last solver objective bound."),
+    ("gap", "roster_solver_last_gap", "Last solver relative optimality gap."),
+    ("variables", "roster_solver_last_variables", "Last model variables."),
+    ("constraints", "roster_solver_last_constraints", "Last model constraints."),
+    (
+        "peak_memory",
+        "roster_solver_last_peak_memory_bytes",
+        "Last isolated solve peak memory.",
+    ),
+)
+
+
+def _format_labels(labels):
+    """Format labels as {name="value",...}."""
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in sorted(labels.items())
+    )
+    return "{" + pairs + "}"
+
+
+def _format_metric(name, help_text, metric_type, samples):
+    """Format a metric family with its HELP, TYPE and sample lines."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for suffix, labels, value in samples:
+        lines.append(f"{name}{suffix}{_format_labels(labels)} {float(value)!r}")
+    return lines
+
+
+def render_metrics(now=None):
+    """Render all roster metrics in the Prometheus text format."""
+    now = now or timezone.now()
+    lines = []
+
+    runs = dict(
+        RosterRun.objects.order_by()
+        .values("status")
+        .annotate(count=Count("id"))
+        .values_list("status", "count")
+    )
+    lines += _format_metric(
+        "roster_generation_runs",
+        "Roster generation runs by status.",
+        "gauge",
+        [
+            ("", {"status": status}, runs.get(status, 0))
+            for status, _ in RosterRun.STATUS_CHOICES
+        ],
+    )
+    # Runs whose task was lost never start, so old pending runs are not queued
+    queued = RosterRun.objects.filter(
+        status=RosterRun.PENDING,
+        created__gte=now - datetime.timedelta(seconds=settings.ROSTER_QUEUE_MAX_AGE),
+    ).count()
+    lines += _format_metric(
+        "roster_generation_queue_depth",
+        "Roster generations queued but not started.",
+        "gauge",
+        [("", {}, queued)],
+    )
+    lines += _format_metric(
+        "roster_generation_stale_pending",
+        "Roster generations pending for longer than they can be queued.",
+        "gauge",
+        [("", {}, runs.get(RosterRun.PENDING, 0) - queued)],
+    )
+
+    oldest_running = RosterRun.objects.filter(status=RosterRun.RUNNING).aggregate(
+        started=Min("started")
+    )["started"]
+    lines += _format_metric(
+        "roster_generation_oldest_running_age_seconds",
+        "Age of the longest running roster generation.",
+        "gauge",
+        [
+            (
+                "",
+                {},
+                (now - oldest_running).total_seconds() if oldest_running else 0,
+            )
+        ],
+    )
+
+    solver_statuses = (
+        RosterRun.objects.exclude(solver_status="")
+        .order_by()
+        .values("solver_status")
+        .annotate(count=Count("id"))
+        .values_list("solver_status", "count")
+    )
+    lines += _format_metric(
+        "roster_solver_status_total",
+        "Solves by solver status.",
+        "counter",
+        [("", {"status": status}, count) for status, count in solver_statuses],
+    )
+
+    for field, name, help_text in SUMMARIES:
+        totals = RosterRun.objects.filter(**{f"{field}__isnull": False}).aggregate(
+            total=Sum(field), count=Count("id")
+        )
+        lines += _format_metric(
+            name,
+            help_text,
+            "summary",
+            [
+                ("_sum", {}, totals["total"] or 0),
+                ("_count", {}, totals["count"]),
+            ],
+        )
+
+    last_run = RosterRun.objects.exclude(solver_status="").first()
+    if last_run is not None:
+        for field, name, help_text in LAST_RUN_GAUGES:
+            value = getattr(last_run, field)
+            if value is not None:
+                lines += _format_metric(name, help_text, "gauge", [("", {}, value)])
+
+    return "\n".join(lines) + "\n"
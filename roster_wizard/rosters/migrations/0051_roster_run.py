@@ -0,0 +1,33 @@
+# Generated by Django 6.1 on 2026-10-18 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rosters', '0050_rename_staffrule_shiftsequenceshift_shiftsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('start_date', models.DateField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('SUCCEEDED', 'Succeeded'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('message', models.CharField(blank=True, default='', max_length=255)),
+                ('isolated', models.BooleanField(default=False)),
+                ('memory_limit', models.BigIntegerField(blank=True, null=True)),
+                ('peak_memory', models.BigIntegerField(blank=True, null=True)),
+                ('resident_memory', models.BigIntegerField(blank=True, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.1 on 2026-10-18 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("rosters", "0051_roster_run"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rosterrun",
+            name="constraints",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="estimated_constraints",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="estimated_memory",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="estimated_solve_time",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="estimated_variables",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="solve_time",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="variables",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1 on 2026-10-18 22:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rosters", "0052_roster_run_estimates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rosterrun",
+            name="phases",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.1 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rosters", "0053_roster_run_phases"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rosterrun",
+            name="best_bound",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="branches",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="conflicts",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="objective",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="presolve_time",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="solver_status",
+            field=models.CharField(blank=True, default="", max_length=20),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.1 on 2026-10-19 00:18
+
+from django.db import migrations
+
+
+def merge_duplicate_timeslots(apps, schema_editor):
+    """Merge timeslots sharing a date and shift into the oldest one."""
+    TimeSlot = apps.get_model("rosters", "TimeSlot")
+    TimeSlotStaff = TimeSlot.staff.through
+    kept = {}
+    duplicates = {}
+    for timeslot_id, date, shift_id in TimeSlot.objects.order_by("id").values_list(
+        "id", "date", "shift_id"
+    ):
+        if (date, shift_id) in kept:
+            duplicates[timeslot_id] = kept[(date, shift_id)]
+        else:
+            kept[(date, shift_id)] = timeslot_id
+    if not duplicates:
+        return
+    TimeSlotStaff.objects.bulk_create(
+        [
+            TimeSlotStaff(timeslot_id=duplicates[timeslot_id], customuser_id=staff_id)
+            for timeslot_id, staff_id in TimeSlotStaff.objects.filter(
+                timeslot_id__in=duplicates
+            ).values_list("timeslot_id", "customuser_id")
+        ],
+        ignore_conflicts=True,
+    )
+    TimeSlot.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rosters", "0054_roster_run_solver_statistics"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_timeslots, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="timeslot",
+            unique_together={("date", "shift")},
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.1 on 2026-10-19 00:48
+
+from django.conf import settings
+from django.db import migrations
+
+
+def delete_duplicate_staff_requests(apps, schema_editor):
+    """Keep only the latest request of a staff member for a date and shift."""
+    StaffRequest = apps.get_model("rosters", "StaffRequest")
+    latest = {}
+    duplicates = []
+    for request_id, staff_member_id, date, shift_id in (
+        StaffRequest.objects.order_by("id").values_list(
+            "id", "staff_member_id", "date", "shift_id"
+        )
+    ):
+        key = (staff_member_id, date, shift_id)
+        if key in latest:
+            duplicates.append(latest[key])
+        latest[key] = request_id
+    if duplicates:
+        StaffRequest.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rosters", "0055_unique_together_timeslot"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_duplicate_staff_requests, migrations.RunPython.noop
+        ),
+        migrations.AlterUniqueTogether(
+            name="staffrequest",
+            unique_together={("staff_member", "date", "shift")},
+        ),
+    ]
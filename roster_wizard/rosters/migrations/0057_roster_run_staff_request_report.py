@@ -0,0 +1,18 @@
+# Generated by Django 6.1 on 2026-10-19 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rosters", "0056_unique_together_staffrequest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rosterrun",
+            name="staff_request_report",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.1 on 2026-10-19 02:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rosters", "0057_roster_run_staff_request_report"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="leave",
+            index=models.Index(fields=["date", "id"], name="leave_date_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="leave",
+            index=models.Index(
+                fields=["staff_member", "date"], name="leave_staff_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timeslot",
+            index=models.Index(fields=["date", "id"], name="timeslot_date_id_idx"),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.1 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rosters", "0058_leave_timeslot_date_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rosterrun",
+            name="phase",
+            field=models.CharField(blank=True, default="", max_length=40),
+        ),
+        migrations.AddField(
+            model_name="rosterrun",
+            name="progress",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AlterField(
+            model_name="rosterrun",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("RUNNING", "Running"),
+                    ("SUCCEEDED", "Succeeded"),
+                    ("FAILED", "Failed"),
+                    ("CANCELLED", "Cancelled"),
+                ],
+                default="PENDING",
+                max_length=10,
+            ),
+        ),
+    ]
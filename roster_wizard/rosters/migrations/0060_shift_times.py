@@ -0,0 +1,23 @@
+# Generated by Django 6.1 on 2026-10-19 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rosters", "0059_roster_run_progress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shift",
+            name="end_time",
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="shift",
+            name="start_time",
+            field=models.TimeField(blank=True, null=True),
+        ),
+    ]
@@ -44,6 +44,10 @@ class Leave(models.Model):
         """Meta."""
 
         ordering = ("staff_member", "date")
+        indexes = (
+            models.Index(fields=("date", "id"), name="leave_date_id_idx"),
+            models.Index(fields=("staff_member", "date"), name="leave_staff_date_idx"),
+        )
 
     def __str__(self):
         """How a leave object is displayed."""
@@ -152,6 +156,9 @@ class Shift(models.Model):
     daygroup = models.ForeignKey(
         DayGroup, null=True, blank=False, on_delete=models.SET_NULL
     )
+    # Shifts that end before they start finish on the next day
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
 
     class Meta:
         """Meta."""
@@ -315,6 +322,11 @@ class TimeSlot(models.Model):
         """Meta."""
 
         ordering = ("date", "shift__shift_type")
+        unique_together = (
+            "date",
+            "shift",
+        )
+        indexes = (models.Index(fields=("date", "id"), name="timeslot_date_id_idx"),)
 
     def __str__(self):
         """Return a meaningful string representation."""
@@ -349,6 +361,11 @@ class StaffRequest(models.Model):
         """Meta."""
 
         ordering = ("staff_member", "date", "shift", "like")
+        unique_together = (
+            "staff_member",
+            "date",
+            "shift",
+        )
 
     def __str__(self):
         """How a StaffRequest object is displayed."""
@@ -363,3 +380,73 @@ class StaffRequest(models.Model):
     def get_absolute_url(self):
         """URL."""
         return reverse("staffrequest_detail", args=[str(self.id)])
+
+
+class RosterRun(models.Model):
+    """Roster generation run."""
+
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+        (CANCELLED, "Cancelled"),
+    )
+    FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+    task_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    start_date = models.DateField(null=False, blank=False)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, null=False, blank=False, default=PENDING
+    )
+    message = models.CharField(max_length=255, null=False, blank=True, default="")
+    phase = models.CharField(max_length=40, null=False, blank=True, default="")
+    progress = models.FloatField(null=False, blank=False, default=0.0)
+    isolated = models.BooleanField(null=False, blank=False, default=False)
+    estimated_variables = models.BigIntegerField(null=True, blank=True)
+    estimated_constraints = models.BigIntegerField(null=True, blank=True)
+    estimated_memory = models.BigIntegerField(null=True, blank=True)
+    estimated_solve_time = models.FloatField(null=True, blank=True)
+    variables = models.BigIntegerField(null=True, blank=True)
+    constraints = models.BigIntegerField(null=True, blank=True)
+    solve_time = models.FloatField(null=True, blank=True)
+    solver_status = models.CharField(max_length=20, null=False, blank=True, default="")
+    presolve_time = models.FloatField(null=True, blank=True)
+    conflicts = models.BigIntegerField(null=True, blank=True)
+    branches = models.BigIntegerField(null=True, blank=True)
+    objective = models.FloatField(null=True, blank=True)
+    best_bound = models.FloatField(null=True, blank=True)
+    memory_limit = models.BigIntegerField(null=True, blank=True)
+    peak_memory = models.BigIntegerField(null=True, blank=True)
+    resident_memory = models.BigIntegerField(null=True, blank=True)
+    phases = models.JSONField(null=False, blank=True, default=list)
+    staff_request_report = models.JSONField(null=False, blank=True, default=dict)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """Meta."""
+
+        ordering = ("-created",)
+
+    def __str__(self):
+        """Return a meaningful string representation."""
+        return str(self.start_date) + ":" + self.status
+
+    @property
+    def gap(self):
+        """Relative gap between the objective and the best bound."""
+        if self.objective is None or self.best_bound is None:
+            return None
+        return abs(self.best_bound - self.objective) / max(1, abs(self.objective))
+
+    @property
+    def is_finished(self):
+        """Whether the run has succeeded, failed or been cancelled."""
+        return self.status in self.FINISHED
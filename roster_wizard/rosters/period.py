@@ -0,0 +1,53 @@
+"""Period calendar.
+
+Maps each day number of the roster period to the shifts worked that day, and
+each date of a period to its timeslots. Views and the generator share it
+instead of walking days, day groups and shifts on every request. The shifts
+of each day are kept with the reference data until day groups or shifts
+change, and the timeslots of a period are cached until its timeslots change.
+"""
+
+from collections import namedtuple
+
+from .cache import get_or_build
+from .models import TimeSlot
+from .reference import aget_reference_data, build_reference_data, get_reference_data
+
+
+PeriodCalendar = namedtuple("PeriodCalendar", "dates day_shifts timeslots")
+
+
+def build_day_shifts():
+    """Build the shifts of each day number, ordered by shift type."""
+    return build_reference_data().day_shifts
+
+
+def get_day_shifts():
+    """Get the cached shifts of each day number."""
+    return get_reference_data().day_shifts
+
+
+async def aget_day_shifts():
+    """Get the cached shifts of each day number asynchronously."""
+    return (await aget_reference_data()).day_shifts
+
+
+def build_period_calendar(dates):
+    """Build the calendar of the period of dates.
+
+    Timeslots map each date to a dictionary of shift id to timeslot id.
+    """
+    timeslots = {date: {} for date in dates}
+    if dates:
+        for timeslot_id, date, shift_id in (
+            TimeSlot.objects.filter(date__range=[dates[0], dates[-1]])
+            .order_by("shift__shift_type")
+            .values_list("id", "date", "shift_id")
+        ):
+            timeslots[date][shift_id] = timeslot_id
+    return PeriodCalendar(dates=dates, day_shifts=get_day_shifts(), timeslots=timeslots)
+
+
+def get_period_calendar(dates):
+    """Get the cached calendar of the period of dates."""
+    return get_or_build("calendar", dates, lambda: build_period_calendar(dates))
@@ -0,0 +1,125 @@
+"""Phase profiling.
+
+Records wall time, CPU time, database queries, allocated memory and model
+growth for each phase of a roster generation. This module must not import
+Django so that it can be used by the solver in an isolated child process.
+"""
+
+import logging
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+
+
+log = logging.getLogger(__name__)
+
+PhaseStats = namedtuple(
+    "PhaseStats",
+    "name wall_time cpu_time queries query_time memory variables constraints",
+)
+
+# Peak traced memory of enclosing phases, shared so that phases can be nested
+_peaks = []
+
+
+class QueryCounter:
+    """Database execute wrapper that counts queries and their time."""
+
+    def __init__(self):
+        """Start counting from zero."""
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Count and time the query."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - start
+
+
+def _model_size(model):
+    """Return (variables, constraints) of a CP-SAT model."""
+    proto = model.Proto()
+    return len(proto.variables), len(proto.constraints)
+
+
+class Profiler:
+    """Collect PhaseStats for the phases of a roster generation."""
+
+    def __init__(self, trace_memory=False, queries=None):
+        """Create profiler.
+
+        Args:
+            trace_memory: Measure peak Python allocations per phase with tracemalloc
+            queries: QueryCounter to report database queries from
+        """
+        self.trace_memory = trace_memory
+        self.queries = queries
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name, model=None):
+        """Profile the enclosed block as a phase.
+
+        If a model is given, the number of variables and constraints added to it
+        during the phase are recorded.
+        """
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            start_memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            _peaks.append(start_memory)
+        start_size = _model_size(model) if model is not None else None
+        start_queries = (
+            (self.queries.count, self.queries.time)
+            if self.queries is not None
+            else None
+        )
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start_wall
+            cpu_time = time.process_time() - start_cpu
+            memory = None
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], _peaks.pop())
+                if _peaks:
+                    _peaks[-1] = max(_peaks[-1], peak)
+                memory = peak - start_memory
+            if started_tracing:
+                tracemalloc.stop()
+            variables = constraints = None
+            if model is not None:
+                variables, constraints = (
+                    end - start for end, start in zip(_model_size(model), start_size)
+                )
+            queries = query_time = None
+            if self.queries is not None:
+                queries = self.queries.count - start_queries[0]
+                query_time = self.queries.time - start_queries[1]
+            stats = PhaseStats(
+                name=name,
+                wall_time=wall_time,
+                cpu_time=cpu_time,
+                queries=queries,
+                query_time=query_time,
+                memory=memory,
+                variables=variables,
+                constraints=constraints,
+            )
+            self.phases.append(stats)
+            log.info(
+                "Phase %s took %.3fs wall, %.3fs cpu",
+                name,
+                wall_time,
+                cpu_time,
+                extra={"phase": stats._asdict()},
+            )
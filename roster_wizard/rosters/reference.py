@@ -0,0 +1,81 @@
+"""Reference data.
+
+Days, shifts, day groups and the roster settings change a few times a year
+but are read by nearly every request. They are held in process memory with
+the version of the "reference" collection of the roster cache they were
+built under. Signals replace that version whenever any of them change, and
+each process rebuilds its copy on its next read, so a read costs one cache
+lookup instead of several queries.
+"""
+
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+
+from .cache import aget_collection_version, get_collection_version
+from .models import Day, DayGroupDay, RosterSettings, Shift
+
+
+REFERENCE_COLLECTION = "reference"
+
+ReferenceData = namedtuple(
+    "ReferenceData", "day_count shifts daygroups day_shifts roster_settings"
+)
+
+# Version and reference data last built by this process
+_reference = (None, None)
+
+
+def build_reference_data():
+    """Build the reference data from the database.
+
+    Shifts are ordered by shift type, daygroups map each day number to the
+    ids of its day groups and day_shifts map it to the shifts worked that
+    day. The roster settings are None until they have been saved.
+    """
+    shifts = list(Shift.objects.order_by("shift_type"))
+    daygroups = {
+        number: set()
+        for number in Day.objects.order_by("number").values_list("number", flat=True)
+    }
+    for number, daygroup_id in DayGroupDay.objects.order_by().values_list(
+        "day__number", "daygroup_id"
+    ):
+        if number in daygroups:
+            daygroups[number].add(daygroup_id)
+    return ReferenceData(
+        day_count=len(daygroups),
+        shifts=shifts,
+        daygroups=daygroups,
+        day_shifts={
+            number: [shift for shift in shifts if shift.daygroup_id in ids]
+            for number, ids in daygroups.items()
+        },
+        roster_settings=RosterSettings.objects.first(),
+    )
+
+
+def _build(version):
+    """Build the reference data and keep it as the data of version."""
+    global _reference  # pylint: disable=global-statement
+    data = build_reference_data()
+    _reference = (version, data)
+    return data
+
+
+def get_reference_data():
+    """Get the reference data, rebuilding it if it has changed."""
+    version = get_collection_version(REFERENCE_COLLECTION)
+    built_version, data = _reference
+    if version != built_version:
+        data = _build(version)
+    return data
+
+
+async def aget_reference_data():
+    """Get the reference data asynchronously, rebuilding it in a thread."""
+    version = await aget_collection_version(REFERENCE_COLLECTION)
+    built_version, data = _reference
+    if version != built_version:
+        data = await sync_to_async(_build)(version)
+    return data
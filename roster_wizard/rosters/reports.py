@@ -0,0 +1,114 @@
+"""Roster reports."""
+
+from django.db.models import Exists, OuterRef
+
+from .cache import get_or_build, get_version
+from .grid import get_roster_dates
+from .models import RosterRun, StaffRequest, TimeSlot
+
+
+def _rate(satisfied, total):
+    """Satisfaction rate, or None without requests."""
+    return satisfied / total if total else None
+
+
+def build_staff_request_report(dates):
+    """Build the staff request satisfaction report for dates.
+
+    The report is a JSON serialisable dictionary of the satisfied and
+    unsatisfied requests as text, and the number of requests, the number
+    satisfied and the satisfaction rate overall, per staff member and per
+    priority. It also records the roster version it was built from.
+    """
+    report = {
+        "version": get_version(dates),
+        "successes": [],
+        "failures": [],
+        "total": 0,
+        "satisfied": 0,
+        "rate": None,
+        "staff": [],
+        "priorities": [],
+    }
+    if not dates:
+        return report
+    given = TimeSlot.staff.through.objects.filter(
+        customuser_id=OuterRef("staff_member_id"),
+        timeslot__date=OuterRef("date"),
+        timeslot__shift_id=OuterRef("shift_id"),
+    )
+    staff = {}
+    priorities = {}
+    for (
+        staff_id,
+        last_name,
+        first_name,
+        shift_type,
+        date,
+        like,
+        priority,
+        is_given,
+    ) in (
+        StaffRequest.objects.filter(date__range=[dates[0], dates[-1]])
+        .annotate(given=Exists(given))
+        .order_by("date", "shift__shift_type", "staff_member__last_name", "id")
+        .values_list(
+            "staff_member_id",
+            "staff_member__last_name",
+            "staff_member__first_name",
+            "shift__shift_type",
+            "date",
+            "like",
+            "priority",
+            "given",
+        )
+        .iterator()
+    ):
+        name = f"{last_name},{first_name}"
+        outcome = "given" if is_given else "not given"
+        satisfied = like == is_given
+        text = f"{name} {outcome} {shift_type} on {date}"
+        report["successes" if satisfied else "failures"].append(text)
+        for counts in (
+            staff.setdefault(
+                staff_id, {"id": staff_id, "name": name, "total": 0, "satisfied": 0}
+            ),
+            priorities.setdefault(
+                priority, {"priority": priority, "total": 0, "satisfied": 0}
+            ),
+        ):
+            counts["total"] += 1
+            counts["satisfied"] += satisfied
+    report["satisfied"] = len(report["successes"])
+    report["total"] = report["satisfied"] + len(report["failures"])
+    for counts in [report, *staff.values(), *priorities.values()]:
+        counts["rate"] = _rate(counts["satisfied"], counts["total"])
+    report["staff"] = sorted(staff.values(), key=lambda counts: counts["name"])
+    report["priorities"] = sorted(
+        priorities.values(), key=lambda counts: counts["priority"]
+    )
+    return report
+
+
+def get_staff_request_report(start_date):
+    """Get the staff request report for the period starting at start_date.
+
+    The report stored by the latest roster generation of the period is used
+    while the roster is unchanged since, otherwise the report is rebuilt.
+    """
+    dates = get_roster_dates(start_date)
+    if not dates:
+        return build_staff_request_report(dates)
+
+    def build():
+        stored = (
+            RosterRun.objects.filter(start_date=dates[0], status=RosterRun.SUCCEEDED)
+            .order_by("-finished")
+            .values_list("staff_request_report", flat=True)
+            .first()
+        )
+        if stored and stored.get("version") == get_version(dates):
+            return stored
+        return build_staff_request_report(dates)
+
+    return get_or_build("staff_request_report", dates, build)
@@ -0,0 +1,118 @@
+"""Signals.
+
+Invalidate the roster cache when anything shown on a roster changes. Each
+invalidation is repeated on commit so that a read racing an open transaction
+cannot cache data under the new version before the write is visible.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_all, invalidate_dates
+from .reference import REFERENCE_COLLECTION
+from .status import RUN_COLLECTION
+from .models import (
+    Day,
+    DayGroup,
+    DayGroupDay,
+    Leave,
+    Role,
+    RosterRun,
+    RosterSettings,
+    Shift,
+    StaffRequest,
+    TimeSlot,
+)
+
+
+COLLECTIONS = {TimeSlot: "timeslot", Leave: "leave", StaffRequest: "staffrequest"}
+
+
+def _invalidate_dates(dates, collections=()):
+    """Invalidate dates and collections now and again on commit."""
+    invalidate_dates(dates, collections)
+    transaction.on_commit(lambda: invalidate_dates(dates, collections))
+
+
+def _invalidate_all():
+    """Invalidate everything now and again on commit."""
+    invalidate_all()
+    transaction.on_commit(invalidate_all)
+
+
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_save, sender=Leave)
+@receiver(post_save, sender=StaffRequest)
+def dated_object_saved(sender, instance, created, **kwargs):
+    """Invalidate the date of a new object, or everything if it may have moved."""
+    if created:
+        _invalidate_dates([instance.date], [COLLECTIONS[sender]])
+    else:
+        _invalidate_all()
+
+
+@receiver(post_delete, sender=TimeSlot)
+@receiver(post_delete, sender=Leave)
+@receiver(post_delete, sender=StaffRequest)
+def dated_object_deleted(sender, instance, **kwargs):
+    """Invalidate the date of a deleted object."""
+    _invalidate_dates([instance.date], [COLLECTIONS[sender]])
+
+
+@receiver(m2m_changed, sender=TimeSlot.staff.through)
+def timeslot_staff_changed(sender, instance, action, reverse, **kwargs):
+    """Invalidate the date of a timeslot whose staff changed."""
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        _invalidate_all()
+    else:
+        _invalidate_dates([instance.date], [COLLECTIONS[TimeSlot]])
+
+
+@receiver(post_save, sender=Shift)
+@receiver(post_delete, sender=Shift)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Day)
+@receiver(post_delete, sender=Day)
+@receiver(post_save, sender=DayGroup)
+@receiver(post_delete, sender=DayGroup)
+@receiver(post_save, sender=DayGroupDay)
+@receiver(post_delete, sender=DayGroupDay)
+@receiver(post_delete, sender=get_user_model())
+@receiver(m2m_changed, sender=get_user_model().roles.through)
+def roster_configuration_changed(sender, **kwargs):
+    """Invalidate everything when shifts, roles, days, day groups or staff change."""
+    if kwargs.get("action", "post_").startswith("post_"):
+        _invalidate_all()
+
+
+@receiver(post_save, sender=Shift)
+@receiver(post_delete, sender=Shift)
+@receiver(post_save, sender=Day)
+@receiver(post_delete, sender=Day)
+@receiver(post_save, sender=DayGroup)
+@receiver(post_delete, sender=DayGroup)
+@receiver(post_save, sender=DayGroupDay)
+@receiver(post_delete, sender=DayGroupDay)
+@receiver(post_save, sender=RosterSettings)
+@receiver(post_delete, sender=RosterSettings)
+def reference_data_changed(sender, **kwargs):
+    """Rebuild the reference data of every process on its next read."""
+    _invalidate_dates([], [REFERENCE_COLLECTION])
+
+
+@receiver(post_save, sender=get_user_model())
+def staff_member_saved(sender, update_fields, **kwargs):
+    """Invalidate everything when staff details change, but not on login."""
+    if update_fields is None or set(update_fields) != {"last_login"}:
+        _invalidate_all()
+
+
+@receiver(post_save, sender=RosterRun)
+def roster_run_saved(sender, **kwargs):
+    """Wake roster status streams when a run changes."""
+    _invalidate_dates([], [RUN_COLLECTION])
@@ -0,0 +1,46 @@
+"""Roster snapshot.
+
+The plain data a roster is solved from and the result of solving it. This
+module must not import Django or OR-Tools, so that web processes can handle
+snapshots and results without loading the solver.
+"""
+
+from array import array
+from collections import namedtuple
+
+
+WorkerSpec = namedtuple(
+    "WorkerSpec",
+    "id role_ids sequence_ids shifts_per_roster max_shifts "
+    "enforce_shifts_per_roster enforce_one_shift_per_day",
+)
+TimeSlotSpec = namedtuple("TimeSlotSpec", "id day shift_id")
+ShiftSequenceSpec = namedtuple("ShiftSequenceSpec", "id positions day_numbers")
+RosterSnapshot = namedtuple(
+    "RosterSnapshot",
+    "num_days workers role_ids shift_ids timeslots previous_assignments "
+    "leave requests skill_mix_rules shift_sequences max_time_in_seconds "
+    "trace_memory",
+)
+SolverResult = namedtuple(
+    "SolverResult",
+    "status feasible assignments variables constraints solve_time "
+    "presolve_time conflicts branches objective best_bound "
+    "peak_memory resident_memory phases",
+)
+
+
+def pack_assignments(assignments):
+    """Pack (worker id, timeslot id) pairs into a compact array."""
+    packed = array("l")
+    for worker_id, timeslot_id in assignments:
+        packed.append(worker_id)
+        packed.append(timeslot_id)
+    return packed.tobytes()
+
+
+def unpack_assignments(packed):
+    """Unpack (worker id, timeslot id) pairs from a compact array."""
+    values = array("l")
+    values.frombytes(packed)
+    return list(zip(values[0::2], values[1::2]))
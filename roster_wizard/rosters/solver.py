@@ -0,0 +1,520 @@
+"""Roster solver.
+
+Builds and solves the CP-SAT model from a RosterSnapshot. This module must not
+import Django so that it can be run in an isolated child process, and only
+the solving process imports it, as OR-Tools is slow to load and large.
+
+Days are integer offsets from the start of the roster period, the previous
+period uses negative offsets.
+"""
+
+import logging
+import math
+import re
+from collections import defaultdict
+
+from ortools.sat.python import cp_model
+
+from .profiling import Profiler
+from .snapshot import SolverResult, pack_assignments
+
+
+log = logging.getLogger(__name__)
+
+PRESOLVE_TIME_PATTERN = re.compile(r"^Starting search at ([0-9.]+)s", re.MULTILINE)
+
+
+def memory_usage():
+    """Return (peak, resident) memory of the current process in bytes."""
+    import resource  # pylint: disable=import-outside-toplevel
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            resident = int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        resident = peak
+    return peak, resident
+
+
+class RosterSolver:
+    """Build and solve the roster model for a snapshot."""
+
+    def __init__(self, snapshot):
+        """Create solver for snapshot."""
+        self.snapshot = snapshot
+        self.num_days = snapshot.num_days
+        self.days = range(snapshot.num_days)
+        self.extended_days = range(-snapshot.num_days, snapshot.num_days)
+        self.workers = snapshot.workers
+        self.worker_lookup = {worker.id: worker for worker in self.workers}
+        self.leave_lookup = defaultdict(list)
+        for worker_id, day in snapshot.leave:
+            self.leave_lookup[worker_id].append(day)
+        self.model = cp_model.CpModel()
+        self.profiler = Profiler(trace_memory=snapshot.trace_memory)
+        self.timeslots = None
+        self.timeslots_lookup = {}
+        self.shift_decision_vars = None
+        self.skill_mix_rules = None
+        self.intermediate_skill_mix_vars = None
+        self.solver = None
+        self.status = None
+
+    def _create_timeslots_lookup(self):
+        """Map each day to its timeslots ordered by shift type."""
+        self.timeslots_lookup = {day: [] for day in self.extended_days}
+        for timeslot in self.snapshot.timeslots:
+            self.timeslots_lookup[timeslot.day].append(timeslot)
+        self.timeslots = [
+            timeslot for day in self.days for timeslot in self.timeslots_lookup[day]
+        ]
+
+    def _create_shift_decision_vars(self):
+        """Create shift decision variables.
+
+        shift_decision_vars[(n, r, d, t)]:
+        worker 'n' with role 'r' works on day 'd' in timeslot 't'
+        """
+        log.info("Shift decision variable creation started...")
+        self.shift_decision_vars = {
+            (worker.id, role_id, day, timeslot.id): self.model.NewBoolVar(
+                f"shift_n{worker.id}r{role_id}d{day}t{timeslot.id}"
+            )
+            for day in self.days
+            for timeslot in self.timeslots_lookup[day]
+            for worker in self.workers
+            for role_id in worker.role_ids
+        }
+        log.info("Shift decision variable creation completed...")
+
+    def _create_previous_shift_decision_vars(self):
+        """Create shift decision variables and fixed constraints
+        for previous roster period.
+        """
+        log.info("Creation of shift decision variables for previous period started...")
+        previous_assignments = self.snapshot.previous_assignments
+        for day in range(-self.num_days, 0):
+            for timeslot in self.timeslots_lookup[day]:
+                for worker in self.workers:
+                    if not worker.role_ids:
+                        continue
+                    key = (worker.id, worker.role_ids[0], day, timeslot.id)
+                    self.shift_decision_vars[key] = self.model.NewBoolVar(
+                        f"shift_n{worker.id}r{worker.role_ids[0]}d{day}t{timeslot.id}"
+                    )
+                    worked = (worker.id, timeslot.id) in previous_assignments
+                    self.model.Add(self.shift_decision_vars[key] == int(worked))
+        log.info(
+            "Creation of shift decision variables for previous period completed..."
+        )
+
+    def _exclude_leave_dates(self):
+        """Ensure staff members are not assigned to any shifts while on leave."""
+        log.info("Exclusion of leave dates started...")
+        for worker_id, day in self.snapshot.leave:
+            for role_id in self.worker_lookup[worker_id].role_ids:
+                for timeslot in self.timeslots_lookup[day]:
+                    self.model.Add(
+                        self.shift_decision_vars[(worker_id, role_id, day, timeslot.id)]
+                        == 0
+                    )
+        log.info("Exclusion of leave dates completed...")
+
+    def _enforce_one_shift_per_day(self):
+        """Assign at most one shift per day per worker."""
+        log.info("Restriction of staff to one shift per day started...")
+        for day in self.days:
+            for worker in self.workers:
+                if worker.enforce_one_shift_per_day:
+                    self.model.Add(
+                        sum(
+                            self.shift_decision_vars[
+                                (worker.id, role_id, day, timeslot.id)
+                            ]
+                            for role_id in worker.role_ids
+                            for timeslot in self.timeslots_lookup[day]
+                        )
+                        <= 1
+                    )
+        log.info("Restriction of staff to one shift per day completed...")
+
+    def _get_shifts_per_roster(self, worker):
+        """Get number of shifts to work in roster period."""
+        leave_days = len(self.leave_lookup[worker.id])
+        work_fraction = 1 - (leave_days / self.num_days)
+        shifts_per_roster = work_fraction * worker.shifts_per_roster
+        if worker.max_shifts:
+            return math.ceil(shifts_per_roster)
+        return math.floor(shifts_per_roster)
+
+    def _enforce_shifts_per_roster(self):
+        """Enforce shifts per roster for each worker."""
+        log.info("Enforcement of shifts per roster started...")
+        for worker in self.workers:
+            num_shifts_worked = sum(
+                self.shift_decision_vars[(worker.id, role_id, day, timeslot.id)]
+                for role_id in worker.role_ids
+                for day in self.days
+                for timeslot in self.timeslots_lookup[day]
+            )
+            if worker.enforce_shifts_per_roster:
+                shifts_per_roster = self._get_shifts_per_roster(worker)
+                self.model.Add(num_shifts_worked == shifts_per_roster)
+        log.info("Enforcement of shifts per roster completed...")
+
+    def _collect_skill_mix_rules(self):
+        """Expand skill mix rules to include a count for every role."""
+        self.skill_mix_rules = {}
+        for shift_id in self.snapshot.shift_ids:
+            self.skill_mix_rules[shift_id] = []
+            for rule in self.snapshot.skill_mix_rules.get(shift_id, ()):
+                role_count = dict.fromkeys(self.snapshot.role_ids, 0)
+                role_count.update(rule)
+                self.skill_mix_rules[shift_id].append(role_count)
+
+    def _create_intermediate_skill_mix_vars(self):
+        """Collect intermediate shift rule variables."""
+        log.info("Creation of skill mix intermediate variables started...")
+        self.intermediate_skill_mix_vars = {
+            (timeslot.id, rule_num): self.model.NewBoolVar(f"t{timeslot.id}r{rule_num}")
+            for timeslot in self.timeslots
+            for rule_num, rule in enumerate(self.skill_mix_rules[timeslot.shift_id])
+        }
+        log.info("Creation of skill mix intermediate variables completed...")
+
+    def _enforce_one_skill_mix_rule_at_a_time(self):
+        """Only one skill mix rule at a time should be enforced."""
+        log.info("Enforcement of one skill mix rule at a time started...")
+        for timeslot in self.timeslots:
+            if len(self.skill_mix_rules[timeslot.shift_id]) >= 1:
+                self.model.Add(
+                    sum(
+                        self.intermediate_skill_mix_vars[(timeslot.id, rule_num)]
+                        for rule_num, rule in enumerate(
+                            self.skill_mix_rules[timeslot.shift_id]
+                        )
+                    )
+                    == 1
+                )
+        log.info("Enforcement of one skill mix rule at a time completed...")
+
+    def _enforce_skill_mix_rules(self):
+        """Enforce one skill mix rule per shift per timeslot."""
+        log.info("Enforcement of skill mix rules started...")
+        for shift_id, rules in self.skill_mix_rules.items():
+            shift_timeslots = [
+                timeslot for timeslot in self.timeslots if timeslot.shift_id == shift_id
+            ]
+            for rule_num, rule in enumerate(rules):
+                for role_id, role_count in rule.items():
+                    workers = [
+                        worker for worker in self.workers if role_id in worker.role_ids
+                    ]
+                    for timeslot in shift_timeslots:
+                        self.model.Add(
+                            sum(
+                                self.shift_decision_vars[
+                                    (worker.id, role_id, timeslot.day, timeslot.id)
+                                ]
+                                for worker in workers
+                            )
+                            == role_count
+                        ).OnlyEnforceIf(
+                            self.intermediate_skill_mix_vars[(timeslot.id, rule_num)]
+                        )
+        log.info("Enforcement of skill mix rules completed...")
+
+    def _split_list(self, alist, wanted_parts=1):
+        """Split list into parts.
+
+        If length is odd then first half is smaller.
+
+        """
+        length = len(alist)
+        return [
+            alist[i * length // wanted_parts : (i + 1) * length // wanted_parts]
+            for i in range(wanted_parts)
+        ]
+
+    def _enforce_balanced_shifts(self):
+        """Enforce balanced shifts for each worker."""
+        log.info("Enforcement of balanced shifts started...")
+        for worker in self.workers:
+            leave_days = self.leave_lookup[worker.id]
+            days = [day for day in self.days if day not in leave_days]
+            days1, _ = self._split_list(days, wanted_parts=2)
+            num_shifts_worked1 = sum(
+                self.shift_decision_vars[(worker.id, role_id, day, timeslot.id)]
+                for role_id in worker.role_ids
+                for day in days1
+                for timeslot in self.timeslots_lookup[day]
+            )
+            if worker.enforce_shifts_per_roster:
+                shifts_per_roster = self._get_shifts_per_roster(worker)
+                num_shifts = shifts_per_roster // 2
+                self.model.Add(num_shifts_worked1 == num_shifts)
+        log.info("Enforcement of balanced shifts completed...")
+
+    def _get_sequence_day_number(self, day):
+        """Get the day group day number for a day in the extended period."""
+        return day + self.num_days + 1 if day < 0 else day + 1
+
+    def _get_non_working_shift_variables_in_sequence(
+        self, day, shift_seq, all_day_nums_in_seq, worker
+    ):
+        """Find non-working shift variables in shift sequence.
+
+        A blank/None position (no shift) in a shift sequence rule means no shift worked
+        that day.
+
+        """
+        non_working_shift_vars_in_seq = {}
+        for position, shift_ids in shift_seq:
+            non_working_shift_vars_in_seq[position] = []
+            for shift_id in shift_ids:
+                if shift_id is None:
+                    day_to_test = day + position - 1
+
+                    # Skip if day not in day group for sequence
+                    if (
+                        self._get_sequence_day_number(day_to_test)
+                        not in all_day_nums_in_seq
+                    ):
+                        break
+
+                    for role_id in worker.role_ids:
+                        try:
+                            for timeslot in self.timeslots_lookup[day_to_test]:
+                                non_working_shift_vars_in_seq[position].append(
+                                    self.shift_decision_vars[
+                                        (worker.id, role_id, day_to_test, timeslot.id)
+                                    ]
+                                )
+                        except KeyError:
+                            continue
+        return non_working_shift_vars_in_seq
+
+    def _get_working_shift_variables_in_sequence(
+        self, day, shift_seq, all_day_nums_in_seq, worker, timeslot_ids
+    ):
+        """Find working day shift variables in shift sequence."""
+        working_shift_vars_in_seq = {}
+        for position, shift_ids in shift_seq:
+            working_shift_vars_in_seq[position] = []
+            for shift_id in shift_ids:
+                if shift_id is not None:
+                    day_to_test = day + position - 1
+
+                    # Skip if day not in day group for sequence
+                    if (
+                        self._get_sequence_day_number(day_to_test)
+                        not in all_day_nums_in_seq
+                    ):
+                        break
+
+                    for role_id in worker.role_ids:
+                        try:
+                            working_shift_vars_in_seq[position].append(
+                                self.shift_decision_vars[
+                                    (
+                                        worker.id,
+                                        role_id,
+                                        day_to_test,
+                                        timeslot_ids[(day_to_test, shift_id)],
+                                    )
+                                ]
+                            )
+                        except KeyError:
+                            continue
+        return working_shift_vars_in_seq
+
+    def _enforce_invalid_shift_sequences(self):
+        """Enforce invalid shift sequences / staff rules.
+
+        Need to look at previous roster period also
+        """
+        log.info("Enforcement of invalid shift sequence rules started...")
+        timeslot_ids = {
+            (timeslot.day, timeslot.shift_id): timeslot.id
+            for timeslot in self.snapshot.timeslots
+        }
+        shift_sequences = {
+            shiftsequence.id: shiftsequence
+            for shiftsequence in self.snapshot.shift_sequences
+        }
+        for worker in self.workers:
+            for sequence_id in worker.sequence_ids:
+                shiftsequence = shift_sequences[sequence_id]
+                for day in self.extended_days:
+                    non_working_shift_vars_in_seq = (
+                        self._get_non_working_shift_variables_in_sequence(
+                            day,
+                            shiftsequence.positions,
+                            shiftsequence.day_numbers,
+                            worker,
+                        )
+                    )
+                    working_shift_vars_in_seq = (
+                        self._get_working_shift_variables_in_sequence(
+                            day,
+                            shiftsequence.positions,
+                            shiftsequence.day_numbers,
+                            worker,
+                            timeslot_ids,
+                        )
+                    )
+
+                    # Create intermediate vars
+                    intermediate_shift_sequence_vars = {
+                        position: self.model.NewBoolVar(
+                            f"w{worker.id}d{day}sr{sequence_id}p{position}"
+                        )
+                        for position in working_shift_vars_in_seq
+                    }
+
+                    # Enforce invalidation of non-working day in shift sequence
+                    for position, shift_vars in non_working_shift_vars_in_seq.items():
+                        if len(shift_vars) > 0:
+                            self.model.Add(sum(shift_vars) >= 1).OnlyEnforceIf(
+                                intermediate_shift_sequence_vars[position]
+                            )
+
+                    # Enforce invalidation of working day in shift sequence
+                    for position, shift_vars in working_shift_vars_in_seq.items():
+                        if len(shift_vars) > 0:
+                            self.model.Add(sum(shift_vars) == 0).OnlyEnforceIf(
+                                intermediate_shift_sequence_vars[position]
+                            )
+
+                    # Enforce one intermediate variable to be true
+                    # Only need to enforce one position per rule
+                    self.model.Add(sum(intermediate_shift_sequence_vars.values()) >= 1)
+
+        log.info("Enforcement of invalid shift sequence rules completed...")
+
+    def _enforce_staff_numbers(self):
+        """Enforce staff numbers."""
+        log.info("Enforcement of staff numbers started...")
+        max_shift_size_lookup = {}
+        min_shift_size_lookup = {}
+        for shift_id, rules in self.skill_mix_rules.items():
+            role_count_sizes = [sum(role_counts.values()) for role_counts in rules]
+            max_shift_size_lookup[shift_id] = max(role_count_sizes)
+            min_shift_size_lookup[shift_id] = min(role_count_sizes)
+        for timeslot in self.timeslots:
+            max_timeslot_size = max_shift_size_lookup[timeslot.shift_id]
+            min_timeslot_size = max_shift_size_lookup[timeslot.shift_id]
+            num_staff_allocated = sum(
+                self.shift_decision_vars[
+                    (worker.id, role_id, timeslot.day, timeslot.id)
+                ]
+                for worker in self.workers
+                for role_id in worker.role_ids
+            )
+            self.model.Add(num_staff_allocated >= min_timeslot_size)
+            self.model.Add(num_staff_allocated <= max_timeslot_size)
+        log.info("Enforcement of staff numbers completed...")
+
+    def _maximise_staff_requests(self):
+        """Maximise the number of satisfied staff requests."""
+        log.info("Maximising of staff requests started...")
+        staff_requests = {
+            (worker_id, day, shift_id): weight
+            for worker_id, day, shift_id, weight in self.snapshot.requests
+        }
+        self.model.Maximize(
+            sum(
+                staff_requests.get((worker.id, day, timeslot.shift_id), 0)
+                * self.shift_decision_vars[(worker.id, role_id, day, timeslot.id)]
+                for worker in self.workers
+                for role_id in worker.role_ids
+                for day in self.days
+                for timeslot in self.timeslots_lookup[day]
+            )
+        )
+        log.info("Maximising of staff requests completed...")
+
+    def _solve_roster(self):
+        """Create the solver and solve."""
+        self.solver = cp_model.CpSolver()
+        self.solver.parameters.max_time_in_seconds = self.snapshot.max_time_in_seconds
+        # Keep the search log in the response only, it is parsed for presolve time
+        self.solver.parameters.log_search_progress = True
+        self.solver.parameters.log_to_stdout = False
+        self.solver.parameters.log_to_response = True
+        log.info("Solver started...")
+        self.status = self.solver.Solve(self.model)
+        log.info(
+            "Solver finished in %.3fs with %s conflicts and %s branches...",
+            self.solver.WallTime(),
+            self.solver.NumConflicts(),
+            self.solver.NumBranches(),
+        )
+        if self.status == cp_model.INFEASIBLE:
+            log.info("Solution is INFEASIBLE")
+
+    def _get_presolve_time(self):
+        """Get presolve time in seconds from the search log."""
+        match = PRESOLVE_TIME_PATTERN.search(self.solver.ResponseProto().solve_log)
+        return float(match.group(1)) if match else None
+
+    def _collect_assignments(self):
+        """Collect assignments for the current roster period."""
+        return [
+            (worker_id, timeslot_id)
+            for (
+                worker_id,
+                _,
+                day,
+                timeslot_id,
+            ), var in self.shift_decision_vars.items()
+            if day >= 0 and self.solver.Value(var)
+        ]
+
+    def build(self):
+        """Build the model as per constraints."""
+        for step in (
+            self._create_timeslots_lookup,
+            self._create_shift_decision_vars,
+            self._create_previous_shift_decision_vars,
+            self._exclude_leave_dates,
+            self._enforce_one_shift_per_day,
+            self._enforce_shifts_per_roster,
+            self._collect_skill_mix_rules,
+            self._create_intermediate_skill_mix_vars,
+            self._enforce_one_skill_mix_rule_at_a_time,
+            self._enforce_skill_mix_rules,
+            self._enforce_balanced_shifts,
+            self._enforce_invalid_shift_sequences,
+            self._enforce_staff_numbers,
+            self._maximise_staff_requests,
+        ):
+            with self.profiler.phase(step.__name__.lstrip("_"), self.model):
+                step()
+
+    def solve(self):
+        """Build and solve the model, returning a SolverResult."""
+        self.build()
+        with self.profiler.phase("solve"):
+            self._solve_roster()
+        feasible = self.status in (cp_model.FEASIBLE, cp_model.OPTIMAL)
+        assignments = self._collect_assignments() if feasible else []
+        peak_memory, resident_memory = memory_usage()
+        proto = self.model.Proto()
+        return SolverResult(
+            status=self.solver.StatusName(self.status),
+            feasible=feasible,
+            assignments=pack_assignments(assignments),
+            variables=len(proto.variables),
+            constraints=len(proto.constraints),
+            solve_time=self.solver.WallTime(),
+            presolve_time=self._get_presolve_time(),
+            conflicts=self.solver.NumConflicts(),
+            branches=self.solver.NumBranches(),
+            objective=self.solver.ObjectiveValue() if feasible else None,
+            best_bound=self.solver.BestObjectiveBound() if feasible else None,
+            peak_memory=peak_memory,
+            resident_memory=resident_memory,
+            phases=tuple(self.profiler.phases),
+        )
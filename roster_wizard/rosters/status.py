@@ -0,0 +1,78 @@
+"""Roster status.
+
+Roster runs replace the version of the "rosterrun" collection of the roster
+cache whenever they are saved. Status streams and long polls wait for a run
+to change by reading that one cache key, and only render the status, which
+reads the database and the Celery result backend, or read the run once it
+has changed.
+"""
+
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .cache import aget_stamp
+from .models import RosterRun
+
+RUN_COLLECTION = "rosterrun"
+
+
+async def aget_run_version():
+    """Get the version of roster runs asynchronously."""
+    return (await aget_stamp(collections=[RUN_COLLECTION])).version
+
+
+def format_event(event, data):
+    """Format a server-sent event with one data field per line of data."""
+    fields = "".join(f"data: {line}\n" for line in data.splitlines() or [""])
+    return f"event: {event}\n{fields}\n"
+
+
+async def wait_for_run(task_id, timeout):
+    """Get the run of a task once it has finished or timeout seconds have passed.
+
+    Waits on the event loop. Returns None if there is no run for the task.
+    """
+    deadline = time.monotonic() + timeout
+    version = None
+    while True:
+        current = await aget_run_version()
+        if current != version:
+            version = current
+            run = await RosterRun.objects.filter(task_id=task_id).afirst()
+            if run is None or run.is_finished:
+                return run
+        if time.monotonic() >= deadline:
+            return run
+        await asyncio.sleep(settings.ROSTER_STATUS_POLL_INTERVAL)
+
+
+async def iter_status_events(render, timeout):
+    """Yield a status event on connect and whenever the rendered status changes.
+
+    render is a synchronous callable returning the status HTML. It is called
+    when the run version changes, and every ROSTER_STATUS_RECHECK seconds in
+    case a run ended without being saved, which also keeps the connection
+    alive. The stream ends after timeout seconds and the browser reconnects.
+    """
+    yield f"retry: {settings.ROSTER_STATUS_RETRY}\n\n"
+    render = sync_to_async(render)
+    status = version = None
+    checked = 0
+    deadline = time.monotonic() + timeout
+    while True:
+        current = await aget_run_version()
+        now = time.monotonic()
+        if current != version or now - checked >= settings.ROSTER_STATUS_RECHECK:
+            version, checked = current, now
+            rendered = await render()
+            if rendered == status:
+                yield ": keepalive\n\n"
+            else:
+                status = rendered
+                yield format_event("status", status)
+        if now >= deadline:
+            return
+        await asyncio.sleep(settings.ROSTER_STATUS_POLL_INTERVAL)
@@ -0,0 +1,211 @@
+"""Synthetic roster problems.
+
+Generates rosters of any size for benchmarking. Every staff member has one
+role and a fifth of each role are casual staff who absorb leave and spare
+shifts. Skill mix counts are sized from the number of staff so that problems
+stay feasible as they grow. All rows are written with bulk_create.
+"""
+
+import datetime
+import math
+import random
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .cache import invalidate_all, invalidate_dates
+from .models import (
+    Day,
+    DayGroup,
+    DayGroupDay,
+    Leave,
+    Role,
+    Shift,
+    ShiftSequence,
+    ShiftSequenceShift,
+    SkillMixRule,
+    SkillMixRuleRole,
+    StaffRequest,
+    TimeSlot,
+)
+from .reference import REFERENCE_COLLECTION
+
+
+SyntheticSpec = namedtuple(
+    "SyntheticSpec",
+    "staff roles days shifts skill_mix_rules sequence_rules "
+    "leave_density request_density seed",
+    defaults=(20, 3, 14, 2, 2, 1, 0.05, 0.1, 0),
+)
+
+EMAIL_DOMAIN = "synthetic.example.com"
+
+
+def clear_roster_data():
+    """Delete all roster configuration, roster data and synthetic staff."""
+    for model in (
+        TimeSlot,
+        StaffRequest,
+        Leave,
+        ShiftSequence,
+        SkillMixRule,
+        Shift,
+        DayGroup,
+        Day,
+        Role,
+    ):
+        model.objects.all().delete()
+    get_user_model().objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").delete()
+
+
+def _split_staff(spec):
+    """Split staff into (regulars, casuals) per role."""
+    casuals = max(1, math.ceil(spec.staff * 0.2 / spec.roles))
+    regulars = max(spec.staff - casuals * spec.roles, spec.roles)
+    return [
+        (regulars // spec.roles + (1 if role < regulars % spec.roles else 0), casuals)
+        for role in range(spec.roles)
+    ]
+
+
+def _invalidate():
+    """Invalidate the cached rosters and reference data of every process."""
+    invalidate_all()
+    invalidate_dates([], [REFERENCE_COLLECTION])
+
+
+def create_synthetic_roster(spec, start_date):
+    """Create a synthetic roster problem for the period starting at start_date."""
+    rng = random.Random(spec.seed)
+    if isinstance(start_date, datetime.datetime):
+        start_date = start_date.date()
+    staff_per_role = _split_staff(spec)
+    target_shifts = max(1, spec.days // 2)
+    count = max(
+        1,
+        min(regulars for regulars, _ in staff_per_role)
+        * target_shifts
+        // (spec.days * spec.shifts),
+    )
+
+    roles = Role.objects.bulk_create(
+        Role(role_name=f"Role {number}") for number in range(1, spec.roles + 1)
+    )
+    days = Day.objects.bulk_create(
+        Day(number=number) for number in range(1, spec.days + 1)
+    )
+    daygroup = DayGroup.objects.create(name="All Days")
+    DayGroupDay.objects.bulk_create(
+        DayGroupDay(daygroup=daygroup, day=day) for day in days
+    )
+    shifts = Shift.objects.bulk_create(
+        Shift(shift_type=f"Shift {number}", daygroup=daygroup)
+        for number in range(1, spec.shifts + 1)
+    )
+
+    rules = []
+    rule_roles = []
+    for shift in shifts:
+        for rule_num in range(spec.skill_mix_rules):
+            counts = [count] * spec.roles
+            if rule_num and spec.roles > 1:
+                # Move one position between roles for an alternative skill mix
+                counts[(rule_num - 1) % spec.roles] -= 1
+                counts[rule_num % spec.roles] += 1
+            rule = SkillMixRule(
+                skillmixrule_name=f"{shift.shift_type} Mix {rule_num + 1}",
+                shift=shift,
+            )
+            rules.append(rule)
+            rule_roles.extend(
+                SkillMixRuleRole(skillmixrule=rule, role=role, count=role_count)
+                for role, role_count in zip(roles, counts)
+                if role_count
+            )
+    SkillMixRule.objects.bulk_create(rules)
+    SkillMixRuleRole.objects.bulk_create(rule_roles)
+
+    password = make_password(None)
+    staff = []
+    staff_roles = []
+    regular_staff = []
+    for role, (regulars, casuals) in zip(roles, staff_per_role):
+        # Leave some of every role's shifts to casuals so the problem stays loose
+        shifts_per_roster = min(
+            target_shifts, count * spec.days * spec.shifts * 4 // (regulars * 5)
+        )
+        # Balanced shifts puts half in each half of the period, so keep it even
+        shifts_per_roster -= shifts_per_roster % 2
+        for number in range(regulars + casuals):
+            casual = number >= regulars
+            worker = get_user_model()(
+                email=f"{role.role_name.replace(' ', '').lower()}-{number}@{EMAIL_DOMAIN}",
+                password=password,
+                last_name=f"{role.role_name} {number:05d}",
+                first_name="Casual" if casual else "Regular",
+                available=True,
+                shifts_per_roster=0 if casual else shifts_per_roster,
+                enforce_shifts_per_roster=not casual,
+                enforce_one_shift_per_day=not casual,
+            )
+            staff.append(worker)
+            staff_roles.append((worker, role))
+            if not casual:
+                regular_staff.append(worker)
+    get_user_model().objects.bulk_create(staff)
+    get_user_model().roles.through.objects.bulk_create(
+        get_user_model().roles.through(customuser_id=worker.id, role_id=role.id)
+        for worker, role in staff_roles
+    )
+
+    if len(shifts) > 1:
+        sequences = ShiftSequence.objects.bulk_create(
+            ShiftSequence(
+                shiftsequence_name=f"No {shifts[(number + 1) % len(shifts)].shift_type} "
+                f"before {shifts[number % len(shifts)].shift_type}",
+                daygroup=daygroup,
+            )
+            for number in range(spec.sequence_rules)
+        )
+        ShiftSequenceShift.objects.bulk_create(
+            ShiftSequenceShift(shiftsequence=sequence, shift=shift, position=position)
+            for number, sequence in enumerate(sequences)
+            for position, shift in (
+                (1, shifts[(number + 1) % len(shifts)]),
+                (2, shifts[number % len(shifts)]),
+            )
+        )
+        ShiftSequence.staff.through.objects.bulk_create(
+            ShiftSequence.staff.through(
+                shiftsequence_id=sequence.id, customuser_id=worker.id
+            )
+            for sequence in sequences
+            for worker in regular_staff
+        )
+
+    dates = [start_date + datetime.timedelta(days=day) for day in range(spec.days)]
+    Leave.objects.bulk_create(
+        Leave(date=date, description="Leave", staff_member=worker)
+        for worker in regular_staff
+        for date in dates
+        if rng.random() < spec.leave_density
+    )
+    StaffRequest.objects.bulk_create(
+        StaffRequest(
+            date=date,
+            shift=rng.choice(shifts),
+            like=rng.random() < 0.5,
+            priority=rng.randint(1, 10),
+            staff_member=worker,
+        )
+        for worker in staff
+        for date in dates
+        if rng.random() < spec.request_density
+    )
+    # Bulk changes send no signals, and once committed invalidate again so
+    # that no process keeps reference data it read before the commit
+    _invalidate()
+    transaction.on_commit(_invalidate)
+    return staff
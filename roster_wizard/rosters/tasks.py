@@ -4,16 +4,152 @@ from datetime import datetime
 from dateutil import parser
 
 from celery import shared_task
-from .logic import RosterGenerator
+from django.conf import settings
+from django.utils import timezone
 
+from .cache import invalidate_dates
+from .estimator import REJECT, estimate_roster
+from .logic import RosterGenerationCancelled, RosterGenerator, RosterOverBudget
+from .models import RosterRun
+from .status import RUN_COLLECTION
 
-@shared_task()
-def generate_roster(start_date):
+
+def _start_run(task_id, start_date):
+    """Record the start of a roster generation run, unless it was cancelled."""
+    defaults = {
+        "start_date": start_date.date(),
+        "status": RosterRun.RUNNING,
+        "started": timezone.now(),
+    }
+    if task_id is None:
+        return RosterRun.objects.create(**defaults)
+    run, created = RosterRun.objects.get_or_create(task_id=task_id, defaults=defaults)
+    if not created and run.status != RosterRun.CANCELLED:
+        for field, value in defaults.items():
+            setattr(run, field, value)
+        run.save()
+    return run
+
+
+def _record_progress(run, roster):
+    """Get a progress callback that records the phase a run has reached.
+
+    Cancellation is cooperative, the callback stops the generation before
+    its next phase once the run has been cancelled.
+    """
+
+    def record(phase, progress):
+        if RosterRun.objects.filter(pk=run.pk, status=RosterRun.CANCELLED).exists():
+            raise RosterGenerationCancelled(f"Cancelled before {phase}")
+        run.phase = phase
+        run.progress = progress
+        run.phases = [stats._asdict() for stats in roster.profiler.phases]
+        # Leave the status alone so a concurrent cancellation is kept
+        run.save(update_fields=["phase", "progress", "phases"])
+
+    return record
+
+
+def _finish_run(run, roster, status, message=""):
+    """Record the outcome, memory usage and staff request report of a run."""
+    run.status = status
+    run.message = message[:255]
+    if status == RosterRun.SUCCEEDED:
+        run.phase = ""
+        run.progress = 1.0
+    run.isolated = roster.isolated
+    run.memory_limit = roster.memory_limit
+    if roster.result is not None:
+        run.variables = roster.result.variables
+        run.constraints = roster.result.constraints
+        run.solve_time = roster.result.solve_time
+        run.solver_status = roster.result.status
+        run.presolve_time = roster.result.presolve_time
+        run.conflicts = roster.result.conflicts
+        run.branches = roster.result.branches
+        run.objective = roster.result.objective
+        run.best_bound = roster.result.best_bound
+    if roster.staff_request_report is not None:
+        run.staff_request_report = roster.staff_request_report
+    run.peak_memory = roster.peak_memory
+    run.resident_memory = roster.resident_memory
+    run.phases = [stats._asdict() for stats in roster.profiler.phases]
+    run.finished = timezone.now()
+    run.save()
+
+
+@shared_task(bind=True)
+def generate_roster(self, start_date, isolated=None, memory_limit=None):
     """Generate roster."""
     if not isinstance(start_date, datetime):
         start_date = parser.isoparse(start_date)
 
-    with RosterGenerator(start_date, max_concurrent=1) as roster:
-        roster.create()
+    run = _start_run(self.request.id, start_date)
+    if run.status == RosterRun.CANCELLED:
+        return "Roster generation was cancelled..."
+    roster = RosterGenerator(
+        start_date, max_concurrent=1, isolated=isolated, memory_limit=memory_limit
+    )
+    roster.progress = _record_progress(run, roster)
+    try:
+        with roster:
+            roster.create()
+    except RosterGenerationCancelled as error:
+        _finish_run(run, roster, RosterRun.CANCELLED, str(error))
+        return "Roster generation was cancelled..."
+    except Exception as error:
+        _finish_run(
+            run, roster, RosterRun.FAILED, f"{error.__class__.__name__}:{error}"
+        )
+        raise
+    _finish_run(run, roster, RosterRun.SUCCEEDED)
 
     return "Roster is complete..."
+
+
+def queue_generate_roster(start_date):
+    """Estimate a roster generation and queue it if within budget.
+
+    Generations estimated over budget raise RosterOverBudget, or are downgraded
+    to an isolated solve capped at the memory budget, as per ROSTER_OVER_BUDGET.
+    """
+    estimate = estimate_roster(start_date)
+    kwargs = {}
+    if estimate.over_budget:
+        if settings.ROSTER_OVER_BUDGET == REJECT:
+            raise RosterOverBudget(estimate)
+        kwargs = {"isolated": True, "memory_limit": settings.ROSTER_MEMORY_BUDGET}
+    result = generate_roster.delay(start_date=start_date, **kwargs)
+    defaults = {
+        "estimated_variables": estimate.variables,
+        "estimated_constraints": estimate.constraints,
+        "estimated_memory": estimate.memory,
+        "estimated_solve_time": estimate.solve_time,
+    }
+    RosterRun.objects.update_or_create(
+        task_id=result.task_id,
+        defaults=defaults,
+        create_defaults={**defaults, "start_date": start_date.date()},
+    )
+    return result, estimate
+
+
+def cancel_generate_roster(run):
+    """Cancel a roster generation that has not finished.
+
+    Queued generations end as soon as a worker starts them and running ones
+    stop before their next phase, so the broker need not be reached. Returns
+    whether the run was cancelled.
+    """
+    cancelled = (
+        RosterRun.objects.filter(pk=run.pk)
+        .exclude(status__in=RosterRun.FINISHED)
+        .update(
+            status=RosterRun.CANCELLED, message="Cancelled", finished=timezone.now()
+        )
+    )
+    if cancelled:
+        # Updates send no signals
+        invalidate_dates([], [RUN_COLLECTION])
+    run.refresh_from_db()
+    return bool(cancelled)
@@ -46,8 +46,10 @@ from .views import (
     TimeSlotCreateView,
     GenerateRosterView,
     edit_roster,
+    edit_roster_grid,
     SelectRosterPeriodView,
     SelectBulkDeletionPeriodView,
+    ExportRosterView,
     RosterByStaffView,
     StaffRequestListView,
     StaffRequestDeleteView,
@@ -55,6 +57,7 @@ from .views import (
     StaffRequestUpdateView,
     StaffRequestDetailView,
     download_csv,
+    staff_calendar,
     DayGroupListView,
     DayGroupUpdateView,
     DayGroupDetailView,
@@ -73,6 +76,7 @@ from .views import (
     DaySetCreateView,
     staff_request_status,
     roster_status_indicator,
+    roster_status_stream,
     roster_generation_status,
 )
 
@@ -329,7 +333,14 @@ urlpatterns = [
         edit_roster,
         name="edit_roster",
     ),
+    path(
+        "edit_roster_grid/",
+        edit_roster_grid,
+        name="edit_roster_grid",
+    ),
     path("download_csv/", download_csv, name="download_csv"),
+    path("export_roster/", ExportRosterView.as_view(), name="export_roster"),
+    path("calendar/<str:token>.ics", staff_calendar, name="staff_calendar"),
     path(
         "roster_settings/",
         RosterSettingsView.as_view(),
@@ -345,6 +356,11 @@ urlpatterns = [
         roster_status_indicator,
         name="roster_status_indicator",
     ),
+    path(
+        "roster_status_stream/",
+        roster_status_stream,
+        name="roster_status_stream",
+    ),
     path(
         "roster_status/<str:task_id>/",
         roster_generation_status,
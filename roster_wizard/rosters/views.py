@@ -2,6 +2,9 @@
 
 import datetime
 import csv
+import hashlib
+import hmac
+import io
 
 from collections import namedtuple
 
@@ -17,15 +20,28 @@ from django.contrib.auth.mixins import (
     LoginRequiredMixin,
     PermissionRequiredMixin,
 )
+from django.conf import settings
 from django.http import (
+    Http404,
     HttpResponse,
+    HttpResponseForbidden,
     HttpResponseRedirect,
+    StreamingHttpResponse,
 )
+from asgiref.sync import sync_to_async
 from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth import get_user_model
-from django.contrib import messages
+from django.contrib import admin, messages
 from django.forms import formset_factory
+from django.db import transaction
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
 
 # from django.db import connection, reset_queries
 
@@ -45,6 +61,7 @@ from .models import (
     Day,
     DayGroupDay,
     RosterSettings,
+    RosterRun,
 )
 from .forms import (
     DayGroupDayCreateForm,
@@ -57,17 +74,31 @@ from .forms import (
     DaySetCreateForm,
     GenerateRosterForm,
     EditRosterForm,
+    ExportRosterForm,
     SelectRosterForm,
     StaffRequestUpdateForm,
     RosterSettingsForm,
     SelectBulkDeletionPeriodForm,
     ShiftSequenceShiftCreateForm,
 )
+from .cache import aget_or_build, aget_stamp, get_or_build, get_stamp, invalidate_dates
+from .editing import create_missing_timeslots
+from .estimator import estimate_roster
+from .export import roster_csv_response
+from .grid import get_roster_dates, get_roster_grid
+from .ical import build_calendar, get_calendar_dates, get_calendar_staff_key
+from .metrics import CONTENT_TYPE, render_metrics
 from .logic import (
+    MissingDayGroup,
+    RosterOverBudget,
     SolutionNotFeasible,
-    get_roster_by_staff,
 )
-from .tasks import generate_roster
+from .period import get_day_shifts, get_period_calendar
+from .queryprofile import get_top_views, iter_profile_records
+from .reference import REFERENCE_COLLECTION, get_reference_data
+from .reports import get_staff_request_report
+from .status import iter_status_events
+from .tasks import queue_generate_roster
 
 
 class RosterSettingsView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
@@ -81,9 +112,10 @@ class RosterSettingsView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
     def get_form_kwargs(self):
         """Pass current settings to form."""
         kwargs = super().get_form_kwargs()
-        if RosterSettings.objects.exists():
-            kwargs["roster_name"] = RosterSettings.objects.first().roster_name
-            kwargs["not_used"] = RosterSettings.objects.first().not_used
+        roster_settings = get_reference_data().roster_settings
+        if roster_settings is not None:
+            kwargs["roster_name"] = roster_settings.roster_name
+            kwargs["not_used"] = roster_settings.not_used
         else:
             kwargs["roster_name"] = "No Roster Name Set"
             kwargs["not_used"] = "not_used"
@@ -93,8 +125,8 @@ class RosterSettingsView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
         """Process roster settings form."""
         roster_name = form.cleaned_data["roster_name"]
         not_used = form.cleaned_data["not_used"]
-        if RosterSettings.objects.exists():
-            new_settings = RosterSettings.objects.first()
+        new_settings = RosterSettings.objects.first()
+        if new_settings is not None:
             new_settings.roster_name = roster_name
             new_settings.not_used = not_used
         else:
@@ -122,7 +154,7 @@ class LeaveListView(LoginRequiredMixin, ListView):
             )
         else:
             start_date = datetime.datetime.now()
-        num_days = datetime.timedelta(days=Day.objects.count() - 1)
+        num_days = datetime.timedelta(days=get_reference_data().day_count - 1)
         end_date = start_date + num_days
         date_range = [start_date, end_date]
         # Users can only see their own leave
@@ -260,7 +292,7 @@ class ShiftUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
     """Shift Update View."""
 
     model = Shift
-    fields = ("shift_type", "daygroup")
+    fields = ("shift_type", "daygroup", "start_time", "end_time")
     template_name = "shift_update.html"
 
     permission_required = "rosters.change_roster"
@@ -281,7 +313,7 @@ class ShiftCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
 
     model = Shift
     template_name = "shift_create.html"
-    fields = ("shift_type", "daygroup")
+    fields = ("shift_type", "daygroup", "start_time", "end_time")
 
     permission_required = "rosters.change_roster"
 
@@ -294,7 +326,9 @@ class SkillMixRuleListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         """Change order of shift rule list view."""
-        return SkillMixRule.objects.order_by("shift", "skillmixrule_name")
+        return SkillMixRule.objects.prefetch_related("skillmixrulerole_set").order_by(
+            "shift", "skillmixrule_name"
+        )
 
 
 class SkillMixRuleDetailView(LoginRequiredMixin, DetailView):
@@ -402,7 +436,9 @@ class ShiftSequenceListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         """Change list order."""
-        return ShiftSequence.objects.order_by("shiftsequence_name")
+        return ShiftSequence.objects.prefetch_related(
+            "shiftsequenceshift_set"
+        ).order_by("shiftsequence_name")
 
 
 class ShiftSequenceDetailView(LoginRequiredMixin, DetailView):
@@ -517,7 +553,7 @@ class TimeSlotListView(LoginRequiredMixin, ListView):
             )
         else:
             start_date = datetime.datetime.now()
-        num_days = datetime.timedelta(days=Day.objects.count() - 1)
+        num_days = datetime.timedelta(days=get_reference_data().day_count - 1)
         end_date = start_date + num_days
         date_range = [start_date, end_date]
         return (
@@ -572,7 +608,7 @@ class DayGroupListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         """Change order of day group list view."""
-        return DayGroup.objects.order_by("name")
+        return DayGroup.objects.prefetch_related("daygroupday_set").order_by("name")
 
 
 class DayGroupDetailView(LoginRequiredMixin, DetailView):
@@ -627,6 +663,12 @@ class DayGroupDayListView(LoginRequiredMixin, ListView):
     model = DayGroupDay
     template_name = "daygroupday_list.html"
 
+    def get_queryset(self):
+        """Order day group days by day group and day, with both in one query."""
+        return DayGroupDay.objects.select_related("daygroup", "day").order_by(
+            "daygroup__name", "day__number"
+        )
+
 
 class DayGroupDayDetailView(LoginRequiredMixin, DetailView):
     """Day Group Day Detail View."""
@@ -761,7 +803,7 @@ class StaffRequestListView(LoginRequiredMixin, ListView):
             )
         else:
             start_date = datetime.datetime.now()
-        num_days = datetime.timedelta(days=Day.objects.count() - 1)
+        num_days = datetime.timedelta(days=get_reference_data().day_count - 1)
         end_date = start_date + num_days
         date_range = [start_date, end_date]
         # Users can only see their own requests
@@ -825,8 +867,8 @@ class StaffRequestUpdateView(LoginRequiredMixin, FormView):
             )
         else:
             start_date = datetime.datetime.now()
-        num_days = datetime.timedelta(days=Day.objects.count() - 1)
-        end_date = start_date + num_days
+        day_shifts = get_day_shifts()
+        end_date = start_date + datetime.timedelta(days=len(day_shifts) - 1)
         date_range = [start_date, end_date]
         self.dates = []
         self.shifts = []
@@ -837,30 +879,18 @@ class StaffRequestUpdateView(LoginRequiredMixin, FormView):
         )
         RequestDetail = namedtuple("RequestDetail", "like priority")
         request_lookup = {
-            (staffrequest.date, staffrequest.shift): RequestDetail(
+            (staffrequest.date, staffrequest.shift_id): RequestDetail(
                 like=staffrequest.like,
                 priority=staffrequest.priority,
             )
             for staffrequest in staffrequests
         }
-        daygroup_shifts_map = {
-            daygroup: list(daygroup.shift_set.all())
-            for daygroup in DayGroup.objects.all()
-        }
-
-        day_shifts_map = {}
-        days = Day.objects.all()
-        for day in days:
-            day_shifts_map[day.number] = []
-            for daygroupday in day.daygroupday_set.all():
-                for shift in daygroup_shifts_map[daygroupday.daygroup]:
-                    day_shifts_map[day.number].append(shift)
-        for day in days:
-            for shift in day_shifts_map[day.number]:
-                date = (start_date + datetime.timedelta(days=day.number - 1)).date()
+        for number, shifts in day_shifts.items():
+            date = (start_date + datetime.timedelta(days=number - 1)).date()
+            for shift in shifts:
                 self.dates.append(date)
                 self.shifts.append(shift)
-                request_id = (date, shift)
+                request_id = (date, shift.id)
                 if request_id in request_lookup:
                     if request_lookup[request_id].like:
                         self.requests.append("Yes")
@@ -881,32 +911,55 @@ class StaffRequestUpdateView(LoginRequiredMixin, FormView):
         return context
 
     def form_valid(self, form):
-        """Process staff requests form."""
-        shifts = Shift.objects.all()
+        """Save only the staff requests that changed in one transaction."""
+        wanted = {}
         for i, date in enumerate(self.dates):
-            # Delete existing requests for date and shift
-            shift = shifts.get(shift_type=self.shifts[i])
-            StaffRequest.objects.filter(
-                date=date,
-                shift=shift,
-                staff_member=self.staff_member,
-            ).delete()
-            if form.cleaned_data[f"request_{i}"] == "Yes":
-                StaffRequest.objects.create(
-                    date=date,
-                    shift=shift,
-                    staff_member=self.staff_member,
-                    like=True,
-                    priority=form.cleaned_data[f"priority_{i}"],
+            choice = form.cleaned_data[f"request_{i}"]
+            if choice in ("Yes", "No"):
+                wanted[(date, self.shifts[i].id)] = (
+                    choice == "Yes",
+                    form.cleaned_data[f"priority_{i}"],
                 )
-            elif form.cleaned_data[f"request_{i}"] == "No":
-                StaffRequest.objects.create(
-                    date=date,
-                    shift=shift,
-                    staff_member=self.staff_member,
-                    like=False,
-                    priority=form.cleaned_data[f"priority_{i}"],
+        cells = {(date, shift.id) for date, shift in zip(self.dates, self.shifts)}
+        with transaction.atomic():
+            stored = {
+                (date, shift_id): (request_id, like, priority)
+                for request_id, date, shift_id, like, priority in (
+                    StaffRequest.objects.filter(
+                        staff_member=self.staff_member,
+                        date__in={date for date, _ in cells},
+                    )
+                    .order_by()
+                    .values_list("id", "date", "shift_id", "like", "priority")
                 )
+            }
+            deleted = [cell for cell in cells if cell in stored and cell not in wanted]
+            saved = [
+                cell
+                for cell, detail in wanted.items()
+                if cell not in stored or stored[cell][1:] != detail
+            ]
+            StaffRequest.objects.filter(
+                id__in=[stored[cell][0] for cell in deleted]
+            ).delete()
+            StaffRequest.objects.bulk_create(
+                [
+                    StaffRequest(
+                        date=date,
+                        shift_id=shift_id,
+                        staff_member=self.staff_member,
+                        like=wanted[(date, shift_id)][0],
+                        priority=wanted[(date, shift_id)][1],
+                    )
+                    for date, shift_id in saved
+                ],
+                update_conflicts=True,
+                unique_fields=["staff_member", "date", "shift"],
+                update_fields=["like", "priority"],
+            )
+        if deleted or saved:
+            # Bulk changes send no signals
+            invalidate_dates({date for date, _ in deleted + saved}, ["staffrequest"])
         return super().form_valid(form)
 
     def get_form_kwargs(self):
@@ -926,6 +979,32 @@ class StaffRequestDetailView(LoginRequiredMixin, PermissionRequiredMixin, Detail
     permission_required = "rosters.change_roster"
 
 
+def _session_period_etag(request, *args, **kwargs):
+    """ETag of the roster period selected in the session, as seen by the user.
+
+    Pages of the selected period have no Last-Modified, as selecting an older
+    period must not match an If-Modified-Since of a newer one.
+    """
+    if "start_date" in request.session:
+        start_date = datetime.datetime.strptime(
+            request.session["start_date"], "%d-%b-%Y"
+        )
+    else:
+        start_date = datetime.datetime.now()
+    # The reference data and session state are rendered by base.html too
+    stamp = get_stamp(get_roster_dates(start_date), [REFERENCE_COLLECTION])
+    state = "-".join(
+        str(value)
+        for value in (
+            request.user.pk,
+            request.session.get("start_date", ""),
+            request.session.get("task_id", ""),
+        )
+    )
+    return f"{stamp.version}-{hashlib.md5(state.encode()).hexdigest()}"
+
+
+@method_decorator(condition(etag_func=_session_period_etag), name="get")
 class RosterByStaffView(LoginRequiredMixin, TemplateView):
     """Roster By Staff View."""
 
@@ -940,9 +1019,7 @@ class RosterByStaffView(LoginRequiredMixin, TemplateView):
             )
         else:
             start_date = datetime.datetime.now()
-        dates, roster = get_roster_by_staff(start_date)
-        context["dates"] = dates
-        context["roster"] = roster
+        context["grid"] = get_roster_grid(start_date)
         return context
 
 
@@ -980,6 +1057,19 @@ class SelectBulkDeletionPeriodView(
         return super().form_valid(form)
 
 
+class ExportRosterView(LoginRequiredMixin, FormView):
+    """Export Roster View."""
+
+    template_name = "export_roster.html"
+    form_class = ExportRosterForm
+
+    def form_valid(self, form):
+        """Stream roster for the selected range as CSV."""
+        return roster_csv_response(
+            self.request, form.cleaned_data["start_date"], form.cleaned_data["end_date"]
+        )
+
+
 class GenerateRosterView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
     """Generate Roster View."""
 
@@ -994,6 +1084,19 @@ class GenerateRosterView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
         kwargs.update(request=self.request)
         return kwargs
 
+    def get_context_data(self, **kwargs):
+        """Add model size estimate for the selected roster period."""
+        context = super().get_context_data(**kwargs)
+        if "estimate" not in context:
+            if "start_date" in self.request.session:
+                start_date = datetime.datetime.strptime(
+                    self.request.session["start_date"], "%d-%b-%Y"
+                )
+            else:
+                start_date = datetime.datetime.now()
+            context["estimate"] = estimate_roster(start_date)
+        return context
+
     def form_valid(self, form):
         """Process generate roster form."""
         start_date = form.cleaned_data["start_date"]
@@ -1008,7 +1111,12 @@ class GenerateRosterView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
                 )
                 return render(self.request, "generate_roster.html", {"form": form})
         try:
-            result = generate_roster.delay(start_date=start_date)
+            result, estimate = queue_generate_roster(start_date)
+        except RosterOverBudget as error:
+            messages.add_message(self.request, messages.ERROR, f"Error: {error}")
+            return self.render_to_response(
+                self.get_context_data(form=form, estimate=error.estimate)
+            )
         except Exception as error:  # pylint: disable=broad-exception-caught
             messages.add_message(
                 self.request,
@@ -1017,6 +1125,13 @@ class GenerateRosterView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
             )
             return HttpResponseRedirect(reverse("generate_roster"))
         self.request.session["task_id"] = result.task_id
+        if estimate.over_budget:
+            messages.add_message(
+                self.request,
+                messages.WARNING,
+                "Roster is over budget and will be solved in an isolated "
+                "process capped at the memory budget...",
+            )
         messages.add_message(
             self.request,
             messages.SUCCESS,
@@ -1036,26 +1151,14 @@ def edit_roster(request):
     else:
         start_date = datetime.datetime.now()
 
-    num_days = Day.objects.count()
-
-    dates = [
-        (start_date + datetime.timedelta(days=day_num)).date()
-        for day_num in range(num_days)
-    ]
+    dates = get_roster_dates(start_date)
+    num_days = len(dates)
 
     staff_members = get_user_model().objects.all()
     staff_ids = [staff_member.id for staff_member in staff_members]
 
     # Create timeslots if they do not already exist
-    for shift in Shift.objects.all():
-        daygroupdays = shift.daygroup.daygroupday_set.all()
-        for daygroupday in daygroupdays:
-            if not TimeSlot.objects.filter(
-                date=dates[daygroupday.day.number - 1], shift=shift
-            ).exists():
-                TimeSlot.objects.create(
-                    date=dates[daygroupday.day.number - 1], shift=shift
-                )
+    create_missing_timeslots(dates)
 
     EditRosterFormSet = formset_factory(EditRosterForm, extra=0)
 
@@ -1066,7 +1169,7 @@ def edit_roster(request):
 
     all_timeslots = TimeSlot.objects.filter(date__range=date_range)
 
-    shift_types = [shift.shift_type for shift in Shift.objects.all()]
+    shift_types = [shift.shift_type for shift in get_reference_data().shifts]
     shift_types.append("X")
 
     # Form posted
@@ -1077,7 +1180,7 @@ def edit_roster(request):
         )
         if formset.is_valid():
             process_edit_roster_form(
-                dates, all_timeslots, formset, start_date, staff_ids
+                dates, get_period_calendar(dates), formset, start_date, staff_ids
             )
             return HttpResponseRedirect(reverse("roster_by_staff"))
     # Form not posted
@@ -1102,6 +1205,19 @@ def edit_roster(request):
     )
 
 
+@login_required
+@permission_required("rosters.change_roster")
+def edit_roster_grid(request):
+    """Edit the roster cell by cell through the roster cells API."""
+    if "start_date" in request.session:
+        start_date = datetime.datetime.strptime(
+            request.session["start_date"], "%d-%b-%Y"
+        )
+    else:
+        start_date = datetime.datetime.now()
+    return render(request, "edit_roster_grid.html", {"start_date": start_date})
+
+
 def populate_edit_roster_form(
     staff_members,
     all_timeslots,
@@ -1138,38 +1254,56 @@ def populate_edit_roster_form(
     )
 
 
-def process_edit_roster_form(dates, all_timeslots, formset, start_date, staff_ids):
-    """Process edit roster form."""
-    # Cleaned data from formset is a list of dictionaries
-    timeslots_lookup = {date: [] for date in dates}
-    for timeslot in all_timeslots:
-        timeslots_lookup[timeslot.date].append(timeslot)
+def process_edit_roster_form(dates, calendar, formset, start_date, staff_ids):
+    """Save only the assignments that differ between the form and the roster."""
+    shift_types = {shift.id: shift.shift_type for shift in get_reference_data().shifts}
+    timeslots_lookup = {}
+    for date, timeslots in calendar.timeslots.items():
+        for shift_id, timeslot_id in timeslots.items():
+            timeslots_lookup.setdefault((date, shift_types[shift_id]), []).append(
+                timeslot_id
+            )
 
-    # Clear staff from all timeslots
-    for timeslot in all_timeslots:
-        timeslot.staff.clear()
+    # Cleaned data from formset is a list of dictionaries
 
-    # Populate timeslots with staff as per form
-    TimeSlotStaffRelationship = TimeSlot.staff.through  # pylint: disable=invalid-name
-    staff_to_add = []
+    wanted = set()
     for staff_num, shift_set in enumerate(formset.cleaned_data):
         for day_num, day_label in enumerate(shift_set):
-            shift_type = shift_set[day_label]
-            timeslots = timeslots_lookup[
-                (start_date + datetime.timedelta(days=day_num)).date()
-            ]
-            for timeslot in timeslots:
-                if timeslot.shift.shift_type == shift_type:
-                    staff_to_add.append(
-                        TimeSlotStaffRelationship(
-                            timeslot_id=timeslot.id,
-                            customuser_id=staff_ids[staff_num],
-                        )
-                    )
-    TimeSlotStaffRelationship.objects.bulk_create(staff_to_add)
+            date = (start_date + datetime.timedelta(days=day_num)).date()
+            for timeslot_id in timeslots_lookup.get((date, shift_set[day_label]), ()):
+                wanted.add((timeslot_id, staff_ids[staff_num]))
+
+    TimeSlotStaffRelationship = TimeSlot.staff.through  # pylint: disable=invalid-name
+    with transaction.atomic():
+        stored = {
+            (timeslot_id, staff_id): relationship_id
+            for relationship_id, timeslot_id, staff_id in (
+                TimeSlotStaffRelationship.objects.filter(
+                    timeslot__date__range=[dates[0], dates[-1]]
+                )
+                .select_for_update(of=("self",))
+                .values_list("id", "timeslot_id", "customuser_id")
+            )
+        }
+        staff_to_remove = [
+            relationship_id
+            for assignment, relationship_id in stored.items()
+            if assignment not in wanted
+        ]
+        staff_to_add = [
+            TimeSlotStaffRelationship(timeslot_id=timeslot_id, customuser_id=staff_id)
+            for timeslot_id, staff_id in wanted
+            if (timeslot_id, staff_id) not in stored
+        ]
+        TimeSlotStaffRelationship.objects.filter(id__in=staff_to_remove).delete()
+        TimeSlotStaffRelationship.objects.bulk_create(staff_to_add)
+    if staff_to_remove or staff_to_add:
+        # Bulk changes send no signals
+        invalidate_dates(dates, ["timeslot"])
 
 
 @login_required
+@condition(etag_func=_session_period_etag)
 def download_csv(request):
     """Download roster as CSV file."""
     if "start_date" in request.session:
@@ -1179,27 +1313,33 @@ def download_csv(request):
     else:
         start_date = datetime.datetime.now()
 
-    dates, roster = get_roster_by_staff(start_date)
+    grid = get_roster_grid(start_date)
+    content = get_or_build("csv", grid.dates, lambda: render_roster_csv(grid))
 
-    response = HttpResponse(content_type="text/csv")
+    response = HttpResponse(content, content_type="text/csv")
     response["Content-Disposition"] = 'attachment; filename="roster.csv"'
+    return response
+
 
-    writer = csv.writer(response)
-    dates = [date.strftime("%a %d-%b-%Y") for date in dates]
+def render_roster_csv(grid):
+    """Render roster grid as CSV."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    dates = [date.strftime("%a %d-%b-%Y") for date in grid.dates]
     row = ["Staff Member", "Roles", "Shifts"] + dates
     writer.writerow(row)
-    for staff_member in roster:
-        row = [staff_member]
-        row.extend(roster[staff_member][key] for key in roster[staff_member])
+    for worker, cells in grid.rows():
+        row = [worker.name, worker.roles, worker.shifts_per_roster]
+        row.extend(cells)
         writer.writerow(row)
-    return response
+    return output.getvalue()
 
 
 @login_required
 @permission_required("rosters.change_roster")
+@condition(etag_func=_session_period_etag)
 def staff_request_status(request):
     """Display staff request status."""
-    print("starting")
     if "start_date" in request.session:
         start_date = datetime.datetime.strptime(
             request.session["start_date"], "%d-%b-%Y"
@@ -1207,63 +1347,62 @@ def staff_request_status(request):
     else:
         start_date = datetime.datetime.now()
 
-    num_days = datetime.timedelta(days=Day.objects.count() - 1)
-    end_date = start_date + num_days
-    date_range = [start_date, end_date]
-
-    staff_requests = StaffRequest.objects.filter(date__range=date_range)
-    timeslots = TimeSlot.objects.filter(date__range=date_range)
-    successes = []
-    failures = []
-    for staff_request in staff_requests:
-        date = staff_request.date
-        shift = staff_request.shift
-        staff_member = staff_request.staff_member
-        like = staff_request.like
-        if like:
-            if staff_member in timeslots.get(date=date, shift=shift).staff.all():
-                successes.append(f"{staff_member} given {shift} on {date}")
-            else:
-                failures.append(f"{staff_member} not given {shift} on {date}")
-        else:
-            if staff_member in timeslots.get(date=date, shift=shift).staff.all():
-                failures.append(f"{staff_member} given {shift} on {date}")
-            else:
-                successes.append(f"{staff_member} not given {shift} on {date}")
-
     return render(
         request,
         "staff_request_status.html",
-        {
-            "successes": successes,
-            "failures": failures,
-        },
+        {"report": get_staff_request_report(start_date)},
+    )
+
+
+def _render_roster_status(request, task_id):
+    """Render the roster status of a roster generation task."""
+    if not task_id:
+        return "<button class='btn btn-warning' id='roster-status'>Roster: Not Started</button>"
+    if AsyncResult(task_id).ready():
+        return render_to_string("roster_ready.html", {"task_id": task_id}, request)
+    return (
+        "<button class='btn btn-warning' id='roster-status'>Roster: Processing</button>"
     )
 
 
 @login_required
 @permission_required("rosters.change_roster")
-def roster_status_indicator(request):
+async def roster_status_indicator(request):
     """Indicate roster status."""
-    if not request.session["task_id"]:
-        return HttpResponse(
-            "<button class='btn btn-warning' id='roster-status'>Roster: Not Started</button>"
-        )
-    task = AsyncResult(request.session["task_id"])
-    if task.ready():
-        return render(
-            request, "roster_ready.html", {"task_id": request.session["task_id"]}
+    task_id = await request.session.aget("task_id")
+    return HttpResponse(await sync_to_async(_render_roster_status)(request, task_id))
+
+
+@login_required
+@permission_required("rosters.change_roster")
+async def roster_status_stream(request):
+    """Stream the roster status as server-sent events whenever it changes."""
+    task_id = await request.session.aget("task_id")
+
+    def render_status():
+        """Render the roster status of the task of the session."""
+        return _render_roster_status(request, task_id)
+
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(
+            iter_status_events(render_status, settings.ROSTER_STATUS_STREAM_TIMEOUT),
+            content_type="text/event-stream",
         )
     else:
-        return HttpResponse(
-            "<button class='btn btn-warning' id='roster-status'>Roster: Processing</button>"
+        # WSGI servers buffer asynchronous streams, so only send the current
+        # status and leave the browser to reconnect after the retry interval
+        response = HttpResponse(
+            [event async for event in iter_status_events(render_status, 0)],
+            content_type="text/event-stream",
         )
+    response["Cache-Control"] = "no-cache"
+    # Stop proxies such as nginx buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
-@login_required
-@permission_required("rosters.change_roster")
-def roster_generation_status(request, task_id):
-    """Display roster generation status."""
+def _roster_generation_status(task_id):
+    """Get the status and status message of a roster generation task."""
     task = AsyncResult(task_id)
     status = "PROCESSING"
     if task.ready():
@@ -1278,7 +1417,9 @@ def roster_generation_status(request, task_id):
             )
         except Exception as error:  # pylint: disable=broad-exception-caught
             status = "FAILED"
-            if "no attribute 'daygroupday_set'" in str(error):
+            if isinstance(error, MissingDayGroup) or (
+                "no attribute 'daygroupday_set'" in str(error)
+            ):
                 status_message = (
                     "Please check that all shifts and "
                     "shift sequences have day groups assigned..."
@@ -1288,8 +1429,81 @@ def roster_generation_status(request, task_id):
     else:
         status = "PROCESSING"
         status_message = "Processing..."
-    return render(
+    return status, status_message
+
+
+@login_required
+@permission_required("rosters.change_roster")
+async def roster_generation_status(request, task_id):
+    """Display roster generation status."""
+    status, status_message = await sync_to_async(_roster_generation_status)(task_id)
+    run = await RosterRun.objects.filter(task_id=task_id).afirst()
+    return await sync_to_async(render)(
         request,
         "roster_generation_status.html",
-        {"status_message": status_message, "status": status},
+        {"status_message": status_message, "status": status, "run": run},
     )
+
+
+def metrics(request):
+    """Expose roster metrics in the Prometheus text format."""
+    if settings.METRICS_TOKEN:
+        authorization = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(authorization, f"Bearer {settings.METRICS_TOKEN}"):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
+
+
+def query_profile(request):
+    """List the views with the most N+1 requests and queries per request."""
+    context = {
+        **admin.site.each_context(request),
+        "title": "Top offending views",
+        "views": get_top_views(
+            iter_profile_records(), settings.ROSTER_QUERY_PROFILE_TOP
+        ),
+        "rate": settings.ROSTER_QUERY_PROFILE_RATE,
+        "repeats": settings.ROSTER_QUERY_PROFILE_REPEATS,
+    }
+    return render(request, "admin/query_profile.html", context)
+
+
+async def _calendar_staff_id(token):
+    """Get the staff member id of a current calendar feed token or raise 404."""
+    try:
+        staff_id, key = get_calendar_staff_key(token)
+    except signing.BadSignature as error:
+        raise Http404("Calendar not found") from error
+    if not await (
+        get_user_model().objects.filter(pk=staff_id, calendar_key=key).aexists()
+    ):
+        raise Http404("Calendar not found")
+    return staff_id
+
+
+async def staff_calendar(request, token):
+    """Serve the iCalendar feed of a staff member's shifts and leave.
+
+    Unchanged feeds are answered from the cache, or with 304 Not Modified,
+    after checking the token is current.
+    """
+    staff_id = await _calendar_staff_id(token)
+    dates = get_calendar_dates()
+    stamp = await aget_stamp(dates)
+    etag = quote_etag(stamp.version)
+    last_modified = int(stamp.last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+
+        def build():
+            """Build the feed of the staff member."""
+            staff_member = get_object_or_404(get_user_model(), pk=staff_id)
+            return build_calendar(staff_member, dates, stamp.last_modified)
+
+        content = await aget_or_build(f"calendar:{staff_id}", dates, build)
+        response = HttpResponse(content, content_type="text/calendar; charset=utf-8")
+    response.headers.setdefault("ETag", etag)
+    response.headers.setdefault("Last-Modified", http_date(last_modified))
+    return response
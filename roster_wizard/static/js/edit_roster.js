@@ -0,0 +1,117 @@
+// Edit the roster one cell at a time through the roster cells API.
+(function () {
+  const table = document.getElementById("edit-roster-grid");
+  const status = document.getElementById("edit-roster-status");
+  const csrfToken = document.querySelector("[name=csrfmiddlewaretoken]").value;
+  const notRostered = "X";
+  let grid = null;
+
+  function showStatus(message, kind) {
+    status.textContent = message;
+    status.className = "alert alert-" + kind;
+  }
+
+  function cellText(row, column) {
+    const cell = grid.cells[row][column];
+    if (cell === null) {
+      return grid.onLeave.has(row + ":" + column) ? "Leave" : notRostered;
+    }
+    const codes = Array.isArray(cell) ? cell : [cell];
+    return codes.map((code) => grid.shift_types[code]).join(", ");
+  }
+
+  function render() {
+    const header = document.createElement("tr");
+    header.appendChild(document.createElement("th")).textContent = "Staff Member";
+    grid.dates.forEach((date) => {
+      header.appendChild(document.createElement("th")).textContent = date;
+    });
+    table.tHead.replaceChildren(header);
+    const rows = grid.staff_names.map((name, row) => {
+      const tr = document.createElement("tr");
+      tr.appendChild(document.createElement("td")).textContent = name;
+      grid.dates.forEach((date, column) => {
+        const td = tr.appendChild(document.createElement("td"));
+        td.textContent = cellText(row, column);
+        td.dataset.row = row;
+        td.dataset.column = column;
+      });
+      return tr;
+    });
+    table.tBodies[0].replaceChildren(...rows);
+  }
+
+  async function load() {
+    const response = await fetch(
+      table.dataset.url + "?date=" + table.dataset.date + "T00:00",
+      { headers: { Accept: "application/json" } },
+    );
+    grid = await response.json();
+    grid.onLeave = new Set(grid.leave.map(([row, column]) => row + ":" + column));
+    render();
+  }
+
+  async function save(td, shift) {
+    const row = Number(td.dataset.row);
+    const column = Number(td.dataset.column);
+    const response = await fetch(table.dataset.url, {
+      method: "PATCH",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "application/json",
+        "X-CSRFToken": csrfToken,
+      },
+      body: JSON.stringify({
+        date: table.dataset.date,
+        cells: [
+          {
+            staff: grid.staff_ids[row],
+            date: grid.dates[column],
+            shift: shift,
+            version: grid.versions[column],
+          },
+        ],
+      }),
+    });
+    const data = await response.json();
+    if (response.status === 409) {
+      showStatus("The roster was changed by someone else and has been reloaded.", "warning");
+      await load();
+      return;
+    }
+    if (!response.ok) {
+      showStatus(JSON.stringify(data), "danger");
+      td.textContent = cellText(row, column);
+      return;
+    }
+    grid.versions[column] = data.versions[grid.dates[column]];
+    grid.cells[row][column] = shift === null ? null : grid.shift_ids.indexOf(shift);
+    td.textContent = cellText(row, column);
+    showStatus("Saved.", "success");
+  }
+
+  table.addEventListener("click", (event) => {
+    const td = event.target.closest("td[data-row]");
+    if (!td || td.querySelector("select")) {
+      return;
+    }
+    const select = document.createElement("select");
+    select.className = "form-control";
+    select.add(new Option(notRostered, ""));
+    grid.shift_ids.forEach((shiftId, code) => {
+      select.add(new Option(grid.shift_types[code], shiftId));
+    });
+    const cell = grid.cells[td.dataset.row][td.dataset.column];
+    select.value = cell === null || Array.isArray(cell) ? "" : grid.shift_ids[cell];
+    select.addEventListener("change", () => {
+      save(td, select.value === "" ? null : Number(select.value));
+    });
+    select.addEventListener("blur", () => {
+      td.textContent = cellText(Number(td.dataset.row), Number(td.dataset.column));
+    });
+    td.replaceChildren(select);
+    select.focus();
+  });
+
+  load();
+})();
@@ -0,0 +1,13 @@
+// Show the roster status pushed by the roster status event stream.
+(function () {
+  const target = document.getElementById("roster-status");
+  if (!target || !window.EventSource) {
+    return;
+  }
+  // The browser reconnects on its own when the server ends the stream
+  const source = new EventSource(target.dataset.url);
+  source.addEventListener("status", function (event) {
+    target.innerHTML = event.data;
+    htmx.process(target);
+  });
+})();
@@ -4,6 +4,7 @@ import datetime
 import pytest
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
 from rosters.models import (
     Shift,
@@ -20,9 +21,35 @@ from rosters.models import (
     TimeSlot,
 )
 from rosters.logic import RosterGenerator
+from rosters.synthetic import SyntheticSpec, create_synthetic_roster
 
 pytestmark = pytest.mark.django_db
 
+# Lines reported by tests, written in the terminal summary
+_reports = []
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Write the lines reported by tests, which output capture would hide."""
+    if _reports:
+        terminalreporter.section("reports")
+        for line in _reports:
+            terminalreporter.write_line(line)
+
+
+@pytest.fixture()
+def report():
+    """Report a line in the terminal summary."""
+    return _reports.append
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Clear the cache so that tests do not share cached rosters."""
+    cache.clear()
+    yield
+    cache.clear()
+
 
 @pytest.fixture()
 def init_db():
@@ -158,13 +185,6 @@ def init_feasible_db(init_db):
         shift=late_shift,
         staff_member=staff_member1,
     )
-    StaffRequest.objects.create(
-        priority=1,
-        like=False,
-        date=datetime.datetime.now() + datetime.timedelta(days=1),
-        shift=late_shift,
-        staff_member=staff_member1,
-    )
     StaffRequest.objects.create(
         priority=10,
         like=False,
@@ -322,3 +342,15 @@ def init_roster_db(init_feasible_db):
     roster = RosterGenerator(start_date=datetime.datetime.now())
     roster.create()
     assert roster.complete
+
+
+@pytest.fixture()
+def init_synthetic_db(db):
+    """Initialise database with a synthetic roster problem of a given size."""
+
+    def create(**kwargs):
+        spec = SyntheticSpec(**kwargs)
+        create_synthetic_roster(spec, datetime.datetime.now())
+        return spec
+
+    return create
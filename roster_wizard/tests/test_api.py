@@ -0,0 +1,766 @@
+"""API Testing."""
+
+import asyncio
+import datetime
+import time
+import pytest
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import Client
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.throttling import UserRateThrottle
+
+from api.views import RosterGridView
+
+from rosters.grid import get_roster_grid
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rosters.models import Leave, RosterRun, Shift, StaffRequest, TimeSlot
+from rosters.tasks import generate_roster
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture()
+def api_client(init_feasible_db):
+    """API client authenticated as a staff user."""
+    user = get_user_model().objects.create_user(
+        password="temporary",
+        email="staff@fred.com",
+        last_name="Staff",
+        first_name="Admin",
+        available=False,
+        is_staff=True,
+    )
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def test_generate_roster_estimate(api_client):
+    """Test generate roster list returns an estimate."""
+    response = api_client.get("/api/v1/generate/", {"date": "2025-01-06T00:00"})
+    assert response.status_code == 200
+    assert response.data["estimate"]["variables"] > 0
+    assert response.data["estimate"]["over_budget"] is False
+
+
+def test_generate_roster_create(api_client, mocker):
+    """Test generate roster create queues the task."""
+    delay_result = mocker.stub(name="delay_result")
+    delay_result.task_id = "12345"
+    mocker.patch.object(generate_roster, "delay", return_value=delay_result)
+    response = api_client.post(
+        "/api/v1/generate/", {"date": datetime.datetime.now().isoformat()}
+    )
+    assert response.status_code == 201
+    assert response.data["task"] == "12345"
+    assert response.data["estimate"]["constraints"] > 0
+
+
+def test_generate_roster_create_over_budget(api_client, settings):
+    """Test generate roster create rejects over budget rosters."""
+    settings.ROSTER_MAX_VARIABLES = 10
+    settings.ROSTER_OVER_BUDGET = "reject"
+    response = api_client.post(
+        "/api/v1/generate/", {"date": datetime.datetime.now().isoformat()}
+    )
+    assert response.status_code == 400
+    assert response.data["estimate"]["over_budget"] is True
+
+
+def test_generate_roster_retrieve(api_client, settings):
+    """Test generate roster retrieve reports a run, waiting while it runs."""
+    settings.ROSTER_STATUS_POLL_INTERVAL = 0.01
+    RosterRun.objects.create(
+        task_id="12345",
+        start_date=datetime.date.today(),
+        status=RosterRun.RUNNING,
+        phase="solve_roster",
+        progress=0.5,
+    )
+    response = api_client.get("/api/v1/generate/12345/", {"wait": 0.05})
+    assert response.status_code == 200
+    assert response.data["status"] == RosterRun.RUNNING
+    assert response.data["progress"] == 0.5
+    assert response.data["phase"] == "solve_roster"
+    RosterRun.objects.filter(task_id="12345").update(
+        status=RosterRun.SUCCEEDED, objective=10, best_bound=9
+    )
+    response = api_client.get("/api/v1/generate/12345/")
+    assert response.data["status"] == RosterRun.SUCCEEDED
+    assert response.data["gap"] == 0.1
+    assert api_client.get("/api/v1/generate/other/").status_code == 404
+    response = api_client.get("/api/v1/generate/12345/", {"wait": -1})
+    assert response.status_code == 400
+    assert api_client.put("/api/v1/generate/12345/", {}).status_code == 405
+    assert api_client.patch("/api/v1/generate/12345/", {}).status_code == 405
+
+
+def test_generate_roster_retrieve_waits(api_client, async_client, settings):
+    """Test generate roster retrieve returns once the run finishes under ASGI."""
+    settings.ROSTER_STATUS_POLL_INTERVAL = 0.01
+    run = RosterRun.objects.create(
+        task_id="12345", start_date=datetime.date.today(), status=RosterRun.RUNNING
+    )
+    user = get_user_model().objects.get(email="staff@fred.com")
+    async_to_sync(async_client.aforce_login)(user)
+
+    async def finish():
+        await asyncio.sleep(0.05)
+        run.status = RosterRun.SUCCEEDED
+        await run.asave()
+
+    async def wait():
+        response, _ = await asyncio.gather(
+            async_client.get("/api/v1/generate/12345/", {"wait": 5}), finish()
+        )
+        return response
+
+    start = time.monotonic()
+    response = async_to_sync(wait)()
+    assert time.monotonic() - start < 5
+    assert response.status_code == 200
+    assert response.json()["status"] == RosterRun.SUCCEEDED
+
+
+def test_generate_roster_destroy(api_client):
+    """Test generate roster destroy cancels a run that has not finished."""
+    RosterRun.objects.create(task_id="12345", start_date=datetime.date.today())
+    response = api_client.delete("/api/v1/generate/12345/")
+    assert response.status_code == 202
+    assert response.data["status"] == RosterRun.CANCELLED
+    assert RosterRun.objects.get(task_id="12345").finished is not None
+    response = api_client.delete("/api/v1/generate/12345/")
+    assert response.status_code == 409
+    assert api_client.delete("/api/v1/generate/other/").status_code == 404
+
+
+def test_generate_roster_runs(api_client):
+    """Test generate roster runs lists recent runs, newest first."""
+    for task_id, run_status in (
+        ("1", RosterRun.FAILED),
+        ("2", RosterRun.SUCCEEDED),
+        ("3", RosterRun.SUCCEEDED),
+    ):
+        RosterRun.objects.create(
+            task_id=task_id, start_date=datetime.date.today(), status=run_status
+        )
+    response = api_client.get("/api/v1/generate/runs/")
+    assert [run["task_id"] for run in response.data["results"]] == ["3", "2", "1"]
+    assert "phases" not in response.data["results"][0]
+    response = api_client.get(
+        "/api/v1/generate/runs/", {"status": RosterRun.SUCCEEDED, "limit": 1}
+    )
+    assert [run["task_id"] for run in response.data["results"]] == ["3"]
+    response = api_client.get("/api/v1/generate/runs/", {"status": "UNKNOWN"})
+    assert response.status_code == 400
+
+
+def test_roster(api_client):
+    """Test roster by staff is returned as a grid."""
+    response = api_client.get("/api/v1/roster/")
+    assert response.status_code == 200
+    assert len(response.data["dates"]) == 14
+    staff = {worker["name"]: worker for worker in response.data["staff"]}
+    assert staff["Six, Six"]["shifts"][0] == "Leave"
+    assert len(staff["One, One"]["shifts"]) == 14
+
+
+def test_roster_compact(api_client, django_assert_num_queries):
+    """Test the compact roster is small and answered with 304 while unchanged."""
+    response = api_client.get("/api/v1/roster/compact/")
+    assert response.status_code == 200
+    assert len(response.content) < 4096
+    staff = dict(zip(response.data["staff_ids"], response.data["leave"]))
+    six = get_user_model().objects.get(last_name="Six")
+    assert staff[six.id][0] == "1"
+    assert len(response.data["cells"][0]) == len(response.data["dates"]) == 14
+    etag = response["ETag"]
+    with django_assert_num_queries(0):
+        response = api_client.get("/api/v1/roster/compact/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    Leave.objects.create(
+        date=datetime.date.today(), description="Training", staff_member=six
+    )
+    response = api_client.get("/api/v1/roster/compact/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+
+def test_roster_grid(api_client):
+    """Test the async roster grid matches the roster list."""
+    user = get_user_model().objects.get(email="staff@fred.com")
+    expected = api_client.get("/api/v1/roster/", {"date": "2025-01-06T00:00"}).data
+    client = Client()
+    client.force_login(user)
+    response = client.get("/api/v1/roster/grid/", {"date": "2025-01-06T00:00"})
+    assert response.status_code == 200
+    assert response.json() == expected
+    token = Token.objects.create(user=user)
+    response = Client().get(
+        "/api/v1/roster/grid/",
+        {"date": "2025-01-06T00:00"},
+        headers={"authorization": f"Token {token.key}"},
+    )
+    assert response.status_code == 200
+    assert response.json() == expected
+
+
+def test_roster_grid_invalid(api_client):
+    """Test the async roster grid rejects anonymous requests and bad dates."""
+    response = Client().get("/api/v1/roster/grid/")
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Token"
+    response = Client().get(
+        "/api/v1/roster/grid/", headers={"authorization": "Token invalid"}
+    )
+    assert response.status_code == 401
+    client = Client()
+    client.force_login(get_user_model().objects.get(email="staff@fred.com"))
+    response = client.get("/api/v1/roster/grid/", {"date": "invalid"})
+    assert response.status_code == 400
+    assert "date" in response.json()
+
+
+def test_roster_grid_throttled(api_client, async_client, mocker):
+    """Test the async roster grid applies the API throttles under ASGI."""
+
+    class OncePerMinute(UserRateThrottle):
+        """Allow one request a minute."""
+
+        rate = "1/min"
+
+    mocker.patch.object(RosterGridView, "throttle_classes", [OncePerMinute])
+    user = get_user_model().objects.get(email="staff@fred.com")
+    async_to_sync(async_client.aforce_login)(user)
+    response = async_to_sync(async_client.get)("/api/v1/roster/grid/")
+    assert response.status_code == 200
+    response = async_to_sync(async_client.get)("/api/v1/roster/grid/")
+    assert response.status_code == 429
+
+
+def test_roster_export(api_client):
+    """Test roster export streams one row per staff member per date."""
+    start_date = datetime.date.today()
+    end_date = start_date + datetime.timedelta(days=20)
+    response = api_client.get(
+        "/api/v1/roster/export/",
+        {"start_date": start_date.isoformat(), "end_date": end_date.isoformat()},
+    )
+    assert response.status_code == 200
+    assert response.streaming
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert lines[0] == "Date,Staff Member,Roles,Shifts,Shift"
+    assert len(lines) == 1 + 21 * get_user_model().objects.count()
+    assert any(
+        line.startswith(f'{start_date.isoformat()},"Six, Six",')
+        and line.endswith(",Leave")
+        for line in lines
+    )
+
+
+def test_roster_export_invalid_range(api_client):
+    """Test roster export rejects an end date before the start date."""
+    response = api_client.get(
+        "/api/v1/roster/export/",
+        {"start_date": "2025-01-10", "end_date": "2025-01-01"},
+    )
+    assert response.status_code == 400
+
+
+def test_leave_list_conditional(api_client, django_assert_num_queries):
+    """Test leave list answers unchanged polls with 304 without queries."""
+    response = api_client.get("/api/v1/leave/")
+    assert response.status_code == 200
+    etag = response["ETag"]
+    with django_assert_num_queries(0):
+        response = api_client.get("/api/v1/leave/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    response = api_client.get(
+        "/api/v1/leave/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+    )
+    assert response.status_code == 304
+    Leave.objects.create(
+        date=datetime.date.today(),
+        description="Training",
+        staff_member=get_user_model().objects.get(last_name="Joey"),
+    )
+    response = api_client.get("/api/v1/leave/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def test_leave_list_conditional_query(api_client):
+    """Test another page or filter of an unchanged list is not answered with 304."""
+    response = api_client.get("/api/v1/leave/", {"page_size": 1})
+    etag = response["ETag"]
+    assert (
+        api_client.get(
+            "/api/v1/leave/", {"page_size": 1}, HTTP_IF_NONE_MATCH=etag
+        ).status_code
+        == 304
+    )
+    cursor = response.data["next"].split("cursor=")[1].split("&")[0]
+    for params in (
+        {"page_size": 1, "cursor": cursor},
+        {"page_size": 2},
+        {"page_size": 1, "fields": "date"},
+    ):
+        response = api_client.get("/api/v1/leave/", params, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+
+def test_timeslot_list_conditional(api_client):
+    """Test timeslot list is resent after staff are assigned."""
+    etag = api_client.get("/api/v1/timeslots/")["ETag"]
+    response = api_client.get("/api/v1/timeslots/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    timeslot = TimeSlot.objects.create(
+        date=datetime.date.today(), shift=Shift.objects.first()
+    )
+    etag = api_client.get("/api/v1/timeslots/")["ETag"]
+    timeslot.staff.add(get_user_model().objects.get(last_name="Joey"))
+    response = api_client.get("/api/v1/timeslots/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+
+def _create_timeslots(days):
+    """Create a timeslot of every shift staffed by everyone for days from today."""
+    staff = list(get_user_model().objects.all())
+    timeslots = TimeSlot.objects.bulk_create(
+        TimeSlot(date=datetime.date.today() + datetime.timedelta(days=day), shift=shift)
+        for day in range(days)
+        for shift in Shift.objects.all()
+    )
+    TimeSlot.staff.through.objects.bulk_create(
+        TimeSlot.staff.through(timeslot_id=timeslot.id, customuser_id=staff_member.id)
+        for timeslot in timeslots
+        for staff_member in staff
+    )
+    return timeslots
+
+
+@pytest.mark.parametrize("page_size", [5, 50])
+def test_timeslot_list_queries(api_client, django_assert_num_queries, page_size):
+    """Test listing timeslots costs the same queries whatever the page size."""
+    _create_timeslots(days=30)
+    with django_assert_num_queries(2):
+        response = api_client.get(
+            "/api/v1/timeslots/",
+            {"date_from": datetime.date.today().isoformat(), "page_size": page_size},
+        )
+    assert response.status_code == 200
+    assert len(response.data["results"]) == page_size
+    assert len(response.data["results"][0]["staff"]) == (
+        get_user_model().objects.count()
+    )
+
+
+def test_timeslot_list_pages(api_client):
+    """Test following next links lists every timeslot once in date order."""
+    _create_timeslots(days=5)
+    ids = []
+    url = "/api/v1/timeslots/?page_size=4"
+    while url:
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert len(response.data["results"]) <= 4
+        ids.extend(timeslot["id"] for timeslot in response.data["results"])
+        url = response.data["next"]
+    assert ids == list(
+        TimeSlot.objects.order_by("date", "id").values_list("id", flat=True)
+    )
+    response = api_client.get("/api/v1/timeslots/", {"cursor": "invalid"})
+    assert response.status_code == 404
+
+
+def test_timeslot_list_filters(api_client, django_assert_num_queries):
+    """Test timeslots are filtered by date and staff with sparse fields."""
+    _create_timeslots(days=5)
+    date_from = datetime.date.today() + datetime.timedelta(days=1)
+    date_to = date_from + datetime.timedelta(days=2)
+    staff_member = get_user_model().objects.get(last_name="Joey")
+    TimeSlot.staff.through.objects.filter(
+        timeslot__date=date_from, customuser=staff_member
+    ).delete()
+    with django_assert_num_queries(1):
+        response = api_client.get(
+            "/api/v1/timeslots/",
+            {
+                "date_from": date_from.isoformat(),
+                "date_to": date_to.isoformat(),
+                "staff": staff_member.id,
+                "fields": "id,date",
+            },
+        )
+    assert response.status_code == 200
+    assert {timeslot["date"] for timeslot in response.data["results"]} == {
+        (date_from + datetime.timedelta(days=day)).isoformat() for day in (1, 2)
+    }
+    assert set(response.data["results"][0]) == {"id", "date"}
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"fields": "id,password"},
+        {"date_from": "2025-01-10", "date_to": "2025-01-01"},
+        {"staff": "none"},
+    ],
+)
+def test_timeslot_list_invalid_filters(api_client, params):
+    """Test invalid list filters are rejected."""
+    response = api_client.get("/api/v1/timeslots/", params)
+    assert response.status_code == 400
+
+
+def test_leave_list_filters(api_client, django_assert_num_queries):
+    """Test leave is filtered by staff member in one query."""
+    staff_member = get_user_model().objects.get(last_name="Six")
+    with django_assert_num_queries(1):
+        response = api_client.get(
+            "/api/v1/leave/", {"staff": staff_member.id, "page_size": 1}
+        )
+    assert response.status_code == 200
+    assert [leave["staff_member"] for leave in response.data["results"]] == [
+        staff_member.id
+    ]
+    assert response.data["next"] is not None
+
+
+@pytest.fixture()
+def editor_client(init_roster_db):
+    """API client authenticated as a user who can change rosters."""
+    client = APIClient()
+    client.force_authenticate(
+        user=get_user_model().objects.get(email="temporary@fred.com")
+    )
+    return client
+
+
+def test_roster_cells(editor_client):
+    """Test roster cells returns the period's assignments as shift codes."""
+    response = editor_client.get("/api/v1/roster/cells/")
+    assert response.status_code == 200
+    data = response.data
+    dates = [datetime.date.fromisoformat(date) for date in data["dates"]]
+    assert len(dates) == len(data["versions"]) == 14
+    assert len(data["cells"]) == len(data["staff_ids"])
+    for timeslot in TimeSlot.objects.filter(date__range=[dates[0], dates[-1]]):
+        column = dates.index(timeslot.date)
+        code = data["shift_ids"].index(timeslot.shift_id)
+        for staff_member in timeslot.staff.all():
+            cell = data["cells"][data["staff_ids"].index(staff_member.id)][column]
+            assert cell == code or code in cell
+    six = data["staff_ids"].index(get_user_model().objects.get(last_name="Six").id)
+    assert [six, 0] in data["leave"]
+
+
+def test_roster_cells_patch(editor_client):
+    """Test patching a cell replaces the staff member's shift that day."""
+    data = editor_client.get("/api/v1/roster/cells/").data
+    staff_member = get_user_model().objects.get(last_name="Joey")
+    date = data["dates"][2]
+    late = Shift.objects.get(shift_type="Late")
+    response = editor_client.patch(
+        "/api/v1/roster/cells/",
+        {
+            "date": data["dates"][0],
+            "cells": [
+                {
+                    "staff": staff_member.id,
+                    "date": date,
+                    "shift": late.id,
+                    "version": data["versions"][2],
+                }
+            ],
+        },
+        format="json",
+    )
+    assert response.status_code == 200
+    assert list(response.data["versions"]) == [date]
+    assert response.data["versions"][date] != data["versions"][2]
+    assert list(
+        staff_member.timeslot_set.filter(date=date).values_list("shift", flat=True)
+    ) == [late.id]
+    grid = get_roster_grid(datetime.date.fromisoformat(data["dates"][0]))
+    cells = dict(zip([worker.id for worker in grid.workers], grid.cells))
+    assert cells[staff_member.id][2] == "Late"
+
+    response = editor_client.patch(
+        "/api/v1/roster/cells/",
+        {
+            "date": data["dates"][0],
+            "cells": [
+                {
+                    "staff": staff_member.id,
+                    "date": date,
+                    "shift": None,
+                    "version": response.data["versions"][date],
+                }
+            ],
+        },
+        format="json",
+    )
+    assert response.status_code == 200
+    assert not staff_member.timeslot_set.filter(date=date).exists()
+
+
+def test_roster_cells_patch_conflict(editor_client):
+    """Test patching a changed date is rejected with its current version."""
+    data = editor_client.get("/api/v1/roster/cells/").data
+    staff_member = get_user_model().objects.get(last_name="Joey")
+    Leave.objects.create(
+        date=data["dates"][2], description="Leave", staff_member=staff_member
+    )
+    response = editor_client.patch(
+        "/api/v1/roster/cells/",
+        {
+            "date": data["dates"][0],
+            "cells": [
+                {
+                    "staff": staff_member.id,
+                    "date": data["dates"][2],
+                    "shift": data["shift_ids"][0],
+                    "version": data["versions"][2],
+                }
+            ],
+        },
+        format="json",
+    )
+    assert response.status_code == 409
+    current = editor_client.get("/api/v1/roster/cells/").data["versions"][2]
+    assert response.data["versions"] == {data["dates"][2]: current}
+    assert not staff_member.timeslot_set.filter(date=data["dates"][2]).exists()
+
+
+def test_roster_cells_patch_other_dates(editor_client):
+    """Test edits of different dates by two editors do not conflict."""
+    data = editor_client.get("/api/v1/roster/cells/").data
+    staff_member = get_user_model().objects.get(last_name="Joey")
+    for column in (2, 3):
+        response = editor_client.patch(
+            "/api/v1/roster/cells/",
+            {
+                "date": data["dates"][0],
+                "cells": [
+                    {
+                        "staff": staff_member.id,
+                        "date": data["dates"][column],
+                        "shift": data["shift_ids"][0],
+                        "version": data["versions"][column],
+                    }
+                ],
+            },
+            format="json",
+        )
+        assert response.status_code == 200
+
+
+def test_roster_cells_version_from_database(editor_client):
+    """Test edits conflict with changes the cache was never told about."""
+    data = editor_client.get("/api/v1/roster/cells/").data
+    dates = data["dates"]
+    staff_member = get_user_model().objects.get(last_name="Joey")
+    # Bulk deletes send no signals, so no cache version changes
+    TimeSlot.staff.through.objects.filter(timeslot__date=dates[2]).delete()
+    response = editor_client.patch(
+        "/api/v1/roster/cells/",
+        {
+            "date": dates[0],
+            "cells": [
+                {
+                    "staff": staff_member.id,
+                    "date": dates[2],
+                    "shift": None,
+                    "version": data["versions"][2],
+                }
+            ],
+        },
+        format="json",
+    )
+    assert response.status_code == 409
+
+
+def test_roster_cells_get_does_not_write(editor_client):
+    """Test reading the cells of a period without timeslots creates none."""
+    TimeSlot.objects.all().delete()
+    with CaptureQueriesContext(connection) as queries:
+        response = editor_client.get("/api/v1/roster/cells/")
+    assert response.status_code == 200
+    assert not TimeSlot.objects.exists()
+    assert not any(
+        query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        for query in queries.captured_queries
+    )
+
+
+def test_roster_cells_patch_invalid(editor_client):
+    """Test cells outside the period or with unknown shifts are rejected."""
+    data = editor_client.get("/api/v1/roster/cells/").data
+    staff_member = get_user_model().objects.get(last_name="Joey")
+    outside = datetime.date.fromisoformat(data["dates"][-1]) + datetime.timedelta(
+        days=1
+    )
+    response = editor_client.patch(
+        "/api/v1/roster/cells/",
+        {
+            "date": data["dates"][0],
+            "cells": [
+                {
+                    "staff": staff_member.id,
+                    "date": outside,
+                    "shift": None,
+                    "version": data["versions"][0],
+                },
+                {
+                    "staff": staff_member.id,
+                    "date": data["dates"][1],
+                    "shift": 0,
+                    "version": data["versions"][1],
+                },
+            ],
+        },
+        format="json",
+    )
+    assert response.status_code == 400
+    assert set(response.data["cells"]) == {0, 1}
+
+
+def test_roster_cells_forbidden(api_client):
+    """Test users who cannot change rosters cannot edit cells."""
+    response = api_client.get("/api/v1/roster/cells/")
+    assert response.status_code == 403
+
+
+def test_leave_bulk(api_client):
+    """Test bulk leave is created, updated or rejected per item."""
+    two = get_user_model().objects.get(last_name="Two")
+    today = datetime.date.today()
+    tomorrow = today + datetime.timedelta(days=1)
+    response = api_client.post(
+        "/api/v1/leave/bulk/",
+        [
+            {"staff_member": two.id, "date": tomorrow.isoformat()},
+            {"staff_member": two.id, "date": today.isoformat(), "description": "Sick"},
+            {"staff_member": 0, "date": today.isoformat()},
+            {"staff_member": two.id, "date": "invalid"},
+            {"staff_member": two.id, "date": tomorrow.isoformat()},
+        ],
+        format="json",
+    )
+    assert response.status_code == 200
+    assert [result["status"] for result in response.data["results"]] == [
+        "created",
+        "updated",
+        "invalid",
+        "invalid",
+        "invalid",
+    ]
+    assert response.data["counts"] == {"created": 1, "updated": 1, "invalid": 3}
+    assert "staff_member" in response.data["results"][2]["errors"]
+    assert "date" in response.data["results"][3]["errors"]
+    assert Leave.objects.get(id=response.data["results"][0]["id"]).date == tomorrow
+    assert Leave.objects.get(staff_member=two, date=today).description == "Sick"
+
+
+def test_leave_bulk_ndjson(api_client):
+    """Test bulk leave is read from NDJSON and unchanged leave is left alone."""
+    two = get_user_model().objects.get(last_name="Two")
+    body = (
+        f'{{"staff_member": {two.id}, "date": "{datetime.date.today()}"}}\n\n'
+        f'{{"staff_member": {two.id}, "date": "2025-01-01"}}\n'
+    )
+    response = api_client.post(
+        "/api/v1/leave/bulk/", body, content_type="application/x-ndjson"
+    )
+    assert response.status_code == 200
+    assert response.data["counts"] == {"unchanged": 1, "created": 1}
+    response = api_client.post(
+        "/api/v1/leave/bulk/", "{}\n{", content_type="application/x-ndjson"
+    )
+    assert response.status_code == 400
+    response = api_client.post("/api/v1/leave/bulk/", {}, format="json")
+    assert response.status_code == 400
+
+
+def test_staff_request_bulk(api_client, settings):
+    """Test bulk staff requests are upserted in chunks with constant queries."""
+    settings.ROSTER_BULK_CHUNK_SIZE = 1000
+    one = get_user_model().objects.get(last_name="One")
+    shifts = list(Shift.objects.all())
+
+    def items(days, priority):
+        return [
+            {
+                "staff_member": one.id,
+                "date": (
+                    datetime.date.today() + datetime.timedelta(days=100 + day)
+                ).isoformat(),
+                "shift": shift.id,
+                "like": False,
+                "priority": priority,
+            }
+            for day in range(days)
+            for shift in shifts
+        ]
+
+    with CaptureQueriesContext(connection) as few:
+        response = api_client.post(
+            "/api/v1/staffrequests/bulk/", items(2, 3), format="json"
+        )
+    assert response.data["counts"] == {"created": 2 * len(shifts)}
+    with CaptureQueriesContext(connection) as many:
+        response = api_client.post(
+            "/api/v1/staffrequests/bulk/", items(20, 4), format="json"
+        )
+    assert len(many) == len(few)
+    assert response.data["counts"]["updated"] == 2 * len(shifts)
+    assert StaffRequest.objects.filter(staff_member=one, priority=4).count() == (
+        20 * len(shifts)
+    )
+    settings.ROSTER_BULK_CHUNK_SIZE = 7
+    response = api_client.post(
+        "/api/v1/staffrequests/bulk/", items(20, 4), format="json"
+    )
+    assert response.data["counts"] == {"unchanged": 20 * len(shifts)}
+    response = api_client.get("/api/v1/staffrequests/", {"staff": one.id})
+    assert (
+        len(response.data["results"])
+        == StaffRequest.objects.filter(staff_member=one).count()
+    )
+
+
+def test_roster_assignments(editor_client):
+    """Test bulk assignments add staff to timeslots and refresh the grid."""
+    staff_member = get_user_model().objects.get(last_name="Joey")
+    date = datetime.date.today() + datetime.timedelta(days=400)
+    shift = Shift.objects.first()
+    grid = editor_client.get("/api/v1/roster/", {"date": f"{date}T00:00"}).data
+    item = {"staff": staff_member.id, "date": date.isoformat(), "shift": shift.id}
+    response = editor_client.post("/api/v1/roster/assignments/", [item], format="json")
+    assert response.status_code == 200
+    assert response.data["counts"] == {"created": 1}
+    timeslot = TimeSlot.objects.get(id=response.data["results"][0]["id"])
+    assert (timeslot.date, timeslot.shift) == (date, shift)
+    assert list(timeslot.staff.all()) == [staff_member]
+    assert editor_client.get("/api/v1/roster/", {"date": f"{date}T00:00"}).data != grid
+    response = editor_client.post(
+        "/api/v1/roster/assignments/",
+        [item, {**item, "shift": 0}],
+        format="json",
+    )
+    assert [result["status"] for result in response.data["results"]] == [
+        "unchanged",
+        "invalid",
+    ]
+
+
+def test_roster_assignments_forbidden(api_client):
+    """Test users who cannot change rosters cannot assign staff."""
+    response = api_client.post("/api/v1/roster/assignments/", [], format="json")
+    assert response.status_code == 403
@@ -0,0 +1,137 @@
+"""Roster generation benchmarks.
+
+Deselected by default, run with:
+
+    pytest -m benchmark
+
+Each size is compared against tests/benchmarks.json and fails if a metric
+regresses by more than its threshold, or if the solution is worse. Timings depend on the machine, so
+refresh the baselines with ROSTER_BENCHMARK_UPDATE=1 when changing machines.
+Set ROSTER_BENCHMARK_OUTPUT to a path to also write the results there.
+"""
+
+import datetime
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from rosters.logic import RosterGenerator
+
+pytestmark = [pytest.mark.django_db, pytest.mark.benchmark]
+
+BASELINES = Path(__file__).resolve().parent / "benchmarks.json"
+
+SIZES = {
+    "small": {"staff": 20, "days": 14},
+    "medium": {"staff": 60, "days": 28},
+    "large": {"staff": 120, "days": 28},
+}
+
+# Solver time limit, well above the slowest size so every size solves to
+# optimality and the timings measure the search rather than the limit
+MAX_TIME = 300
+
+# Allowed increase over the baseline before a metric counts as a regression
+THRESHOLDS = {
+    "build_time": 0.5,
+    "solve_time": 1.0,
+    "queries": 0.1,
+    "variables": 0.1,
+    "constraints": 0.1,
+    "peak_memory": 0.25,
+    "gap": 0,
+}
+
+# Absolute slack so that jitter in very short timings is not a regression
+TOLERANCES = {
+    "build_time": 0.05,
+    "solve_time": 0.5,
+    "gap": 0.001,
+}
+
+GENERATOR_PHASES = (
+    "clear_existing_timeslots",
+    "create_timeslots",
+    "create_snapshot",
+    "solve_roster",
+    "populate_roster",
+)
+
+results = {}
+
+
+def _load_baselines():
+    """Load stored baselines."""
+    if not BASELINES.exists():
+        return {}
+    return json.loads(BASELINES.read_text(encoding="utf-8"))
+
+
+def _measure(roster):
+    """Collect benchmark metrics from a completed roster generation."""
+    phases = roster.profiler.phases
+    return {
+        "build_time": sum(
+            phase.wall_time for phase in phases if phase.variables is not None
+        ),
+        "solve_time": roster.result.solve_time,
+        "queries": sum(
+            phase.queries for phase in phases if phase.name in GENERATOR_PHASES
+        ),
+        "variables": roster.result.variables,
+        "constraints": roster.result.constraints,
+        "peak_memory": roster.result.peak_memory,
+        "objective": roster.result.objective,
+        "gap": abs(roster.result.best_bound - roster.result.objective)
+        / max(1, abs(roster.result.objective)),
+    }
+
+
+@pytest.fixture(scope="module", autouse=True)
+def store_results():
+    """Write results once all sizes have run."""
+    yield
+    if not results:
+        return
+    content = json.dumps(results, indent=2, sort_keys=True) + "\n"
+    if os.environ.get("ROSTER_BENCHMARK_UPDATE"):
+        baselines = _load_baselines()
+        baselines.update(results)
+        BASELINES.write_text(
+            json.dumps(baselines, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+        )
+    if os.environ.get("ROSTER_BENCHMARK_OUTPUT"):
+        Path(os.environ["ROSTER_BENCHMARK_OUTPUT"]).write_text(
+            content, encoding="utf-8"
+        )
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_roster_generation_benchmark(size, init_synthetic_db, settings, report):
+    """Benchmark roster generation against the stored baseline."""
+    settings.ROSTER_SOLVER_MAX_TIME = MAX_TIME
+    init_synthetic_db(**SIZES[size])
+    roster = RosterGenerator(start_date=datetime.datetime.now(), isolated=True)
+    roster.create()
+    assert roster.result.status == "OPTIMAL", f"{size} {roster.result.status}"
+    measured = _measure(roster)
+    results[size] = measured
+    report(f"{size}: {json.dumps(measured, sort_keys=True)}")
+
+    baseline = _load_baselines().get(size)
+    if baseline is None or os.environ.get("ROSTER_BENCHMARK_UPDATE"):
+        pytest.skip(f"No baseline compared for {size}")
+    regressions = [
+        f"{metric} {measured[metric]:.6g} > {baseline[metric]:.6g} (+{threshold:.0%})"
+        for metric, threshold in THRESHOLDS.items()
+        if measured[metric]
+        > baseline[metric] * (1 + threshold) + TOLERANCES.get(metric, 0)
+    ]
+    # The objective is maximised, so any drop is a worse roster
+    if measured["objective"] < baseline["objective"]:
+        regressions.append(
+            f"objective {measured['objective']:.6g} < {baseline['objective']:.6g}"
+        )
+    assert not regressions, f"{size} regressed: {', '.join(regressions)}"
@@ -0,0 +1,85 @@
+"""Staff request submission load test.
+
+Deselected by default, run with:
+
+    pytest -m benchmark tests/test_load.py
+
+Simulates SUBMITTERS staff members saving their requests at the same time,
+as happens when the request window closes, and fails if the 95th percentile
+save latency exceeds MAX_P95_LATENCY seconds. Latency depends heavily on the
+database and it is skipped on SQLite, whose in-memory test database fails
+concurrent writers rather than queueing them. Point DATABASE_URL at
+PostgreSQL to run it.
+"""
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from rosters.models import StaffRequest
+
+pytestmark = [
+    pytest.mark.django_db(transaction=True),
+    pytest.mark.benchmark,
+    pytest.mark.skipif(
+        connection.vendor == "sqlite", reason="SQLite fails concurrent writers"
+    ),
+]
+
+SUBMITTERS = 50
+
+MAX_P95_LATENCY = 2.0
+
+
+def _prepare(staff_member):
+    """Log a staff member in and build POST data liking every other cell."""
+    client = Client()
+    client.force_login(staff_member)
+    url = reverse("staffrequest_update", args=(staff_member.id,))
+    form = client.get(url).context["form"]
+    data = {}
+    for name in form.fields:
+        kind, number = name.split("_")
+        if kind == "request":
+            data[name] = "Yes" if int(number) % 2 else "No"
+        else:
+            data[name] = 5
+    return client, url, data
+
+
+def _submit(client, url, data):
+    """Submit the staff request form, returning the status and latency."""
+    try:
+        start = time.perf_counter()
+        response = client.post(url, data)
+        return response.status_code, time.perf_counter() - start
+    finally:
+        connections.close_all()
+
+
+def test_staff_request_submission_load(init_synthetic_db, report):
+    """Test concurrent staff request submissions stay within the latency budget."""
+    init_synthetic_db(staff=SUBMITTERS, days=28, request_density=0.2)
+    submissions = [
+        _prepare(staff_member) for staff_member in get_user_model().objects.all()
+    ]
+    with ThreadPoolExecutor(max_workers=len(submissions)) as executor:
+        results = list(executor.map(_submit, *zip(*submissions)))
+
+    statuses = [status for status, _ in results]
+    latencies = sorted(latency for _, latency in results)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    report(
+        f"{len(submissions)} submitters: "
+        f"median {statistics.median(latencies):.3f}s, p95 {p95:.3f}s, "
+        f"max {latencies[-1]:.3f}s"
+    )
+    assert statuses == [302] * len(submissions)
+    assert StaffRequest.objects.filter(like=True).exists()
+    assert p95 < MAX_P95_LATENCY
@@ -1,13 +1,56 @@
 """Business logic testing."""
 
 import datetime
+import os
+import subprocess
+import sys
 import pytest
 
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+from rosters import cache as roster_cache
+
+from rosters.checks import check_shared_cache
+from rosters.editing import create_missing_timeslots
+from rosters.estimator import estimate_roster
+from rosters.export import aiter_roster_csv, iter_roster_csv, iter_roster_rows
+from rosters.grid import (
+    NOT_ROSTERED,
+    aget_roster_grid,
+    build_roster_grid,
+    get_compact_grid,
+    get_roster_grid,
+)
 from rosters.logic import (
+    MissingDayGroup,
+    RosterGenerationCancelled,
     RosterGenerator,
+    RosterOverBudget,
     SolutionNotFeasible,
+    SolverProcessFailed,
+)
+from rosters.models import (
+    Day,
+    DayGroup,
+    DayGroupDay,
+    Leave,
+    RosterRun,
+    RosterSettings,
+    Shift,
+    StaffRequest,
+    TimeSlot,
+)
+from rosters.period import build_day_shifts, get_day_shifts, get_period_calendar
+from rosters.reference import (
+    aget_reference_data,
+    build_reference_data,
+    get_reference_data,
 )
-from rosters.tasks import generate_roster
+from rosters.reports import build_staff_request_report, get_staff_request_report
+from rosters.snapshot import pack_assignments, unpack_assignments
+from rosters.tasks import generate_roster, queue_generate_roster
 
 pytestmark = pytest.mark.django_db
 
@@ -55,3 +98,578 @@ def test_celery_infeasible_roster_generation_sync(init_infeasible_db):
     )
     with pytest.raises(SolutionNotFeasible):
         task.get()
+
+
+def test_isolated_feasible_roster_generation(init_feasible_db):
+    """Test feasible roster generation in a child process."""
+    roster = RosterGenerator(start_date=datetime.datetime.now(), isolated=True)
+    roster.create()
+    assert roster.complete
+    assert roster.peak_memory > 0
+    assert roster.resident_memory > 0
+    assert TimeSlot.objects.filter(staff__isnull=False).exists()
+
+
+def test_isolated_infeasible_roster_generation(init_infeasible_db):
+    """Test infeasible roster generation in a child process."""
+    roster = RosterGenerator(start_date=datetime.datetime.now(), isolated=True)
+    with pytest.raises(SolutionNotFeasible):
+        roster.create()
+
+
+def test_isolated_roster_generation_memory_limit(init_feasible_db, settings):
+    """Test isolated roster generation fails when the memory cap is too low."""
+    settings.ROSTER_SOLVER_MEMORY_BASE = 1024 * 1024 * 16
+    settings.ROSTER_SOLVER_MEMORY_PER_VARIABLE = 0
+    roster = RosterGenerator(start_date=datetime.datetime.now(), isolated=True)
+    with pytest.raises(SolverProcessFailed):
+        roster.create()
+
+
+def test_celery_roster_generation_records_run(init_feasible_db):
+    """Test roster generation task records the run."""
+    task = generate_roster.apply(
+        kwargs={"start_date": datetime.datetime.now().isoformat()}
+    )
+    task.get()
+    run = RosterRun.objects.get(task_id=task.task_id)
+    assert run.status == RosterRun.SUCCEEDED
+    # Only recorded for isolated solves
+    assert run.peak_memory is None
+    assert run.resident_memory > 0
+    assert run.finished is not None
+    assert "solve_roster" in [phase["name"] for phase in run.phases]
+    assert run.solver_status in ("OPTIMAL", "FEASIBLE")
+    assert run.presolve_time is not None
+    assert run.conflicts is not None
+    assert run.gap is not None
+
+
+def test_celery_infeasible_roster_generation_records_run(init_infeasible_db):
+    """Test failed roster generation task records the run."""
+    task = generate_roster.apply(
+        kwargs={"start_date": datetime.datetime.now().isoformat()}
+    )
+    with pytest.raises(SolutionNotFeasible):
+        task.get()
+    run = RosterRun.objects.get(task_id=task.task_id)
+    assert run.status == RosterRun.FAILED
+    assert "SolutionNotFeasible" in run.message
+
+
+def test_pack_assignments():
+    """Test assignments survive packing into a compact array."""
+    assignments = [(1, 10), (2, 10), (3, 11)]
+    assert unpack_assignments(pack_assignments(assignments)) == assignments
+
+
+def test_web_does_not_import_ortools(settings):
+    """Test the web application loads without importing OR-Tools."""
+    code = (
+        "import sys, django; django.setup(); "
+        "from roster_project.asgi import application; "
+        "import roster_project.urls, rosters.views, api.views; "
+        "sys.exit('ortools' in sys.modules)"
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        cwd=settings.BASE_DIR,
+        env=dict(os.environ, DJANGO_SETTINGS_MODULE="roster_project.settings"),
+        check=False,
+    )
+    assert process.returncode == 0, process.stderr.decode()
+
+
+def test_estimate_matches_model_size(init_feasible_db):
+    """Test the estimate is close to the size of the model actually built."""
+    start_date = datetime.datetime.now()
+    estimate = estimate_roster(start_date)
+    roster = RosterGenerator(start_date=start_date)
+    roster.create()
+    assert estimate.variables == pytest.approx(roster.result.variables, rel=0.1)
+    assert estimate.constraints == pytest.approx(roster.result.constraints, rel=0.1)
+    assert estimate.solve_time is None
+    assert not estimate.over_budget
+
+
+def test_estimate_solve_time_from_history(init_feasible_db):
+    """Test solve time is predicted from previous runs."""
+    RosterRun.objects.create(
+        start_date=datetime.date.today(),
+        status=RosterRun.SUCCEEDED,
+        variables=1000,
+        solve_time=2.0,
+    )
+    estimate = estimate_roster(datetime.datetime.now())
+    assert estimate.solve_time == pytest.approx(estimate.variables * 0.002)
+
+
+def test_queue_roster_generation_over_budget_rejected(init_feasible_db, settings):
+    """Test over budget roster generation is rejected before queueing."""
+    settings.ROSTER_MAX_VARIABLES = 10
+    settings.ROSTER_OVER_BUDGET = "reject"
+    with pytest.raises(RosterOverBudget):
+        queue_generate_roster(datetime.datetime.now())
+    assert not RosterRun.objects.exists()
+
+
+def test_queue_roster_generation_over_budget_downgraded(
+    init_feasible_db, settings, mocker
+):
+    """Test over budget roster generation is downgraded to an isolated solve."""
+    settings.ROSTER_MAX_VARIABLES = 10
+    settings.ROSTER_OVER_BUDGET = "downgrade"
+    delay_result = mocker.stub(name="delay_result")
+    delay_result.task_id = "12345"
+    delay = mocker.patch.object(generate_roster, "delay", return_value=delay_result)
+    _, estimate = queue_generate_roster(datetime.datetime.now())
+    assert estimate.over_budget
+    assert delay.call_args.kwargs["isolated"] is True
+    assert delay.call_args.kwargs["memory_limit"] == settings.ROSTER_MEMORY_BUDGET
+    run = RosterRun.objects.get(task_id="12345")
+    assert run.estimated_variables == estimate.variables
+
+
+def test_roster_generation_phases(init_feasible_db):
+    """Test each phase of roster generation is profiled."""
+    roster = RosterGenerator(start_date=datetime.datetime.now())
+    roster.create()
+    phases = {phase.name: phase for phase in roster.profiler.phases}
+    assert phases["create_timeslots"].queries > 0
+    assert phases["create_shift_decision_vars"].variables > 0
+    assert phases["enforce_staff_numbers"].constraints > 0
+    assert phases["solve"].wall_time > 0
+    assert phases["collect_staff_requests"].memory is None
+    variables = [phase.variables for phase in roster.profiler.phases]
+    assert sum(filter(None, variables)) == roster.result.variables
+
+
+def test_roster_generation_progress(init_feasible_db):
+    """Test progress is reported before each phase and can cancel generation."""
+    progress = []
+
+    def record(phase, fraction):
+        progress.append((phase, fraction))
+        if phase == "solve_roster":
+            raise RosterGenerationCancelled(phase)
+
+    roster = RosterGenerator(start_date=datetime.datetime.now(), progress=record)
+    with pytest.raises(RosterGenerationCancelled):
+        roster.create()
+    assert [phase for phase, _ in progress] == [
+        "clear_existing_timeslots",
+        "create_timeslots",
+        "create_snapshot",
+        "solve_roster",
+    ]
+    assert progress[0][1] == 0
+    assert progress[-1][1] == 0.5
+    assert roster.complete is False
+
+
+def test_cancelled_roster_generation_not_started(init_feasible_db):
+    """Test a generation cancelled while queued ends when a worker starts it."""
+    RosterRun.objects.create(
+        task_id="12345", start_date=datetime.date.today(), status=RosterRun.CANCELLED
+    )
+    task = generate_roster.apply(
+        kwargs={"start_date": datetime.datetime.now().isoformat()}, task_id="12345"
+    )
+    assert task.get() == "Roster generation was cancelled..."
+    run = RosterRun.objects.get(task_id="12345")
+    assert run.status == RosterRun.CANCELLED
+    assert run.started is None
+    assert not TimeSlot.objects.filter(date=datetime.date.today()).exists()
+
+
+def test_isolated_roster_generation_phases(init_feasible_db, settings):
+    """Test solver phases are returned from a child process with memory traced."""
+    settings.ROSTER_PROFILE_MEMORY = True
+    roster = RosterGenerator(start_date=datetime.datetime.now(), isolated=True)
+    roster.create()
+    phases = {phase.name: phase for phase in roster.profiler.phases}
+    assert phases["create_shift_decision_vars"].memory > 0
+    assert phases["create_shift_decision_vars"].queries is None
+    assert phases["populate_roster"].queries > 0
+
+
+def test_synthetic_roster_generation(init_synthetic_db):
+    """Test a synthetic roster problem is feasible."""
+    spec = init_synthetic_db(staff=12, days=14)
+    roster = RosterGenerator(start_date=datetime.datetime.now())
+    roster.create()
+    assert roster.complete
+    assert TimeSlot.objects.count() == spec.days * spec.shifts
+
+
+def test_roster_grid(init_roster_db):
+    """Test the roster grid matches the rostered timeslots and leave."""
+    start_date = datetime.datetime.now()
+    grid = build_roster_grid(start_date)
+    assert len(grid.dates) == 14
+    assert len(grid.workers) == len({worker.id for worker in grid.workers})
+    cells = {
+        worker.name: dict(zip(grid.dates, worker_cells))
+        for worker, worker_cells in grid.rows()
+    }
+    for timeslot in TimeSlot.objects.filter(
+        date__range=[grid.dates[0], grid.dates[-1]]
+    ):
+        for staff_member in timeslot.staff.all():
+            name = f"{staff_member.last_name}, {staff_member.first_name}"
+            assert timeslot.shift.shift_type in cells[name][timeslot.date]
+    assert cells["Six, Six"][grid.dates[0]] == "Leave"
+    assert cells["Joey, Smith"][grid.dates[0]] == NOT_ROSTERED
+
+
+def test_roster_grid_queries(init_synthetic_db, django_assert_num_queries):
+    """Test the roster grid is built in a constant number of queries."""
+    init_synthetic_db(staff=40, days=28, leave_density=0.2)
+    roster = RosterGenerator(start_date=datetime.datetime.now())
+    roster.create()
+    # The number of days comes from the cached period calendar
+    with django_assert_num_queries(4):
+        grid = build_roster_grid(datetime.datetime.now())
+    assert len(grid.workers) == 40
+
+
+def test_check_shared_cache(settings):
+    """Test deploy checks reject a cache private to each process."""
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    assert [error.id for error in check_shared_cache(None)] == ["rosters.E001"]
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://redis:6379/1",
+        }
+    }
+    assert not check_shared_cache(None)
+
+
+def test_roster_grid_cache_hit(init_roster_db, django_assert_num_queries):
+    """Test an unchanged roster grid is served from the cache."""
+    start_date = datetime.datetime.now()
+    grid = get_roster_grid(start_date)
+    report = get_staff_request_report(start_date)
+    with django_assert_num_queries(0):
+        assert get_roster_grid(start_date) == grid
+    with django_assert_num_queries(0):
+        assert get_staff_request_report(start_date) == report
+
+
+def test_aget_roster_grid(init_roster_db, django_assert_num_queries):
+    """Test the async roster grid shares the cached grid."""
+    start_date = datetime.datetime.now()
+    grid = async_to_sync(aget_roster_grid)(start_date)
+    assert grid == build_roster_grid(start_date)
+    with django_assert_num_queries(0):
+        assert get_roster_grid(start_date) == grid
+
+
+def test_compact_grid(init_roster_db, django_assert_num_queries):
+    """Test the compact grid encodes the roster grid and is cached."""
+    start_date = datetime.datetime.now()
+    grid = build_roster_grid(start_date)
+    compact = get_compact_grid(start_date)
+    assert compact.dates == grid.dates
+    assert compact.staff_ids == [worker.id for worker in grid.workers]
+    assert compact.codes[0] == ""
+    for cells, codes, leave in zip(grid.cells, compact.cells, compact.leave):
+        for cell, code, on_leave in zip(cells, codes, leave):
+            if on_leave == "1":
+                assert code == 0
+            else:
+                assert compact.codes[code] == ("" if cell == NOT_ROSTERED else cell)
+    assert "1" in "".join(compact.leave)
+    with django_assert_num_queries(0):
+        assert get_compact_grid(start_date) == compact
+
+
+def _remove_rostered_staff(dates):
+    """Remove the staff of a rostered timeslot."""
+    timeslot = TimeSlot.objects.filter(date=dates[1], staff__isnull=False).first()
+    timeslot.staff.clear()
+
+
+def _remove_rostered_timeslot_from_staff(dates):
+    """Remove a rostered timeslot from the staff member side."""
+    timeslot = TimeSlot.objects.filter(date=dates[1], staff__isnull=False).first()
+    timeslot.staff.first().timeslot_set.remove(timeslot)
+
+
+def _create_leave(dates):
+    """Create leave."""
+    Leave.objects.create(
+        date=dates[2],
+        description="Training",
+        staff_member=get_user_model().objects.get(last_name="Joey"),
+    )
+
+
+def _update_leave(dates):
+    """Update leave."""
+    leave = Leave.objects.get(date=dates[0], staff_member__last_name="Six")
+    leave.description = "Sick"
+    leave.save()
+
+
+def _delete_leave(dates):
+    """Delete leave."""
+    Leave.objects.filter(date=dates[0], staff_member__last_name="Six").delete()
+
+
+def _rename_shift(dates):
+    """Rename a shift."""
+    shift = Shift.objects.get(shift_type="Early")
+    shift.shift_type = "Dawn"
+    shift.save()
+
+
+def _rename_staff_member(dates):
+    """Rename a staff member."""
+    staff_member = get_user_model().objects.get(last_name="Six")
+    staff_member.last_name = "Seven"
+    staff_member.save()
+
+
+def _regenerate_roster(dates):
+    """Regenerate the roster, which writes in bulk."""
+    TimeSlot.staff.through.objects.all().delete()
+    roster = RosterGenerator(start_date=datetime.datetime.now())
+    roster.create()
+
+
+@pytest.mark.parametrize(
+    "write",
+    [
+        _remove_rostered_staff,
+        _remove_rostered_timeslot_from_staff,
+        _create_leave,
+        _update_leave,
+        _delete_leave,
+        _rename_shift,
+        _rename_staff_member,
+        _regenerate_roster,
+    ],
+)
+def test_roster_grid_not_stale_after_write(init_roster_db, write):
+    """Test a cached roster grid is never served after a write."""
+    start_date = datetime.datetime.now()
+    grid = get_roster_grid(start_date)
+    write(grid.dates)
+    fresh = build_roster_grid(start_date)
+    assert get_roster_grid(start_date) == fresh
+    if write is not _regenerate_roster:
+        assert fresh != grid
+
+
+def test_staff_request_report_not_stale_after_write(init_roster_db):
+    """Test a cached staff request report is never served after a write."""
+    start_date = datetime.datetime.now()
+    dates = get_roster_grid(start_date).dates
+    total = get_staff_request_report(start_date)["total"]
+    StaffRequest.objects.create(
+        priority=1,
+        like=True,
+        date=dates[3],
+        shift=Shift.objects.get(shift_type="Early"),
+        staff_member=get_user_model().objects.get(last_name="Joey"),
+    )
+    report = get_staff_request_report(start_date)
+    assert report == build_staff_request_report(dates)
+    assert report["total"] == total + 1
+
+
+def test_staff_request_report(init_roster_db, django_assert_num_queries):
+    """Test the staff request report matches the roster in one query."""
+    dates = get_roster_grid(datetime.datetime.now()).dates
+    with django_assert_num_queries(1):
+        report = build_staff_request_report(dates)
+    satisfied = {}
+    for staff_request in StaffRequest.objects.all():
+        given = staff_request.staff_member in (
+            TimeSlot.objects.get(
+                date=staff_request.date, shift=staff_request.shift
+            ).staff.all()
+        )
+        satisfied[staff_request.id] = staff_request.like == given
+    assert report["total"] == len(satisfied) > 0
+    assert report["satisfied"] == len(report["successes"]) == sum(satisfied.values())
+    assert report["rate"] == report["satisfied"] / report["total"]
+    assert sum(counts["total"] for counts in report["staff"]) == report["total"]
+    assert [counts["priority"] for counts in report["priorities"]] == sorted(
+        set(StaffRequest.objects.values_list("priority", flat=True))
+    )
+    for counts in report["staff"] + report["priorities"]:
+        assert counts["rate"] == counts["satisfied"] / counts["total"]
+
+
+def test_roster_generation_stores_staff_request_report(
+    init_feasible_db, django_assert_num_queries
+):
+    """Test roster generation stores the staff request report with the run."""
+    start_date = datetime.datetime.now()
+    task = generate_roster.apply(kwargs={"start_date": start_date.isoformat()})
+    task.get()
+    run = RosterRun.objects.get(task_id=task.task_id)
+    dates = get_roster_grid(start_date).dates
+    assert run.staff_request_report == build_staff_request_report(dates)
+    assert run.staff_request_report["total"] > 0
+    with django_assert_num_queries(1):
+        assert get_staff_request_report(start_date) == run.staff_request_report
+
+
+def test_roster_export_rows(init_roster_db):
+    """Test exported rows match the roster grid."""
+    start_date = datetime.date.today()
+    grid = build_roster_grid(start_date)
+    end_date = grid.dates[-1]
+    rows = list(iter_roster_rows(start_date, end_date))
+    assert len(rows) == len(grid.dates) * len(grid.workers)
+    expected = [
+        (date.isoformat(), worker.name, cells[column])
+        for column, date in enumerate(grid.dates)
+        for worker, cells in grid.rows()
+    ]
+    assert [(row[0], row[1], row[4]) for row in rows] == expected
+
+
+def test_roster_export_queries(init_roster_db, django_assert_num_queries):
+    """Test the export reads any range in a constant number of queries."""
+    start_date = datetime.date.today()
+    end_date = start_date + datetime.timedelta(days=89)
+    num_staff = get_user_model().objects.count()
+    lines = iter_roster_csv(start_date, end_date)
+    with django_assert_num_queries(0):
+        assert next(lines).startswith("Date,")
+    with django_assert_num_queries(4):
+        next(lines)
+    with django_assert_num_queries(0):
+        assert sum(1 for _ in lines) == 90 * num_staff - 1
+
+
+def test_roster_export_async(init_roster_db, settings):
+    """Test the asynchronous export sends the same lines as the synchronous one."""
+    settings.ROSTER_EXPORT_BATCH_LINES = 7
+    start_date = datetime.date.today()
+    end_date = start_date + datetime.timedelta(days=20)
+
+    async def collect():
+        """Collect the lines of the asynchronous export."""
+        return [
+            line async for line in aiter_roster_csv(start_date, end_date)
+        ]
+
+    assert async_to_sync(collect)() == list(iter_roster_csv(start_date, end_date))
+
+
+def test_day_shifts(init_feasible_db, django_assert_num_queries):
+    """Test the shifts of each day are built once and then cached."""
+    # Built with the rest of the reference data
+    with django_assert_num_queries(4):
+        day_shifts = get_day_shifts()
+    assert list(day_shifts) == list(Day.objects.values_list("number", flat=True))
+    for shifts in day_shifts.values():
+        assert [shift.shift_type for shift in shifts] == ["Early", "Late"]
+    with django_assert_num_queries(0):
+        assert get_day_shifts() == day_shifts
+
+
+def test_day_shifts_not_stale_after_day_group_change(init_feasible_db):
+    """Test the cached shifts of each day follow day group changes."""
+    get_day_shifts()
+    weekend = DayGroup.objects.create(name="Weekend")
+    for number in (6, 7):
+        DayGroupDay.objects.create(daygroup=weekend, day=Day.objects.get(number=number))
+    Shift.objects.create(shift_type="Night", daygroup=weekend)
+    assert get_day_shifts() == build_day_shifts()
+    assert [shift.shift_type for shift in get_day_shifts()[6]] == [
+        "Early",
+        "Late",
+        "Night",
+    ]
+    DayGroupDay.objects.filter(daygroup=weekend, day__number=7).delete()
+    assert get_day_shifts() == build_day_shifts()
+    assert len(get_day_shifts()[7]) == 2
+
+
+def test_reference_data(init_feasible_db, django_assert_num_queries):
+    """Test reference data is built once and rebuilt when it changes."""
+    with django_assert_num_queries(4):
+        reference = get_reference_data()
+    assert reference.day_count == Day.objects.count()
+    assert [shift.shift_type for shift in reference.shifts] == ["Early", "Late"]
+    assert reference.roster_settings is None
+    with django_assert_num_queries(0):
+        assert get_reference_data() is reference
+    with django_assert_num_queries(0):
+        assert async_to_sync(aget_reference_data)() is reference
+    RosterSettings.objects.create(roster_name="Ward 1")
+    assert get_reference_data().roster_settings.roster_name == "Ward 1"
+    Day.objects.create(number=reference.day_count + 1)
+    assert get_reference_data().day_count == reference.day_count + 1
+    assert get_reference_data().daygroups[reference.day_count + 1] == set()
+    assert get_reference_data() == build_reference_data()
+
+
+def test_reference_data_not_rebuilt_by_roster_writes(
+    init_feasible_db, django_assert_num_queries
+):
+    """Test writes that do not change reference data leave it cached."""
+    reference = get_reference_data()
+    TimeSlot.objects.first().save()
+    with django_assert_num_queries(0):
+        assert get_reference_data() is reference
+
+
+def test_reference_data_shared_cache(
+    init_feasible_db,
+    settings,
+    tmp_path,
+    monkeypatch,
+    django_capture_on_commit_callbacks,
+):
+    """Test reference data changed through another process's cache is rebuilt."""
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path),
+        }
+    }
+    reference = get_reference_data()
+    assert reference.roster_settings is None
+    with monkeypatch.context() as other_process:
+        other_process.setattr(
+            roster_cache, "cache", caches.create_connection("default")
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            RosterSettings.objects.create(roster_name="Ward 1")
+    assert get_reference_data().roster_settings.roster_name == "Ward 1"
+    assert async_to_sync(aget_reference_data)().roster_settings is not None
+
+
+def test_period_calendar_timeslots(init_feasible_db):
+    """Test the period calendar maps each date to its timeslots."""
+    dates = get_roster_grid(datetime.date.today()).dates
+    assert get_period_calendar(dates).timeslots == {date: {} for date in dates}
+    create_missing_timeslots(dates)
+    calendar = get_period_calendar(dates)
+    assert calendar.timeslots == {
+        date: {
+            timeslot.shift_id: timeslot.id
+            for timeslot in TimeSlot.objects.filter(date=date)
+        }
+        for date in dates
+    }
+    assert all(len(timeslots) == 2 for timeslots in calendar.timeslots.values())
+
+
+def test_roster_generation_missing_day_group(init_feasible_db):
+    """Test roster generation fails clearly for a shift without a day group."""
+    Shift.objects.create(shift_type="Night")
+    roster = RosterGenerator(start_date=datetime.datetime.now())
+    with pytest.raises(MissingDayGroup):
+        roster.create()
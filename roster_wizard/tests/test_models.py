@@ -16,6 +16,7 @@ from rosters.models import (
     ShiftSequenceShift,
     TimeSlot,
     StaffRequest,
+    RosterRun,
 )
 
 pytestmark = pytest.mark.django_db
@@ -181,3 +182,9 @@ def test_customuser_get_absolute_url(init_feasible_db):
     customuser = CustomUser.objects.first()
     # This will also fail if the urlconf is not defined.
     assert customuser.get_absolute_url() == f"/users/customuser/{customuser.id}/"
+
+
+def test_rosterrun_object_name():
+    """Test rosterrun object name."""
+    rosterrun = RosterRun.objects.create(start_date="2024-01-01")
+    assert str(rosterrun) == "2024-01-01:PENDING"
@@ -0,0 +1,263 @@
+"""Per-view query budgets.
+
+Requests every URL of rosters/urls.py, users/urls.py and api/urls.py with a
+cold cache against a small and a scaled dataset of several roster periods.
+Every view must answer with its expected status, so that each budget
+measures a request that did its work, and stay within its query budget on
+both datasets. It must not issue more queries on the scaled dataset than on
+the small one, so a view whose queries grow with the data fails however
+large its budget.
+
+Wall time depends on the machine, so the wall time budgets are deselected by
+default and run with:
+
+    pytest -m benchmark tests/test_query_budgets.py
+"""
+
+import datetime
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api import urls as api_urls
+from rosters import urls as roster_urls
+from rosters.cache import invalidate_all
+from rosters.ical import get_calendar_token
+from rosters.models import (
+    Day,
+    DayGroup,
+    DayGroupDay,
+    Leave,
+    Role,
+    RosterRun,
+    RosterSettings,
+    Shift,
+    ShiftSequence,
+    ShiftSequenceShift,
+    SkillMixRule,
+    SkillMixRuleRole,
+    StaffRequest,
+    TimeSlot,
+)
+from rosters.period import get_day_shifts
+from rosters.synthetic import SyntheticSpec, clear_roster_data, create_synthetic_roster
+from rosters.views import AsyncResult
+from users import urls as user_urls
+
+pytestmark = pytest.mark.django_db
+
+SMALL = SyntheticSpec(
+    staff=12, roles=2, days=14, shifts=2, skill_mix_rules=1, sequence_rules=1
+)
+LARGE = SyntheticSpec(
+    staff=300, roles=6, days=28, shifts=3, skill_mix_rules=4, sequence_rules=3
+)
+
+# Roster periods of timeslots, centred on the current period
+PERIODS = 3
+
+# Queries allowed for any view, including session and user lookups, and the
+# views that need more, as measured on both datasets
+DEFAULT_MAX_QUERIES = 10
+MAX_QUERIES = {
+    "roster-compact": 11,
+    "shiftsequence_update": 11,
+    "generate-list": 14,
+    "generate_roster": 14,
+}
+
+# Status of URLs that do not answer GET with 200, which are only requested to
+# check they reject it before querying
+STATUS_CODES = {
+    "customuser_calendar_rotate": 405,
+    "leave-bulk": 405,
+    "staffrequests-bulk": 405,
+    "roster-assignments": 405,
+}
+
+# Seconds allowed for any view on the scaled dataset, and the views that
+# render the whole roster and need more
+DEFAULT_MAX_SECONDS = 2.0
+MAX_SECONDS = {
+    "edit_roster": 10.0,
+    "roster_by_staff": 5.0,
+    "download_csv": 5.0,
+    "roster-list": 5.0,
+    "roster-grid": 5.0,
+    "roster-cells": 5.0,
+}
+
+# Models of the pk of detail, update and delete URLs by URL name prefix
+MODELS = {
+    "leave": Leave,
+    "role": Role,
+    "shift": Shift,
+    "skillmixrule": SkillMixRule,
+    "skillmixrulerole": SkillMixRuleRole,
+    "shiftsequence": ShiftSequence,
+    "shiftsequenceshift": ShiftSequenceShift,
+    "timeslot": TimeSlot,
+    "timeslots": TimeSlot,
+    "daygroup": DayGroup,
+    "daygroupday": DayGroupDay,
+    "day": Day,
+    "staffrequest": StaffRequest,
+    "staffrequests": StaffRequest,
+}
+
+
+def _url_names():
+    """Get the names and URL keyword arguments of every URL under test."""
+    names = {}
+    for module in (roster_urls, user_urls, api_urls):
+        for pattern in module.urlpatterns:
+            names[pattern.name] = tuple(pattern.pattern.regex.groupindex)
+    return names
+
+
+def _url_kwargs(name, kwargs, staff_member, run):
+    """Get URL keyword arguments naming objects of the dataset."""
+    values = {
+        "skillmixrule": SkillMixRule.objects.values_list("id", flat=True).first(),
+        "shiftsequence": ShiftSequence.objects.values_list("id", flat=True).first(),
+        "daygroup": DayGroup.objects.values_list("id", flat=True).first(),
+        "staffid": staff_member.id,
+        "token": get_calendar_token(staff_member),
+        "task_id": run.task_id,
+    }
+    prefix = name.replace("-", "_").rsplit("_", 1)[0]
+    if prefix == "customuser":
+        values["pk"] = staff_member.id
+    elif prefix == "generate":
+        values["pk"] = run.task_id
+    elif prefix in MODELS:
+        values["pk"] = MODELS[prefix].objects.values_list("id", flat=True).first()
+    return {kwarg: values[kwarg] for kwarg in kwargs}
+
+
+def _url_params(name, start_date):
+    """Get query parameters the URL needs to do its work."""
+    end_date = start_date + datetime.timedelta(days=len(get_day_shifts()) - 1)
+    return {
+        "roster-export": {"start_date": start_date, "end_date": end_date},
+        "generate-list": {"date": f"{start_date}T00:00"},
+    }.get(name, {})
+
+
+def _create_timeslots(staff, start_date, num_days):
+    """Create the timeslots of num_days from start_date, staffing every shift."""
+    day_shifts = get_day_shifts()
+    timeslots = TimeSlot.objects.bulk_create(
+        TimeSlot(date=start_date + datetime.timedelta(days=day), shift=shift)
+        for day in range(num_days)
+        for shift in day_shifts[day % len(day_shifts) + 1]
+    )
+    by_date = {}
+    for timeslot in timeslots:
+        by_date.setdefault(timeslot.date, []).append(timeslot)
+    TimeSlotStaffRelationship = TimeSlot.staff.through  # pylint: disable=invalid-name
+    TimeSlotStaffRelationship.objects.bulk_create(
+        TimeSlotStaffRelationship(
+            timeslot_id=slots[index % len(slots)].id, customuser_id=worker.id
+        )
+        for slots in by_date.values()
+        for index, worker in enumerate(staff)
+    )
+    # Bulk changes send no signals
+    invalidate_all()
+
+
+def _measure(client, spec):
+    """Request every URL against a dataset of spec.
+
+    Returns the status code, queries and seconds of every URL name.
+    """
+    clear_roster_data()
+    start_date = datetime.date.today()
+    staff = create_synthetic_roster(spec, start_date)
+    _create_timeslots(
+        staff,
+        start_date - datetime.timedelta(days=spec.days * (PERIODS // 2)),
+        spec.days * PERIODS,
+    )
+    # Leave and requests are random, so make sure there is one of each
+    Leave.objects.get_or_create(staff_member=staff[0], date=start_date)
+    StaffRequest.objects.get_or_create(
+        staff_member=staff[0],
+        date=start_date,
+        shift=Shift.objects.first(),
+        defaults={"priority": 1},
+    )
+    RosterSettings.objects.update_or_create(defaults={"roster_name": "Budget"})
+    run = RosterRun.objects.create(
+        task_id=f"budget-{spec.staff}",
+        start_date=start_date,
+        status=RosterRun.SUCCEEDED,
+    )
+    results = {}
+    for name, kwargs in _url_names().items():
+        url = reverse(name, kwargs=_url_kwargs(name, kwargs, staff[0], run))
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url, _url_params(name, start_date))
+            # Streamed responses query as they are consumed
+            response.getvalue()
+            seconds = time.perf_counter() - start
+        results[name] = (response.status_code, len(queries), seconds)
+    return results
+
+
+@pytest.fixture()
+def measure(client, mocker):
+    """Measure every URL against a dataset as a superuser."""
+    mocker.patch.object(AsyncResult, "ready", return_value=True)
+    mocker.patch.object(AsyncResult, "get", return_value="Roster is complete...")
+    superuser = get_user_model().objects.create_user(
+        password="temporary",
+        email="budget@fred.com",
+        last_name="Budget",
+        first_name="Admin",
+        available=False,
+        is_staff=True,
+        is_superuser=True,
+    )
+    client.force_login(superuser)
+    return lambda spec: _measure(client, spec)
+
+
+def test_query_budgets(measure):
+    """Test every view stays within its query budget as the data grows."""
+    small = measure(SMALL)
+    large = measure(LARGE)
+    failures = []
+    for name, (status_code, queries, _) in large.items():
+        budget = MAX_QUERIES.get(name, DEFAULT_MAX_QUERIES)
+        expected = STATUS_CODES.get(name, 200)
+        if status_code != expected or small[name][0] != expected:
+            failures.append(
+                f"{name} answered {small[name][0]} and {status_code}, not {expected}"
+            )
+        if queries > budget:
+            failures.append(f"{name} made {queries} queries, budget {budget}")
+        if queries > small[name][1]:
+            failures.append(
+                f"{name} grew from {small[name][1]} to {queries} queries with the data"
+            )
+    assert not failures, "\n".join(failures)
+
+
+@pytest.mark.benchmark
+def test_wall_time_budgets(measure):
+    """Test every view responds within its wall time budget at scale."""
+    failures = []
+    for name, (_, _, seconds) in measure(LARGE).items():
+        budget = MAX_SECONDS.get(name, DEFAULT_MAX_SECONDS)
+        if seconds > budget:
+            failures.append(f"{name} took {seconds:.2f}s, budget {budget}s")
+    assert not failures, "\n".join(failures)
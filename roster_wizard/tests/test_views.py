@@ -1,14 +1,40 @@
 """View Testing."""
 
 import datetime
+import json
 import pytest
 
+from asgiref.sync import async_to_sync
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.test import SimpleTestCase
 from django.contrib.auth import get_user_model
 
-from rosters.models import Day, Role, SkillMixRule, ShiftSequence, Shift, DayGroup
-from rosters.views import generate_roster, AsyncResult
+from rosters.models import (
+    Day,
+    Leave,
+    Role,
+    SkillMixRule,
+    ShiftSequence,
+    Shift,
+    DayGroup,
+    RosterRun,
+    RosterSettings,
+    StaffRequest,
+    TimeSlot,
+)
+from rosters import queryprofile
+from rosters.ical import get_calendar_token
+from rosters.queryprofile import (
+    QueryProfileMiddleware,
+    get_top_views,
+    iter_profile_records,
+)
+from rosters.tasks import generate_roster
+from rosters.views import AsyncResult
 from rosters.logic import SolutionNotFeasible
 
 pytestmark = pytest.mark.django_db
@@ -42,6 +68,7 @@ def test_roster_by_staff_view_start_date(init_roster_db, client):
     response = client.get(reverse("roster_by_staff"))
     assert response.status_code == 200
     assert "Roster By Staff:" in response.rendered_content
+    assert "One, One" in response.rendered_content
     assert "roster_by_staff.html" in [t.name for t in response.templates]
 
 
@@ -81,6 +108,7 @@ def test_generate_roster_view(init_db, client):
     assert response.status_code == 200
     assert "Generate New Roster:" in response.rendered_content
     assert "generate_roster.html" in [t.name for t in response.templates]
+    assert "Estimate:" in response.rendered_content
 
 
 def test_home_view(init_feasible_db, client):
@@ -126,6 +154,97 @@ def test_generate_roster_view_post_feasible(init_db, client, mocker):
     assert "/rosters/generate_roster/" in response.url
 
 
+def test_generate_roster_view_post_over_budget(init_feasible_db, client, settings):
+    """Test generate roster view post rejects over budget rosters."""
+    settings.ROSTER_MAX_VARIABLES = 10
+    settings.ROSTER_OVER_BUDGET = "reject"
+    client.login(email="temporary@fred.com", password="temporary")
+    response = client.post(
+        reverse("generate_roster"), {"start_date": datetime.datetime.now()}
+    )
+    assert response.status_code == 200
+    assert "exceeds the budget" in response.rendered_content
+    assert "over the memory budget" in response.rendered_content
+
+
+def test_roster_generation_status_view_phases(init_db, client, mocker):
+    """Test roster generation status view shows profiled phases."""
+    client.login(email="temporary@fred.com", password="temporary")
+    mocker.patch.object(AsyncResult, "ready", return_value=True)
+    mocker.patch.object(AsyncResult, "get", return_value="Roster is complete...")
+    RosterRun.objects.create(
+        task_id="12345",
+        start_date=datetime.date.today(),
+        status=RosterRun.SUCCEEDED,
+        phases=[
+            {
+                "name": "enforce_staff_numbers",
+                "wall_time": 0.5,
+                "cpu_time": 0.4,
+                "queries": None,
+                "query_time": None,
+                "memory": 2048,
+                "variables": 0,
+                "constraints": 56,
+            }
+        ],
+    )
+    response = client.get(reverse("roster_generation_status", args=("12345",)))
+    assert response.status_code == 200
+    assert "enforce_staff_numbers" in str(response.getvalue())
+    assert "2.0\xa0KB" in response.content.decode()
+
+
+def test_roster_status_stream(init_db, client, mocker):
+    """Test the roster status stream sends the current status under WSGI."""
+    client.login(email="temporary@fred.com", password="temporary")
+    session = client.session
+    session["task_id"] = "12345"
+    session.save()
+    mocker.patch.object(AsyncResult, "ready", return_value=True)
+    response = client.get(reverse("roster_status_stream"))
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/event-stream"
+    content = response.content.decode()
+    assert content.startswith("retry: ")
+    assert "event: status\ndata: " in content
+    assert "Roster: Ready" in content
+
+
+def test_roster_status_stream_pushes_run_changes(
+    init_db, async_client, mocker, settings
+):
+    """Test the roster status stream pushes the status when a run changes."""
+    settings.ROSTER_STATUS_POLL_INTERVAL = 0.01
+    settings.ROSTER_STATUS_STREAM_TIMEOUT = 1
+    async_client.login(email="temporary@fred.com", password="temporary")
+    session = async_client.session
+    session["task_id"] = "12345"
+    session.save()
+    ready = mocker.patch.object(AsyncResult, "ready", return_value=False)
+
+    async def collect():
+        response = await async_client.get(reverse("roster_status_stream"))
+        assert response["Content-Type"] == "text/event-stream"
+        events = []
+        async for chunk in response.streaming_content:
+            events.append(chunk.decode())
+            if "Roster: Processing" in events[-1]:
+                ready.return_value = True
+                await RosterRun.objects.acreate(
+                    task_id="12345",
+                    start_date=datetime.date.today(),
+                    status=RosterRun.SUCCEEDED,
+                )
+        return events
+
+    events = [event for event in async_to_sync(collect)() if event.startswith("event")]
+    assert len(events) == 2
+    assert "Roster: Processing" in events[0]
+    assert "Roster: Ready" in events[1]
+    assert ready.call_count == 2
+
+
 def test_roster_generation_status_view_feasible(init_db, client, mocker):
     """Test roster generation status view."""
     client.login(email="temporary@fred.com", password="temporary")
@@ -228,6 +347,90 @@ def test_staff_request_update_view_post(init_feasible_db, client):
     assert reverse("staffrequest_list") in response.url
 
 
+def _staff_request_data(form):
+    """Build staff request POST data from the initial data of a form."""
+    return {
+        name: "" if field.initial is None else field.initial
+        for name, field in form.fields.items()
+    }
+
+
+def test_staff_request_update_uses_period_calendar(init_feasible_db, client):
+    """Test staff request update does not walk days and day groups per request."""
+    client.login(email="temporary@fred.com", password="temporary")
+    staff_member = get_user_model().objects.get(email="one@fred.com")
+    url = reverse("staffrequest_update", args=(staff_member.id,))
+    client.get(url)
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.context["form"].fields) == 2 * 14 * 2
+    assert not [
+        query
+        for query in context.captured_queries
+        if 'FROM "rosters_day' in query["sql"] or 'FROM "rosters_shift"' in query["sql"]
+    ]
+
+
+def test_staff_request_update_saves_changes_only(init_feasible_db, client):
+    """Test staff request update only writes the cells that changed."""
+    client.login(email="temporary@fred.com", password="temporary")
+    staff_member = get_user_model().objects.get(email="one@fred.com")
+    url = reverse("staffrequest_update", args=(staff_member.id,))
+    data = _staff_request_data(client.get(url).context["form"])
+    before = set(staff_member.staffrequest_set.values_list("id", "like", "priority"))
+    assert before
+
+    response = client.post(url, data)
+    assert response.status_code == 302
+    after = set(staff_member.staffrequest_set.values_list("id", "like", "priority"))
+    assert after == before
+
+    cells = len(data) // 2
+    for i in range(cells):
+        data[f"request_{i}"] = "Yes"
+        data[f"priority_{i}"] = 5
+    with CaptureQueriesContext(connection) as context:
+        response = client.post(url, data)
+    assert response.status_code == 302
+    # One read, one delete and one upsert however many cells changed
+    assert (
+        len(
+            [
+                query
+                for query in context.captured_queries
+                if "rosters_staffrequest" in query["sql"]
+            ]
+        )
+        <= 3
+    )
+    assert staff_member.staffrequest_set.count() == cells
+    assert set(staff_member.staffrequest_set.values_list("like", "priority")) == {
+        (True, 5)
+    }
+    kept = {request_id for request_id, _, _ in before} & set(
+        staff_member.staffrequest_set.values_list("id", flat=True)
+    )
+    assert len(kept) == len(before)
+
+    data["request_0"] = "Don't Care"
+    response = client.post(url, data)
+    assert staff_member.staffrequest_set.count() == cells - 1
+
+
+def test_staff_request_status_view(init_roster_db, client):
+    """Test staff request status shows satisfaction rates and requests."""
+    client.login(email="temporary@fred.com", password="temporary")
+    response = client.get(reverse("staff_request_status"))
+    assert response.status_code == 200
+    report = response.context["report"]
+    assert report["total"] == StaffRequest.objects.count()
+    content = response.content.decode()
+    assert f"{report['satisfied']} of {report['total']} requests satisfied" in content
+    for counts in report["staff"]:
+        assert counts["name"] in content
+
+
 def test_download_csv(init_feasible_db, client):
     """Test download CSV."""
     client.login(email="temporary@fred.com", password="temporary")
@@ -247,6 +450,20 @@ def test_download_csv_start_date(init_feasible_db, client):
     assert "Staff Member" in str(response.content)
 
 
+def test_download_csv_not_stale(init_feasible_db, client):
+    """Test a cached CSV download is not served after leave is taken."""
+    client.login(email="temporary@fred.com", password="temporary")
+    response = client.get(reverse("download_csv"))
+    assert "Training" not in response.content.decode()
+    Leave.objects.create(
+        date=datetime.date.today(),
+        description="Training",
+        staff_member=get_user_model().objects.get(last_name="Joey"),
+    )
+    response = client.get(reverse("download_csv"))
+    assert "Training" in response.content.decode()
+
+
 def test_shift_rule_role_create_view_post(init_feasible_db, client):
     """Test shift rule role create view post."""
     client.login(email="temporary@fred.com", password="temporary")
@@ -422,3 +639,373 @@ def test_custom_user_list_view(init_feasible_db, client):
     assert response.status_code == 200
     assert "Staff:" in response.rendered_content
     assert "customuser_list.html" in [t.name for t in response.templates]
+
+
+def test_metrics_view(init_db, client, settings):
+    """Test metrics are exposed in the Prometheus text format."""
+    settings.METRICS_TOKEN = "secret"
+    RosterRun.objects.create(
+        start_date=datetime.date.today(),
+        status=RosterRun.SUCCEEDED,
+        solver_status="OPTIMAL",
+        solve_time=1.5,
+        conflicts=10,
+        objective=90.0,
+        best_bound=99.0,
+    )
+    RosterRun.objects.create(start_date=datetime.date.today())
+    stale = RosterRun.objects.create(start_date=datetime.date.today())
+    RosterRun.objects.filter(id=stale.id).update(
+        created=stale.created - datetime.timedelta(seconds=settings.ROSTER_QUEUE_MAX_AGE)
+    )
+    response = client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    content = response.content.decode()
+    assert 'roster_generation_runs{status="SUCCEEDED"} 1.0' in content
+    assert "roster_generation_queue_depth 1.0" in content
+    assert "roster_generation_stale_pending 1.0" in content
+    assert "# TYPE roster_solver_status_total counter" in content
+    assert 'roster_solver_status_total{status="OPTIMAL"} 1.0' in content
+    assert "roster_solver_wall_time_seconds_sum 1.5" in content
+    assert "roster_solver_last_gap 0.1" in content
+
+
+def test_metrics_view_token(init_db, client, settings):
+    """Test metrics require the bearer token, or DEBUG when there is none."""
+    settings.METRICS_TOKEN = ""
+    settings.DEBUG = False
+    assert client.get(reverse("metrics")).status_code == 403
+    settings.DEBUG = True
+    assert client.get(reverse("metrics")).status_code == 200
+    settings.METRICS_TOKEN = "secret"
+    assert client.get(reverse("metrics")).status_code == 403
+    response = client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+    assert response.status_code == 200
+
+
+def test_query_profile_middleware(init_db, rf, settings, mocker):
+    """Test sampled requests are profiled and repeated queries flag N+1."""
+    settings.ROSTER_QUERY_PROFILE_RATE = 0
+    with pytest.raises(MiddlewareNotUsed):
+        QueryProfileMiddleware(lambda request: HttpResponse())
+    settings.ROSTER_QUERY_PROFILE_RATE = 1
+    settings.ROSTER_QUERY_PROFILE_REPEATS = 3
+
+    def get_response(request):
+        for number in range(4):
+            list(Day.objects.filter(number=number))
+        Role.objects.count()
+        return HttpResponse()
+
+    info = mocker.patch.object(queryprofile.log, "info")
+    request = rf.get("/")
+    request.resolver_match = None
+    QueryProfileMiddleware(get_response)(request)
+    record = json.loads(info.call_args.args[0])
+    assert record["view"] == "<unresolved>"
+    assert record["queries"] == 5
+    assert record["n_plus_one"]
+    assert record["repeated"][0]["count"] == 4
+    assert "rosters_day" in record["repeated"][0]["sql"]
+
+
+def test_query_profile_middleware_asgi(
+    init_feasible_db, async_client, settings, mocker
+):
+    """Test sampled requests are profiled under ASGI."""
+    settings.ROSTER_QUERY_PROFILE_RATE = 1
+    info = mocker.patch.object(queryprofile.log, "info")
+    user = get_user_model().objects.get(email="temporary@fred.com")
+    async_to_sync(async_client.aforce_login)(user)
+    response = async_to_sync(async_client.get)(reverse("roster_by_staff"))
+    assert response.status_code == 200
+    record = json.loads(info.call_args.args[0])
+    assert record["view"] == "roster_by_staff"
+    assert record["queries"] > 0
+
+
+def test_query_profile_view(init_db, admin_client, settings, tmp_path):
+    """Test the admin ranks views by their N+1 requests."""
+    settings.ROSTER_QUERY_PROFILE_LOG = str(tmp_path / "queries.log")
+    records = [
+        {"view": "day_list", "n_plus_one": False, "queries": 30, "repeated": []},
+        {
+            "view": "leave_list",
+            "n_plus_one": True,
+            "queries": 12,
+            "repeated": [{"fingerprint": "a", "count": 10, "sql": "SELECT leave"}],
+        },
+    ]
+    with open(settings.ROSTER_QUERY_PROFILE_LOG, "w", encoding="utf-8") as log_file:
+        for record in records:
+            log_file.write(json.dumps({**record, "db_time": 0.01}) + "\n")
+        log_file.write("truncated {\n")
+    views = get_top_views(iter_profile_records(), 10)
+    assert [view.view for view in views] == ["leave_list", "day_list"]
+    assert views[0].worst_count == 10
+    response = admin_client.get(reverse("query_profile"))
+    assert response.status_code == 200
+    assert "SELECT leave" in response.content.decode()
+
+
+def test_export_roster_view(init_feasible_db, client):
+    """Test export roster view streams the selected range."""
+    client.login(email="temporary@fred.com", password="temporary")
+    response = client.get(reverse("export_roster"))
+    assert response.status_code == 200
+    start_date = datetime.date.today()
+    response = client.post(
+        reverse("export_roster"),
+        {
+            "start_date": start_date,
+            "end_date": start_date + datetime.timedelta(days=40),
+        },
+    )
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Disposition"].startswith("attachment;")
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert len(lines) == 1 + 41 * get_user_model().objects.count()
+
+
+def test_export_roster_view_asgi(init_feasible_db, async_client):
+    """Test export roster view streams asynchronously under ASGI."""
+    user = get_user_model().objects.get(email="temporary@fred.com")
+    async_to_sync(async_client.aforce_login)(user)
+    start_date = datetime.date.today()
+    response = async_to_sync(async_client.post)(
+        reverse("export_roster"),
+        {"start_date": start_date, "end_date": start_date + datetime.timedelta(days=9)},
+    )
+    assert response.status_code == 200
+    assert response.is_async
+
+    async def collect():
+        """Collect the streamed lines."""
+        return b"".join([line async for line in response.streaming_content])
+
+    assert async_to_sync(collect)().decode().startswith("Date,")
+
+
+def test_export_roster_view_too_long(init_feasible_db, client, settings):
+    """Test export roster view rejects ranges over the export limit."""
+    settings.ROSTER_EXPORT_MAX_DAYS = 30
+    client.login(email="temporary@fred.com", password="temporary")
+    start_date = datetime.date.today()
+    response = client.post(
+        reverse("export_roster"),
+        {
+            "start_date": start_date,
+            "end_date": start_date + datetime.timedelta(days=40),
+        },
+    )
+    assert response.status_code == 200
+    assert not response.streaming
+    assert "limited to 30 days" in response.content.decode()
+
+
+def test_staff_calendar(init_roster_db, client, django_assert_num_queries):
+    """Test staff calendar feed answers unchanged polls with 304."""
+    staff_member = get_user_model().objects.get(last_name="Six")
+    url = reverse("staff_calendar", args=[get_calendar_token(staff_member)])
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/calendar")
+    content = response.content.decode()
+    assert content.startswith("BEGIN:VCALENDAR\r\n")
+    assert f"DTSTART;VALUE=DATE:{datetime.date.today():%Y%m%d}" in content
+    assert "SUMMARY:Leave" in content
+    assert content.count("BEGIN:VEVENT") == (
+        staff_member.timeslot_set.count() + staff_member.leave_set.count()
+    )
+    # Only the token is checked
+    with django_assert_num_queries(1):
+        response = client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == 304
+    with django_assert_num_queries(1):
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+    assert response.status_code == 304
+
+
+def test_staff_calendar_timed_shifts(init_roster_db, client):
+    """Test shifts with times are timed events and long lines are folded."""
+    timeslot = TimeSlot.objects.filter(staff__isnull=False).first()
+    staff_member = timeslot.staff.first()
+    shift = timeslot.shift
+    shift.start_time = datetime.time(22)
+    shift.end_time = datetime.time(7, 30)
+    shift.save()
+    Leave.objects.create(
+        date=datetime.date.today() + datetime.timedelta(days=3),
+        description="Conference " * 10,
+        staff_member=staff_member,
+    )
+    url = reverse("staff_calendar", args=[get_calendar_token(staff_member)])
+    content = client.get(url).content.decode()
+    assert f"DTSTART:{timeslot.date:%Y%m%d}T220000\r\n" in content
+    next_day = timeslot.date + datetime.timedelta(days=1)
+    assert f"DTEND:{next_day:%Y%m%d}T073000\r\n" in content
+    lines = content.split("\r\n")
+    assert all(len(line.encode()) <= 75 for line in lines)
+    assert any(line.startswith(" ") for line in lines)
+    unfolded = content.replace("\r\n ", "")
+    assert f"SUMMARY:{'Conference ' * 10}\r\n" in unfolded
+
+
+def test_staff_calendar_rotate(init_feasible_db, client):
+    """Test replacing the calendar link revokes the old one."""
+    client.login(email="temporary@fred.com", password="temporary")
+    user = get_user_model().objects.get(email="temporary@fred.com")
+    old_url = reverse("staff_calendar", args=[get_calendar_token(user)])
+    assert client.get(old_url).status_code == 200
+    assert client.get(reverse("customuser_calendar_rotate")).status_code == 405
+    response = client.post(reverse("customuser_calendar_rotate"))
+    assert response.status_code == 302
+    user.refresh_from_db()
+    assert client.get(old_url).status_code == 404
+    new_url = reverse("staff_calendar", args=[get_calendar_token(user)])
+    assert client.get(new_url).status_code == 200
+
+
+def test_staff_calendar_changed(init_roster_db, client):
+    """Test staff calendar feed is resent after the staff member's leave changes."""
+    staff_member = get_user_model().objects.get(last_name="Six")
+    url = reverse("staff_calendar", args=[get_calendar_token(staff_member)])
+    etag = client.get(url)["ETag"]
+    Leave.objects.create(
+        date=datetime.date.today() + datetime.timedelta(days=3),
+        description="Training",
+        staff_member=staff_member,
+    )
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+    assert "SUMMARY:Training" in response.content.decode()
+
+
+def test_staff_calendar_forged_token(init_feasible_db, client):
+    """Test staff calendar feed rejects forged tokens."""
+    staff_member = get_user_model().objects.first()
+    response = client.get(reverse("staff_calendar", args=[f"{staff_member.pk}:x"]))
+    assert response.status_code == 404
+
+
+def test_customuser_detail_calendar_url(init_feasible_db, client):
+    """Test staff members see their own calendar feed URL only."""
+    client.login(email="temporary@fred.com", password="temporary")
+    user = get_user_model().objects.get(email="temporary@fred.com")
+    other = get_user_model().objects.exclude(pk=user.pk).first()
+    response = client.get(reverse("customuser_detail", args=[user.pk]))
+    assert get_calendar_token(user) in response.content.decode()
+    response = client.get(reverse("customuser_detail", args=[other.pk]))
+    assert get_calendar_token(other) not in response.content.decode()
+
+
+@pytest.mark.parametrize(
+    "url_name", ["roster_by_staff", "staff_request_status", "download_csv"]
+)
+def test_roster_period_conditional(init_roster_db, client, url_name):
+    """Test roster period pages answer unchanged polls with 304."""
+    client.login(email="temporary@fred.com", password="temporary")
+    response = client.get(reverse(url_name))
+    assert response.status_code == 200
+    etag = response["ETag"]
+    response = client.get(reverse(url_name), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    timeslot = TimeSlot.objects.filter(date=datetime.date.today()).first()
+    timeslot.staff.clear()
+    response = client.get(reverse(url_name), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def test_roster_period_etag_rendered_state(init_roster_db, client):
+    """Test roster period ETags change with the roster name and the session."""
+    client.login(email="temporary@fred.com", password="temporary")
+    etag = client.get(reverse("roster_by_staff"))["ETag"]
+    RosterSettings.objects.update_or_create(defaults={"roster_name": "Renamed"})
+    response = client.get(reverse("roster_by_staff"), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert "Renamed" in response.content.decode()
+    etag = response["ETag"]
+    session = client.session
+    session["task_id"] = "12345"
+    session.save()
+    response = client.get(reverse("roster_by_staff"), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+
+def _edit_roster_data(formset):
+    """Build edit roster POST data from the initial data of a formset."""
+    data = {
+        "form-TOTAL_FORMS": len(formset.initial),
+        "form-INITIAL_FORMS": len(formset.initial),
+        "form-MIN_NUM_FORMS": 0,
+        "form-MAX_NUM_FORMS": 1000,
+    }
+    for form_num, staff_shifts in enumerate(formset.initial):
+        for day_label, shift_type in staff_shifts.items():
+            data[f"form-{form_num}-{day_label}"] = shift_type
+    return data
+
+
+def test_edit_roster_creates_timeslots(init_feasible_db, client):
+    """Test edit roster creates missing timeslots only once."""
+    client.login(email="temporary@fred.com", password="temporary")
+    response = client.get(reverse("edit_roster"))
+    assert response.status_code == 200
+    dates = response.context["dates"]
+    timeslots = TimeSlot.objects.filter(date__range=[dates[0], dates[-1]])
+    count = timeslots.count()
+    assert count == 2 * len(dates)
+    client.get(reverse("edit_roster"))
+    assert timeslots.count() == count
+
+
+def test_edit_roster_saves_changes_only(init_roster_db, client):
+    """Test edit roster only replaces the assignments of changed cells."""
+    client.login(email="temporary@fred.com", password="temporary")
+    response = client.get(reverse("edit_roster"))
+    formset = response.context["formset"]
+    dates = response.context["dates"]
+    staff_members = list(response.context["staff_members"])
+    through = TimeSlot.staff.through.objects.filter(
+        timeslot__date__range=[dates[0], dates[-1]]
+    )
+    before = set(through.values_list("id", "timeslot_id", "customuser_id"))
+
+    data = _edit_roster_data(formset)
+    response = client.post(reverse("edit_roster"), data)
+    assert response.status_code == 302
+    assert set(through.values_list("id", "timeslot_id", "customuser_id")) == before
+
+    form_num = next(
+        num
+        for num, staff_member in enumerate(staff_members)
+        if staff_member.last_name == "One"
+    )
+    old_shift = data[f"form-{form_num}-day-1"]
+    new_shift = "Late" if old_shift != "Late" else "Early"
+    data[f"form-{form_num}-day-1"] = new_shift
+    response = client.post(reverse("edit_roster"), data)
+    assert response.status_code == 302
+    after = set(through.values_list("id", "timeslot_id", "customuser_id"))
+    changed = TimeSlot.objects.get(date=dates[1], shift__shift_type=new_shift)
+    staff_id = staff_members[form_num].id
+    assert before - after == {
+        row
+        for row in before
+        if row[2] == staff_id
+        and row[1]
+        in {timeslot.id for timeslot in TimeSlot.objects.filter(date=dates[1])}
+    }
+    assert {row[1:] for row in after - before} == {(changed.id, staff_id)}
+
+
+def test_edit_roster_grid_view(init_feasible_db, client):
+    """Test quick edit roster page points at the roster cells API."""
+    client.login(email="temporary@fred.com", password="temporary")
+    response = client.get(reverse("edit_roster_grid"))
+    assert response.status_code == 200
+    assert "/api/v1/roster/cells/" in response.content.decode()
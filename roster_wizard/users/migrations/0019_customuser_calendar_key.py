@@ -0,0 +1,18 @@
+# Generated by Django 6.1 on 2026-10-19 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0018_remove_customuser_username"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="calendar_key",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+    ]
@@ -66,6 +66,8 @@ class CustomUser(AbstractUser):
     enforce_one_shift_per_day = models.BooleanField(
         null=False, blank=False, default=True
     )
+    # Part of the calendar feed token, changing it revokes the feed URL
+    calendar_key = models.CharField(max_length=32, null=False, blank=True, default="")
 
     def __str__(self):
         """How a user object is displayed."""
@@ -8,6 +8,7 @@ from .views import (
     CustomUserDetailView,
     CustomUserDeleteView,
     CustomUserCreateView,
+    calendar_rotate,
 )
 
 urlpatterns = [
@@ -32,4 +33,9 @@ urlpatterns = [
         name="customuser_create",
     ),
     path("customuser/", CustomUserListView.as_view(), name="customuser_list"),
+    path(
+        "customuser/calendar/rotate/",
+        calendar_rotate,
+        name="customuser_calendar_rotate",
+    ),
 ]
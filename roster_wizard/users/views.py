@@ -2,13 +2,17 @@
 
 from django.views.generic import ListView, DetailView
 from django.views.generic.edit import UpdateView, DeleteView, CreateView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import (
     LoginRequiredMixin,
     PermissionRequiredMixin,
 )
+from django.http import HttpResponseRedirect
+from django.views.decorators.http import require_POST
 
 # from django.core.exceptions import PermissionDenied
+from rosters.ical import get_calendar_token, rotate_calendar_key
 from .models import CustomUser
 
 
@@ -20,7 +24,9 @@ class CustomUserListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         """Get query set."""
-        return CustomUser.objects.order_by("last_name", "first_name")
+        return CustomUser.objects.prefetch_related("roles").order_by(
+            "last_name", "first_name"
+        )
 
 
 class CustomUserDetailView(LoginRequiredMixin, DetailView):
@@ -29,6 +35,23 @@ class CustomUserDetailView(LoginRequiredMixin, DetailView):
     model = CustomUser
     template_name = "customuser_detail.html"
 
+    def get_context_data(self, **kwargs):
+        """Add the calendar feed URL to a staff member's own details."""
+        context = super().get_context_data(**kwargs)
+        if self.object == self.request.user:
+            context["calendar_url"] = self.request.build_absolute_uri(
+                reverse("staff_calendar", args=[get_calendar_token(self.object)])
+            )
+        return context
+
+
+@require_POST
+@login_required
+def calendar_rotate(request):
+    """Revoke the user's calendar feed URL and give them a new one."""
+    rotate_calendar_key(request.user)
+    return HttpResponseRedirect(reverse("customuser_detail", args=[request.user.pk]))
+
 
 class CustomUserUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
     """UserUpdateView."""